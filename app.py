@@ -9,6 +9,8 @@ import os
 import jdatetime
 from flask_migrate import Migrate
 import sqlite3
+import threading
+
 
 def create_app():
     app = Flask(__name__)
@@ -416,18 +418,56 @@ def create_app():
     # =================== Health Check ===================
     @app.route("/health")
     def health_check():
-        """بررسی سلامت برنامه"""
+        """
+        بررسی سلامت برنامه (موتور هوش مصنوعی را نمی‌سازد)
+        با ?require_model=1 تا آماده شدن مدل هوش مصنوعی کد 503 برگردانده می‌شود
+        """
+        try:
+            from quran_ai import get_model_status
+            model_status = get_model_status()
+        except Exception as e:
+            model_status = {'state': 'unavailable', 'error': str(e)}
+
+        status_code = 200
+        if request.args.get('require_model') == '1' and model_status.get('state') != 'ready':
+            status_code = 503
+
         return jsonify({
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
             "persian_time": to_persian_numbers(
                 persian_datetime_filter(datetime.now())
-            )
-        })
+            ),
+            "quran_ai_model": model_status
+        }), status_code
+
+    # =================== بارگذاری مدل هوش مصنوعی ===================
+    # مدل فقط در پروسه‌ای که درخواست سرویس می‌دهد بارگذاری می‌شود (اولین
+    # درخواست، مثلاً health check)؛ اسکریپت‌هایی که app را import می‌کنند،
+    # دستورات CLI و پروسه والد reloader مدل را بارگذاری نمی‌کنند. تا آماده
+    # شدن مدل، پرسش‌ها با جستجوی کلیدواژه‌ای پاسخ داده می‌شوند
+    if app.config.get('QURAN_AI_PRELOAD_MODEL'):
+        preload_started = threading.Event()
+
+        @app.before_request
+        def preload_quran_ai_model():
+            if preload_started.is_set():
+                return
+            preload_started.set()
+            threading.Thread(target=_start_model_loading, daemon=True).start()
 
     return app
 
 
+def _start_model_loading():
+    """ساخت موتور هوش مصنوعی و شروع بارگذاری مدل در پس‌زمینه"""
+    try:
+        from quran_ai import start_model_loading
+        start_model_loading()
+    except Exception as e:
+        print(f"⚠️ بارگذاری پس‌زمینه مدل هوش مصنوعی انجام نشد: {e}")
+
+
 # =================== اجرای اپلیکیشن ===================
 app = create_app()
 
@@ -0,0 +1,388 @@
+# bench_quran_ai.py
+"""
+سنجش سرتاسری سرعت مسیرهای پرسش و پاسخ قرآنی
+
+یک پیکره مصنوعی ۶۲۳۶ آیه‌ای (با تعداد آیات واقعی هر سوره) و مجموعه‌ای از
+سوال‌های واقع‌نما ساخته می‌شود، سپس هر موتور در پروسه جداگانه اجرا می‌شود:
+
+- fast: FastQuranAI.ask_question (FTS5 و پاسخ‌های آماده)
+- complete: QuranAISystem.ask_question (embedding و جستجوی معنایی)
+- hybrid: HybridQuranAI.ask_question (مسیر /ai/ask_api)
+- qa_index: find_best_answer (ایندکس پرسش و پاسخ‌های quran_qa)
+
+هر موتور دو بار روی همان سوال‌ها اجرا می‌شود: cold (موتور تازه ساخته‌شده و
+کش‌های خالی) و warm (تکرار همان سوال‌ها با کش‌های پر). برای هر مرحله p50/p95/p99
+تاخیر، توان عملیاتی به ازای هر هسته (سوال در هر ثانیه CPU) و بیشینه RSS پروسه
+گزارش و نتیجه به صورت JSON ذخیره می‌شود تا بین نسخه‌ها مقایسه شود.
+
+نمونه:
+    python bench_quran_ai.py --encoder hashing --output bench-results.json
+    python bench_quran_ai.py --engines fast qa_index --questions 1000
+    python bench_quran_ai.py --baseline bench-v1.json --max-regression 0.2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from quran_ai_ingest import SURAH_NAMES
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# تعداد آیات هر سوره به ترتیب مصحف (جمع: ۶۲۳۶)
+AYAH_COUNTS = [
+    7, 286, 200, 176, 120, 165, 206, 75, 129, 109, 123, 111, 43, 52, 99, 128, 111, 110, 98, 135,
+    112, 78, 118, 64, 77, 227, 93, 88, 69, 60, 34, 30, 73, 54, 45, 83, 182, 88, 75, 85,
+    54, 53, 89, 59, 37, 35, 38, 29, 18, 45, 60, 49, 62, 55, 78, 96, 29, 22, 24, 13,
+    14, 11, 11, 18, 12, 12, 30, 52, 52, 44, 28, 28, 20, 56, 40, 31, 50, 40, 46, 42,
+    29, 19, 36, 25, 22, 17, 19, 26, 30, 20, 15, 21, 11, 8, 8, 19, 5, 8, 8, 11,
+    11, 8, 3, 9, 5, 4, 7, 3, 6, 3, 5, 4, 5, 6
+]
+
+ENGINES = ['fast', 'complete', 'hybrid', 'qa_index']
+
+# واژه‌های موضوعی (همان کلیدواژه‌های تشخیص موضوع موتورها) و واژه‌های عمومی
+TOPIC_WORDS = [
+    'خدا', 'پروردگار', 'یکتا', 'پیامبر', 'رسول', 'قیامت', 'آخرت', 'بهشت', 'جهنم', 'صبر',
+    'شکیبایی', 'استقامت', 'نماز', 'سجده', 'عبادت', 'روزه', 'توبه', 'استغفار', 'بخشش',
+    'توکل', 'اعتماد', 'آرامش', 'قلب', 'اخلاق', 'صداقت', 'عدالت', 'خانواده', 'همسر',
+    'فرزند', 'والدین', 'رحمت', 'نعمت', 'شکر', 'ایمان', 'تقوا', 'هدایت', 'نور', 'علم'
+]
+COMMON_WORDS = [
+    'و', 'به', 'از', 'که', 'در', 'را', 'با', 'آنان', 'کسانی', 'مردم', 'زمین', 'آسمان',
+    'روز', 'شب', 'راه', 'حق', 'کار', 'دل', 'جان', 'سخن', 'کتاب', 'آیات', 'بندگان',
+    'می‌دهد', 'می‌کنند', 'است', 'بودند', 'آمد', 'فرستاد', 'گفت', 'دانا', 'بینا', 'شنوا'
+]
+ARABIC_WORDS = [
+    'اللَّهِ', 'رَبِّ', 'الَّذِينَ', 'آمَنُوا', 'الصَّلَاةَ', 'الصَّابِرِينَ', 'رَحْمَةً', 'يَوْمِ',
+    'الْقِيَامَةِ', 'الْجَنَّةَ', 'النَّارِ', 'قُلُوبُهُمْ', 'تَوَكَّلْ', 'عَلَى', 'إِنَّ', 'مِنْ',
+    'فِي', 'الْأَرْضِ', 'السَّمَاوَاتِ', 'هُدًى', 'نُورٌ', 'عِلْمٍ', 'تَابَ', 'غَفُورٌ', 'رَحِيمٌ'
+]
+QUESTION_TEMPLATES = [
+    'آیات درباره {0} چیست؟',
+    '{0} در قرآن',
+    'قرآن درباره {0} و {1} چه می‌گوید؟',
+    'چگونه {0} داشته باشیم',
+    'معنی {0} در قرآن چیست',
+    'آیه‌ای درباره {0} برای {1}',
+    '{0} {1}'
+]
+# سوال‌هایی که پاسخ آماده دارند و سوال‌های بی‌ربط (مسیر پاسخ پیش‌فرض)
+FAST_QUESTIONS = ['توحید چیست', 'آیه‌الکرسی', 'صبر در قرآن', 'اهمیت نماز', 'آرامش قلب با قرآن']
+UNRELATED_QUESTIONS = ['قیمت دلار امروز', 'آموزش برنامه‌نویسی پایتون', 'هوای تهران فردا', 'نتیجه بازی دیروز']
+
+
+# ============================================
+# داده‌های مصنوعی
+# ============================================
+
+def _zipf_weights(n: int) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1)
+    return weights / weights.sum()
+
+
+def generate_corpus(seed: int = 0) -> List[Dict]:
+    """پیکره مصنوعی با تعداد آیات واقعی هر سوره و توزیع زیپفی واژه‌ها"""
+    rng = np.random.default_rng(seed)
+    vocab = TOPIC_WORDS + COMMON_WORDS
+    vocab_weights = _zipf_weights(len(vocab))[rng.permutation(len(vocab))]
+    arabic_weights = _zipf_weights(len(ARABIC_WORDS))
+
+    verses = []
+    for surah_number, count in enumerate(AYAH_COUNTS, start=1):
+        for verse_number in range(1, count + 1):
+            n_words = int(rng.integers(6, 30))
+            persian = ' '.join(rng.choice(vocab, n_words, p=vocab_weights))
+            verses.append({
+                'surah_number': surah_number,
+                'surah_name': SURAH_NAMES[surah_number - 1],
+                'verse_number': verse_number,
+                'arabic_text': ' '.join(rng.choice(ARABIC_WORDS, max(n_words // 2, 3), p=arabic_weights)),
+                'persian_text': persian,
+                'translation': persian
+            })
+    return verses
+
+
+def generate_questions(n: int, seed: int = 0) -> List[str]:
+    """سوال‌های واقع‌نما: ۸۵٪ موضوعی، ۱۰٪ دارای پاسخ آماده، ۵٪ بی‌ربط"""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.10:
+            questions.append(rng.choice(FAST_QUESTIONS))
+        elif roll < 0.15:
+            questions.append(rng.choice(UNRELATED_QUESTIONS))
+        else:
+            words = rng.sample(TOPIC_WORDS, 2)
+            questions.append(rng.choice(QUESTION_TEMPLATES).format(*words))
+    return questions
+
+
+def generate_qa_entries(n: int, seed: int = 0) -> List[Dict]:
+    """ردیف‌های مصنوعی quran_qa برای find_best_answer"""
+    rng = random.Random(seed + 1)
+    entries = []
+    for i in range(n):
+        words = rng.sample(TOPIC_WORDS, 3)
+        entries.append({
+            'question': rng.choice(QUESTION_TEMPLATES).format(*words),
+            'keywords': '، '.join(words),
+            'answer': f'پاسخ نمونه شماره {i + 1} درباره {words[0]}',
+            'category': words[0],
+            'priority': rng.randint(0, 5)
+        })
+    return entries
+
+
+# ============================================
+# اجرای موتورها (هر موتور در پروسه جداگانه)
+# ============================================
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # لینوکس کیلوبایت و macOS بایت گزارش می‌کند
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _configure(encoder: str):
+    # پیش از import موتورها؛ سرور embedding مشترک اینجا استفاده نمی‌شود تا
+    # اندازه‌گیری فقط شامل همین پروسه باشد
+    Config.QURAN_AI_ENCODER = encoder
+    Config.QURAN_AI_EMBED_SERVER = None
+
+
+def build_corpus(db_path: str, encoder: str, seed: int) -> int:
+    """ساخت (یا ادامه ساخت) دیتابیس آیات مصنوعی؛ با همان seed و encoder دوباره ساخته نمی‌شود"""
+    _configure(encoder)
+    from quran_ai_complete import QuranAISystem
+    from quran_ai_ingest import bulk_ingest
+
+    system = QuranAISystem(db_path)
+    try:
+        return bulk_ingest(system, iter(generate_corpus(seed)), f'synthetic-{seed}-{encoder}', batch_size=128)
+    finally:
+        system.history_writer.close()
+
+
+def _setup_engine(engine: str, workdir: str, qa_entries: List[Dict]) -> Tuple[Callable[[str], object], Callable[[], None]]:
+    """ساخت موتور؛ خروجی: (تابع پرسش، تابع پایان)"""
+    db_path = os.path.join(workdir, 'quran_ai.db')
+
+    if engine == 'fast':
+        from quran_ai_fast import FastQuranAI
+        fast = FastQuranAI(db_path)
+        return fast.ask_question, lambda: None
+
+    if engine in ('complete', 'hybrid'):
+        from quran_ai_complete import QuranAISystem
+        from quran_ai_db import get_connection
+
+        # تاریخچه اجرای قبلی کش پاسخ‌ها را پر می‌کند؛ مرحله cold باید خالی شروع شود
+        conn = get_connection(db_path)
+        with conn:
+            conn.execute("DELETE FROM quran_qa_history")
+
+        system = QuranAISystem(db_path)
+        if engine == 'complete':
+            return system.ask_question, system.history_writer.close
+
+        from quran_ai_hybrid import HybridQuranAI
+        hybrid = HybridQuranAI(semantic=system)
+        return hybrid.ask_question, system.history_writer.close
+
+    if engine == 'qa_index':
+        from flask import Flask
+        from extensions import db
+        from models import QuranQA, StatCounter
+
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'qa.db')
+        db.init_app(app)
+        context = app.app_context()
+        context.push()
+        # درج QuranQA شمارنده stat_counters را هم به‌روز می‌کند
+        for table in (QuranQA.__table__, StatCounter.__table__):
+            table.drop(db.engine, checkfirst=True)
+            table.create(db.engine)
+        db.session.add_all([QuranQA(**entry) for entry in qa_entries])
+        db.session.commit()
+
+        from quran_qa_index import find_best_answer
+        return find_best_answer, context.pop
+
+    raise ValueError(f"موتور ناشناخته: {engine}")
+
+
+def _measure(ask: Callable[[str], object], questions: List[str]) -> Dict:
+    latencies = np.empty(len(questions))
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for i, question in enumerate(questions):
+        start = time.perf_counter()
+        ask(question)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    cpu_s = time.process_time() - cpu_start
+    wall_s = time.perf_counter() - wall_start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'questions': len(questions),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'mean_ms': float(latencies.mean()),
+        'max_ms': float(latencies.max()),
+        # سوال در هر ثانیه CPU (همه threadهای پروسه) ≈ توان یک هسته
+        'throughput_per_core': len(questions) / cpu_s if cpu_s > 0 else float('inf'),
+        'throughput_wall': len(questions) / wall_s if wall_s > 0 else float('inf'),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def run_engine(engine: str, workdir: str, questions: List[str], qa_entries: List[Dict],
+               encoder: str, seed: int) -> Dict:
+    """اجرای cold و warm یک موتور (در پروسه تازه صدا زده می‌شود)"""
+    _configure(encoder)
+    random.seed(seed)
+
+    start = time.perf_counter()
+    ask, close = _setup_engine(engine, workdir, qa_entries)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    try:
+        phases = {phase: _measure(ask, questions) for phase in ('cold', 'warm')}
+    finally:
+        close()
+    return {'engine': engine, 'setup_ms': setup_ms, 'phases': phases}
+
+
+def _in_subprocess(func, *args):
+    """اجرای تابع در پروسه spawn تازه تا RSS و کش‌ها مستقل باشند"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+# ============================================
+# گزارش و مقایسه
+# ============================================
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_report(report: Dict):
+    print(f"\n{'موتور':<10}{'مرحله':<7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/s/core':>10}{'RSS MB':>9}")
+    for result in report['results']:
+        for phase, r in result['phases'].items():
+            print(f"{result['engine']:<10}{phase:<7}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                  f"{r['throughput_per_core']:>10.1f}{r['peak_rss_mb']:>9.0f}")
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """مقایسه p95 هر موتور/مرحله با گزارش پایه؛ خروجی: فهرست کندشدگی‌های بیش از حد"""
+    base = {(r['engine'], phase): p for r in baseline.get('results', []) for phase, p in r['phases'].items()}
+    regressions = []
+    print(f"\nمقایسه با {baseline.get('meta', {}).get('git_revision') or 'پایه'} (p95):")
+    for result in report['results']:
+        for phase, r in result['phases'].items():
+            old = base.get((result['engine'], phase))
+            if not old or not old['p95_ms']:
+                continue
+            change = r['p95_ms'] / old['p95_ms'] - 1
+            mark = '❌' if change > max_regression else '✅'
+            print(f"{mark} {result['engine']}/{phase}: {old['p95_ms']:.2f} → {r['p95_ms']:.2f} ms ({change:+.0%})")
+            if change > max_regression:
+                regressions.append(f"{result['engine']}/{phase}")
+    return regressions
+
+
+def run_benchmark(engines: List[str], n_questions: int = 500, n_qa: int = 300, encoder: Optional[str] = None,
+                  seed: int = 0, workdir: Optional[str] = None) -> Dict:
+    """ساخت داده‌ها و اجرای موتورها؛ خروجی: گزارش قابل ذخیره به صورت JSON"""
+    encoder = encoder or Config.QURAN_AI_ENCODER
+    workdir = workdir or tempfile.mkdtemp(prefix='seraj-bench-')
+    os.makedirs(workdir, exist_ok=True)
+
+    questions = generate_questions(n_questions, seed)
+    qa_entries = generate_qa_entries(n_qa, seed)
+    # بخشی از سوال‌ها دقیقاً همان پرسش‌های quran_qa هستند (مسیر تطبیق کامل)
+    for i, entry in zip(range(0, len(questions), 5), qa_entries):
+        questions[i] = entry['question']
+
+    if any(engine != 'qa_index' for engine in engines):
+        start = time.perf_counter()
+        _in_subprocess(build_corpus, os.path.join(workdir, 'quran_ai.db'), encoder, seed)
+        print(f"✅ پیکره مصنوعی آماده شد ({time.perf_counter() - start:.1f} ثانیه)")
+
+    results = []
+    for engine in engines:
+        print(f"⏱️ اجرای {engine} ...")
+        results.append(_in_subprocess(run_engine, engine, workdir, questions, qa_entries, encoder, seed))
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'encoder': encoder,
+            'verses': sum(AYAH_COUNTS),
+            'questions': n_questions,
+            'qa_entries': n_qa,
+            'seed': seed,
+            'workdir': workdir
+        },
+        'results': results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="سنجش سرتاسری سرعت هوش مصنوعی قرآنی")
+    parser.add_argument('--engines', nargs='+', default=ENGINES, choices=ENGINES)
+    parser.add_argument('--questions', type=int, default=500, help='تعداد سوال‌ها در هر مرحله')
+    parser.add_argument('--qa-entries', type=int, default=300, help='تعداد ردیف‌های quran_qa')
+    parser.add_argument('--encoder', default=None, help='پشتوانه embedding (پیش‌فرض: از Config)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help='پوشه دیتابیس‌های مصنوعی (برای استفاده دوباره)')
+    parser.add_argument('--output', default='bench-results.json', help='مسیر فایل JSON نتایج')
+    parser.add_argument('--baseline', default=None, help='فایل JSON نسخه قبلی برای مقایسه')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='حداکثر افزایش مجاز p95 نسبت به پایه (۰٫۲ = ۲۰٪)')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.engines, n_questions=args.questions, n_qa=args.qa_entries,
+                           encoder=args.encoder, seed=args.seed, workdir=args.workdir)
+    print_report(report)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ نتایج در {args.output} ذخیره شد")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print(f"❌ کندشدگی بیش از {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -17,6 +17,31 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     
+    # تنظیمات اتصال SQLite موتورهای هوش مصنوعی قرآنی
+    QURAN_AI_SQLITE_TIMEOUT = 5.0
+    QURAN_AI_SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # 256MB
+    QURAN_AI_SQLITE_CACHE_KB = 16 * 1024  # 16MB
+    
+    # بودجه زمانی هر پرسش در موتور ترکیبی (میلی‌ثانیه)؛ اگر مرحله معنایی
+    # از این بودجه بیشتر شود، فقط نتایج جستجوی واژگانی برگردانده می‌شود
+    QURAN_AI_LATENCY_BUDGET_MS = int(os.environ.get('QURAN_AI_LATENCY_BUDGET_MS', 200))
+    # بارگذاری مدل embedding در پس‌زمینه با اولین درخواست پروسه سرویس‌دهنده
+    QURAN_AI_PRELOAD_MODEL = os.environ.get('QURAN_AI_PRELOAD_MODEL', '1') == '1'
+    # قالب ذخیره embedding: float32 / float16 / int8 (quran_ai_codec.py)
+    QURAN_AI_EMBEDDING_CODEC = os.environ.get('QURAN_AI_EMBEDDING_CODEC', 'float16')
+    QURAN_AI_HISTORY_EMBEDDING_CODEC = os.environ.get('QURAN_AI_HISTORY_EMBEDDING_CODEC', 'int8')
+    # کش معنایی پاسخ‌ها: حداقل شباهت کسینوسی سوال و عمر ورودی‌ها (ثانیه)
+    QURAN_AI_ANSWER_CACHE_THRESHOLD = float(os.environ.get('QURAN_AI_ANSWER_CACHE_THRESHOLD', 0.92))
+    QURAN_AI_ANSWER_CACHE_TTL = int(os.environ.get('QURAN_AI_ANSWER_CACHE_TTL', 24 * 3600))
+    # پشتوانه embedding: sentence-transformers / quantized / hashing (quran_ai_encoders.py)
+    QURAN_AI_ENCODER = os.environ.get('QURAN_AI_ENCODER', 'sentence-transformers')
+    # سرور مشترک embedding (quran_ai_embed_server.py)؛ اگر خالی باشد هر پروسه مدل خودش را بارگذاری می‌کند
+    QURAN_AI_EMBED_SERVER = os.environ.get('QURAN_AI_EMBED_SERVER')
+    QURAN_AI_EMBED_TIMEOUT = float(os.environ.get('QURAN_AI_EMBED_TIMEOUT', 2.0))
+    QURAN_AI_EMBED_AUTHKEY = os.environ.get('QURAN_AI_EMBED_AUTHKEY')
+    # حداکثر تعداد سوال در هر درخواست /ai/ask_batch
+    QURAN_AI_BATCH_MAX_QUESTIONS = int(os.environ.get('QURAN_AI_BATCH_MAX_QUESTIONS', 500))
+    
     # تنظیمات اپلیکیشن
     APP_NAME = 'سِراج - پلتفرم مدیریت فعالیت‌های قرآنی'
     POSTS_PER_PAGE = 10
\ No newline at end of file
@@ -53,5 +53,14 @@ with app.app_context():
         """))
         print("✓ جدول circle_join_requests ایجاد شد")
     
+    if 'stat_counters' not in tables:
+        print("در حال ایجاد جداول stat_counters و user_stat_counters...")
+        from models import StatCounter, UserStatCounter
+        from stat_counters import reconcile_stat_counters
+        StatCounter.__table__.create(db.engine, checkfirst=True)
+        UserStatCounter.__table__.create(db.engine, checkfirst=True)
+        reconcile_stat_counters()
+        print("✓ جداول شمارنده ایجاد و مقداردهی شدند")
+    
     db.session.commit()
     print("✅ همه جدول‌ها با موفقیت ایجاد شدند!")
\ No newline at end of file
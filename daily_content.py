@@ -0,0 +1,156 @@
+# daily_content.py
+"""
+سرویس آیه/حدیث روز
+
+آیه یا حدیث هر روز شمسی فقط یک بار انتخاب و در جدول daily_content (کلید:
+تاریخ شمسی) ذخیره می‌شود تا همه workerها محتوای یکسانی نشان دهند. هر پروسه
+محتوای روز جاری را در حافظه هم نگه می‌دارد، پس هر بازدید صفحه حداکثر یک
+جستجوی کلید اصلی دارد و معمولاً هیچ.
+
+انتخاب با random.Random محلی که بذر آن تاریخ روز است انجام می‌شود (بدون
+دستکاری random سراسری) و آیه با COUNT و OFFSET خوانده می‌شود، نه با بارگذاری
+همه آیات.
+"""
+
+import json
+import random
+import threading
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import jdatetime
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import DailyContent, Hadith, QuranVerse
+
+
+# احادیث پیش‌فرض وقتی جدول hadiths خالی است
+DEFAULT_HADITHS = [
+    {'title': 'پیامبر اکرم (ص)', 'arabic': 'الْقُرْآنُ مَأْدُبَةُ اللَّهِ، فَتَعَلَّمُوا مَأْدُبَتَهُ مَا اسْتَطَعْتُمْ.', 'persian': 'قرآن سفرهٔ الهی است، پس تا می‌توانید از این سفره بیاموزید.', 'source': 'نهج‌الفصاحه'},
+    {'title': 'امام علی (ع)', 'arabic': 'وَ اعْلَمُوا أَنَّ هَذَا الْقُرْآنَ هُوَ النَّاصِحُ الَّذِي لَا يَغُشُّ، وَ الْهَادِي الَّذِي لَا يُضِلُّ، وَ الْمُحَدِّثُ الَّذِي لَا يَكْذِبُ.', 'persian': 'بدانید که این قرآن، اندرزگویی است که فریب نمی‌دهد، راهنمایی است که گمراه نمی‌کند، و سخنگویی است که دروغ نمی‌گوید.', 'source': 'نهج‌البلاغه، خطبه ۱۷۶'},
+    {'title': 'امام صادق (ع)', 'arabic': 'إِنَّ الْقُرْآنَ حَيٌ لَمْ يَمُتْ، وَ إِنَّهُ جَارٍ كَمَا يَجْرِي اللَّيْلُ وَ النَّهَارُ، وَ كَمَا يَجْرِي الشَّمْسُ وَ الْقَمَرُ.', 'persian': 'قرآن زنده است و نمی‌میرد؛ جاری است چنانکه شب و روز جاری است، و چنانکه خورشید و ماه جاری هستند.', 'source': 'الکافی، ج۲، ص۶۰۳'},
+    {'title': 'امام باقر (ع)', 'arabic': 'مَنْ قَرَأَ الْقُرْآنَ وَ هُوَ شَابٌّ مُؤْمِنٌ، اخْتَلَطَ الْقُرْآنُ بِلَحْمِهِ وَ دَمِهِ، وَ جَعَلَهُ اللَّهُ مَعَ السَّفَرَةِ الْكِرَامِ الْبَرَرَةِ.', 'persian': 'هر جوان مؤمنی که قرآن بخواند، قرآن با گوشت و خونش آمیخته می‌شود و خداوند او را با فرشتگان بزرگوار و نیکوکار محشور می‌گرداند.', 'source': 'الکافی، ج۲، ص۶۰۴'},
+    {'title': 'پیامبر اکرم (ص)', 'arabic': 'شِفَاءُ مَا فِي الصُّدُورِ الْقُرْآنُ.', 'persian': 'قرآن درمان آنچه در سینه‌ها (دل‌ها) است، می‌باشد.', 'source': 'بحارالانوار، ج۹۲، ص۲۱'},
+    {'title': 'امام رضا (ع)', 'arabic': 'إِنَّ الْقُرْآنَ حَبْلُ اللَّهِ الْمَتِينُ وَ عُرْوَتُهُ الْوُثْقَى وَ الصِّرَاطُ الْمُسْتَقِیمُ.', 'persian': 'قرآن، ریسمان محکم خدا و دستاویز استوار و راه راست است.', 'source': 'عیون اخبار الرضا، ج۱، ص۲۹'},
+    {'title': 'امیرالمؤمنین (ع)', 'arabic': 'فَاسْتَشْفُوهُ مِنْ أَدْوَائِكُمْ، وَ اسْتَعِينُوا بِهِ عَلَى لَأْوَائِكُمْ، فَإِنَّ فِيهِ شِفَاءً مِنْ أَكْبَرِ الدَّاءِ وَ هُوَ الْكُفْرُ وَ النِّفَاقُ.', 'persian': 'پس از قرآن برای درمان بیماری‌هایتان شفا بجویید و در سختی‌ها از آن یاری بخواهید؛ زیرا در قرآن درمان بزرگ‌ترین بیماری‌ها یعنی کفر و نفاق است.', 'source': 'نهج‌البلاغه، خطبه ۱۷۶'},
+    {'title': 'امام سجاد (ع)', 'arabic': 'آيَاتُ الْقُرْآنِ خَزَائِنُ الرَّحْمَةِ، فَإِذَا فُتِحَتْ خَزَائِنُ الرَّحْمَةِ فَلَا تَنْبَغِي أَنْ تُقْفَلَ.', 'persian': 'آیات قرآن گنجینه‌های رحمتند؛ پس هنگامی که گشوده شدند، شایسته نیست که بسته شوند.', 'source': 'تحف العقول'}
+]
+
+_cache: Optional[Tuple[str, Dict]] = None
+_lock = threading.Lock()
+
+
+def today_key(today: Optional[date] = None) -> str:
+    """کلید روز به تاریخ شمسی (مثلاً 1405/07/25)"""
+    today = today or date.today()
+    return jdatetime.date.fromgregorian(date=today).strftime('%Y/%m/%d')
+
+
+def _hadith_content(hadith: Dict) -> Dict:
+    return {
+        'title': hadith['title'],
+        'verse': hadith['persian'],
+        'arabic_text': hadith['arabic'],
+        'translation': hadith['persian'],
+        'surah': hadith['source'],
+        'verse_number': '',
+        'is_hadith': True
+    }
+
+
+def _verse_content(verse: QuranVerse) -> Dict:
+    return {
+        'title': 'آیه روز',
+        'verse': verse.verse_persian or verse.translation or '',
+        'arabic_text': verse.verse_arabic or '',
+        'translation': verse.verse_persian or verse.translation or '',
+        'surah': verse.surah_name or 'قرآن',
+        'verse_number': verse.verse_number if verse.verse_number is not None else '',
+        'is_hadith': False
+    }
+
+
+def _pick_hadith(rng: random.Random) -> Dict:
+    """حدیث تصادفی از جدول hadiths یا در نبود آن از فهرست پیش‌فرض"""
+    active = Hadith.query.filter_by(is_active=True)
+    total = active.count()
+    if total:
+        hadith = active.order_by(Hadith.id).offset(rng.randrange(total)).first()
+        return _hadith_content({
+            'title': hadith.title,
+            'arabic': hadith.arabic_text,
+            'persian': hadith.persian_text,
+            'source': hadith.source,
+        })
+    return _hadith_content(rng.choice(DEFAULT_HADITHS))
+
+
+def compute_daily_content(day: str) -> Dict:
+    """انتخاب قطعی آیه یا حدیث (۵۰٪ شانس) برای روز day"""
+    rng = random.Random(f'daily-content:{day}')
+
+    if rng.random() < 0.5:
+        return _pick_hadith(rng)
+
+    active = QuranVerse.query.filter(QuranVerse.is_active == True)
+    total = active.count()
+    if not total:
+        return _pick_hadith(rng)
+    verse = active.order_by(QuranVerse.id).offset(rng.randrange(total)).first()
+    return _verse_content(verse)
+
+
+def _load_or_create(day: str) -> Dict:
+    """خواندن محتوای روز از دیتابیس یا محاسبه و ذخیره آن"""
+    row = db.session.get(DailyContent, day)
+    if row is not None:
+        return json.loads(row.payload)
+
+    content = compute_daily_content(day)
+    try:
+        db.session.add(DailyContent(day=day, payload=json.dumps(content, ensure_ascii=False)))
+        db.session.commit()
+    except IntegrityError:
+        # worker دیگری زودتر همین روز را ذخیره کرده است
+        db.session.rollback()
+        row = db.session.get(DailyContent, day)
+        if row is not None:
+            return json.loads(row.payload)
+    return content
+
+
+def get_daily_content() -> Dict:
+    """آیه/حدیث روز جاری (کش پروسه، سپس جدول daily_content)"""
+    global _cache
+    day = today_key()
+    cached = _cache
+    if cached and cached[0] == day:
+        return cached[1]
+
+    with _lock:
+        if _cache and _cache[0] == day:
+            return _cache[1]
+        try:
+            content = _load_or_create(day)
+        except Exception as e:
+            # مثلاً جدول daily_content هنوز migrate نشده: فقط کش پروسه
+            db.session.rollback()
+            print(f"⚠️ جدول آیه روز در دسترس نیست: {e}")
+            try:
+                content = compute_daily_content(day)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ خطا در دریافت آیه روز: {e}")
+                return _hadith_content(DEFAULT_HADITHS[0])
+        _cache = (day, content)
+        return content
+
+
+def invalidate_daily_content():
+    """حذف محتوای روز جاری تا دوباره انتخاب شود (مثلاً پس از ویرایش آیات)"""
+    global _cache
+    with _lock:
+        _cache = None
+        DailyContent.query.filter_by(day=today_key()).delete()
+        db.session.commit()
@@ -0,0 +1,59 @@
+"""add normalized search columns
+
+Revision ID: 3d9c7e41b2a8
+Revises: 5cfb20b26c5d
+Create Date: 2026-10-17 10:12:31.480215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from text_normalizer import normalize_search
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9c7e41b2a8'
+down_revision = '5cfb20b26c5d'
+branch_labels = None
+depends_on = None
+
+
+# جدول ← [(ستون اصلی، ستون نرمال‌شده، طول)]
+NORMALIZED_COLUMNS = {
+    'events': [('title', 'title_norm', 200)],
+    'quran_circles': [('name', 'name_norm', 200)],
+    'quran_qa': [('question', 'question_norm', 500), ('keywords', 'keywords_norm', 500)],
+}
+
+
+def _backfill(table_name, columns):
+    """پر کردن ستون‌های نرمال‌شده ردیف‌های موجود"""
+    connection = op.get_bind()
+    table = sa.table(table_name, sa.column('id'),
+                     *[sa.column(source) for source, _, _ in columns],
+                     *[sa.column(shadow) for _, shadow, _ in columns])
+    rows = connection.execute(sa.select(table.c.id, *[table.c[source] for source, _, _ in columns])).fetchall()
+    for row in rows:
+        values = {shadow: normalize_search(row[i + 1]) for i, (_, shadow, _) in enumerate(columns)}
+        connection.execute(table.update().where(table.c.id == row[0]).values(**values))
+
+
+def upgrade():
+    for table_name, columns in NORMALIZED_COLUMNS.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for _, shadow, length in columns:
+                batch_op.add_column(sa.Column(shadow, sa.String(length=length), nullable=True))
+
+        _backfill(table_name, columns)
+
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for _, shadow, _ in columns:
+                batch_op.create_index(batch_op.f(f'ix_{table_name}_{shadow}'), [shadow], unique=False)
+
+
+def downgrade():
+    for table_name, columns in NORMALIZED_COLUMNS.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            for _, shadow, _ in columns:
+                batch_op.drop_index(batch_op.f(f'ix_{table_name}_{shadow}'))
+                batch_op.drop_column(shadow)
@@ -0,0 +1,29 @@
+"""add daily content table
+
+Revision ID: 7e2b5c9a1f64
+Revises: 3d9c7e41b2a8
+Create Date: 2026-10-17 15:40:12.918334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b5c9a1f64'
+down_revision = '3d9c7e41b2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_content',
+    sa.Column('day', sa.String(length=10), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_content')
@@ -0,0 +1,53 @@
+"""add stat counters
+
+Revision ID: 9a4f2d6c8e15
+Revises: 7e2b5c9a1f64
+Create Date: 2026-10-17 18:05:47.201736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f2d6c8e15'
+down_revision = '7e2b5c9a1f64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stat_counters',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('user_stat_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'name')
+    )
+
+    # مقدار اولیه شمارنده‌ها از جداول موجود
+    op.execute("""
+        INSERT INTO stat_counters (name, value, reconciled_at)
+        SELECT 'quran_verses', COUNT(*), CURRENT_TIMESTAMP FROM quran_verses
+        UNION ALL
+        SELECT 'quran_qa', COUNT(*), CURRENT_TIMESTAMP FROM quran_qa
+        UNION ALL
+        SELECT 'quran_chats', COUNT(*), CURRENT_TIMESTAMP FROM user_quran_chats
+    """)
+    op.execute("""
+        INSERT INTO user_stat_counters (user_id, name, value)
+        SELECT user_id, 'quran_chats', COUNT(*) FROM user_quran_chats
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+
+
+def downgrade():
+    op.drop_table('user_stat_counters')
+    op.drop_table('stat_counters')
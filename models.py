@@ -3,6 +3,9 @@ from extensions import db
 from flask_login import UserMixin
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from text_normalizer import normalize_search
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import enum
 
 # ================================
@@ -259,6 +262,7 @@ class Event(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
+    title_norm = db.Column(db.String(200), index=True)  # نسخه نرمال‌شده عنوان برای جستجو
     description = db.Column(db.Text, nullable=False)
     event_type = db.Column(db.Enum(EventType), nullable=False)
     start_date = db.Column(db.DateTime, nullable=False)
@@ -378,6 +382,17 @@ class Hadith(db.Model):
     def __repr__(self):
         return f'<Hadith {self.title}>'
 
+class DailyContent(db.Model):
+    """آیه/حدیث روز؛ یک ردیف برای هر روز شمسی، مشترک بین همه workerها"""
+    __tablename__ = 'daily_content'
+    
+    day = db.Column(db.String(10), primary_key=True)           # تاریخ شمسی: 1405/07/25
+    payload = db.Column(db.Text, nullable=False)               # JSON آیه یا حدیث روز
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyContent {self.day}>'
+
 # ================================
 # PASSWORD RESET TOKEN
 # ================================
@@ -751,6 +766,7 @@ class QuranCircle(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
+    name_norm = db.Column(db.String(200), index=True)  # نسخه نرمال‌شده نام برای جستجو
     description = db.Column(db.Text)
     teacher_name = db.Column(db.String(200), nullable=False)
     teacher_bio = db.Column(db.Text)
@@ -1157,7 +1173,9 @@ class QuranQA(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.String(500), nullable=False)
+    question_norm = db.Column(db.String(500), index=True)  # نسخه نرمال‌شده سوال
     keywords = db.Column(db.String(500))
+    keywords_norm = db.Column(db.String(500), index=True)  # نسخه نرمال‌شده کلمات کلیدی
     answer = db.Column(db.Text, nullable=False)
     related_verses = db.Column(db.Text)
     category = db.Column(db.String(100))
@@ -1187,6 +1205,30 @@ class UserQuranChat(db.Model):
         return f'<UserQuranChat {self.user_id} - {self.created_at}>'
 
 
+class StatCounter(db.Model):
+    """شمارنده‌های آماری سراسری (به‌روزرسانی در همان تراکنش INSERT/DELETE)"""
+    __tablename__ = 'stat_counters'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<StatCounter {self.name}={self.value}>'
+
+
+class UserStatCounter(db.Model):
+    """شمارنده‌های آماری هر کاربر"""
+    __tablename__ = 'user_stat_counters'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserStatCounter {self.user_id}:{self.name}={self.value}>'
+
+
 class QuranSuggestion(db.Model):
     __tablename__ = 'quran_suggestions'
     __table_args__ = {'extend_existing': True}
@@ -1201,4 +1243,80 @@ class QuranSuggestion(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     
     def __repr__(self):
-        return f'<QuranSuggestion {self.mood} - {self.surah_name}:{self.verse_number}>'
\ No newline at end of file
+        return f'<QuranSuggestion {self.mood} - {self.surah_name}:{self.verse_number}>'
+
+
+# ============================================
+# ستون‌های سایه نرمال‌شده برای جستجو
+# ============================================
+
+# ستون اصلی ← ستون نرمال‌شده (با text_normalizer.normalize_search پر می‌شود)
+NORMALIZED_COLUMNS = {
+    Event: {'title': 'title_norm'},
+    QuranCircle: {'name': 'name_norm'},
+    QuranQA: {'question': 'question_norm', 'keywords': 'keywords_norm'},
+}
+
+
+def _sync_normalized_columns(mapper, connection, target):
+    """به‌روزرسانی ستون‌های *_norm پیش از هر INSERT/UPDATE"""
+    for source, shadow in NORMALIZED_COLUMNS[type(target)].items():
+        setattr(target, shadow, normalize_search(getattr(target, source)))
+
+
+for _model in NORMALIZED_COLUMNS:
+    db.event.listen(_model, 'before_insert', _sync_normalized_columns)
+    db.event.listen(_model, 'before_update', _sync_normalized_columns)
+
+
+# ============================================
+# شمارنده‌های آماری (stat_counters)
+# ============================================
+
+# مدل ← (نام شمارنده، ستون کاربر برای شمارنده هر کاربر یا None)
+COUNTED_MODELS = {
+    QuranVerse: ('quran_verses', None),
+    QuranQA: ('quran_qa', None),
+    UserQuranChat: ('quran_chats', 'user_id'),
+}
+
+
+_UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+
+def _add_to_counter(connection, table, key, delta):
+    """افزودن delta به ردیف شمارنده (و ساخت ردیف اگر وجود ندارد) با یک UPSERT اتمی"""
+    insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if insert is None:
+        condition = db.and_(*[table.c[column] == value for column, value in key.items()])
+        result = connection.execute(table.update().where(condition).values(value=table.c.value + delta))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(value=delta, **key))
+        return
+    statement = insert(table).values(value=delta, **key)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={'value': table.c.value + statement.excluded.value},
+    ))
+
+
+def _count_insert(mapper, connection, target):
+    _bump_counters(connection, target, 1)
+
+
+def _count_delete(mapper, connection, target):
+    _bump_counters(connection, target, -1)
+
+
+def _bump_counters(connection, target, delta):
+    """به‌روزرسانی شمارنده‌ها روی همان اتصال و تراکنش flush"""
+    name, user_column = COUNTED_MODELS[type(target)]
+    _add_to_counter(connection, StatCounter.__table__, {'name': name}, delta)
+    user_id = getattr(target, user_column) if user_column else None
+    if user_id is not None:
+        _add_to_counter(connection, UserStatCounter.__table__, {'user_id': user_id, 'name': name}, delta)
+
+
+for _model in COUNTED_MODELS:
+    db.event.listen(_model, 'after_insert', _count_insert)
+    db.event.listen(_model, 'after_delete', _count_delete)
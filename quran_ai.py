@@ -1,4 +1,63 @@
-from quran_verses import search_verses
+# quran_ai.py
+"""
+نقطه ورود هوش مصنوعی قرآنی برای routes.py
 
-def get_verse_recommendations(user_question):
-    return search_verses(user_question, top_k=5)
+پرسش‌ها با موتور ترکیبی (واژگانی + معنایی) پاسخ داده می‌شوند؛
+تحلیل متن، پیشنهاد آیات و آمار از موتور سریع خوانده می‌شوند.
+"""
+
+from quran_ai_fast import (
+    analyze_quranic_text,
+    get_verse_suggestions,
+    get_recent_qa
+)
+from quran_ai_fast import get_ai_statistics as _get_fast_statistics
+import quran_ai_hybrid
+from quran_ai_hybrid import get_hybrid_ai
+from quran_ai_clusters import get_latest_clusters
+
+
+def ask_quran_ai(question, user_id=None):
+    """پاسخ به سوال با بازیابی ترکیبی و بودجه زمانی"""
+    return get_hybrid_ai().ask_question(question, user_id)
+
+
+def ask_quran_ai_batch(questions, user_id=None):
+    """پاسخ به چند سوال با یک encode دسته‌ای؛ خروجی شامل پاسخ هر سوال و زمان کل است"""
+    return get_hybrid_ai().ask_questions(questions, user_id)
+
+
+def ask_quran_ai_stream(question, user_id=None):
+    """پاسخ مرحله‌ای برای Server-Sent Events: (نام رویداد، داده)"""
+    return get_hybrid_ai().ask_question_stream(question, user_id)
+
+
+def start_model_loading():
+    """ساخت موتور و شروع بارگذاری مدل در پس‌زمینه (هنگام راه‌اندازی برنامه)"""
+    get_hybrid_ai()
+
+
+def get_model_status():
+    """
+    وضعیت بارگذاری مدل embedding: not_started / loading / ready / failed / unavailable
+    موتور اینجا ساخته نمی‌شود؛ تا اولین پرسش (یا پیش‌بارگذاری) وضعیت not_started است
+    """
+    engine = quran_ai_hybrid.hybrid_ai
+    if engine is None:
+        return {'state': 'not_started', 'load_time': None, 'error': None}
+    return engine.semantic.get_model_status()
+
+
+def get_question_clusters(limit=10):
+    """خوشه‌های سوالات آخرین اجرای quran_ai_clusters.py (موضوعات بی‌پاسخ)"""
+    return get_latest_clusters(limit=limit)
+
+
+def get_ai_statistics():
+    """آمار سیستم به همراه نرخ hit کش معنایی پاسخ‌ها"""
+    stats = _get_fast_statistics()
+    try:
+        stats['answer_cache'] = get_hybrid_ai().semantic.get_answer_cache_stats()
+    except Exception as e:
+        print(f"⚠️ آمار کش پاسخ‌ها در دسترس نیست: {e}")
+    return stats
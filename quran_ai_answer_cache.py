@@ -0,0 +1,199 @@
+# quran_ai_answer_cache.py
+"""
+کش معنایی پاسخ‌ها
+
+بیشتر سوالات بازنویسی چند موضوع تکراری هستند؛ پیش از بازیابی آیات، نزدیک‌ترین
+سوال قبلی (شباهت کسینوسی embedding) پیدا می‌شود و اگر شباهت از آستانه بیشتر
+باشد همان پاسخ و آیات مرتبط برگردانده می‌شود.
+
+کش هنگام راه‌اندازی از quran_qa_history پر می‌شود. ورودی‌ها پس از TTL منقضی
+می‌شوند و ورودی‌های قدیمی‌تر از آخرین تغییر آیات (شمارنده verses_changed_at)
+نادیده گرفته می‌شوند؛ on_verses_changed کل کش را باطل می‌کند و تغییر آیات در
+پروسه‌های دیگر با شمارنده verse_changes (تریگرهای quran_ai_stats.py) تشخیص داده می‌شود.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from quran_ai_db import get_connection
+from quran_ai_codec import decode_embeddings
+from quran_ai_stats import read_counter
+
+
+class SemanticAnswerCache:
+    """کش پاسخ بر اساس شباهت embedding سوال"""
+
+    def __init__(self, db_path: str, threshold: float = 0.92, ttl: float = 86400,
+                 max_entries: int = 5000):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._vectors: List[np.ndarray] = []
+        self._entries: List[Dict] = []
+        self._matrix = None
+        # ورودی‌های ساخته‌شده پیش از این زمان (آخرین تغییر آیات) معتبر نیستند
+        self._valid_after = 0.0
+        self._loaded = False
+        # بررسی دوره‌ای تغییر آیات توسط پروسه‌های دیگر
+        self._verse_changes = None
+        self._checked_at = 0.0
+        self.check_interval = 60.0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def _refresh_valid_after(self, now: float):
+        """
+        تشخیص تغییر آیات در دیتابیس (برای تغییراتی که پروسه دیگری انجام داده)
+        اگر شمارنده verse_changes از آخرین بررسی تغییر کرده باشد همه ورودی‌های
+        موجود باطل می‌شوند.
+        """
+        conn = get_connection(self.db_path)
+        changes = read_counter(conn, 'verse_changes')
+        if self._verse_changes is None:
+            self._valid_after = max(self._valid_after, float(read_counter(conn, 'verses_changed_at')))
+        elif changes != self._verse_changes:
+            self._valid_after = max(self._valid_after, now)
+        self._verse_changes = changes
+        self._checked_at = now
+
+    def _load(self):
+        """پر کردن کش از تاریخچه ذخیره‌شده (جدیدترین‌ها، حداکثر max_entries)"""
+        self._refresh_valid_after(time.time())
+        conn = get_connection(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT CAST(strftime('%s', created_at) AS REAL), question_embedding,
+                   answer, related_verses, confidence
+            FROM quran_qa_history
+            WHERE question_embedding IS NOT NULL AND answer IS NOT NULL
+              AND created_at >= datetime(?, 'unixepoch')
+            ORDER BY id DESC
+            LIMIT ?
+        """, (max(self._valid_after, time.time() - self.ttl), self.max_entries))
+        rows = cursor.fetchall()[::-1]
+
+        matrix, valid = decode_embeddings([r[1] for r in rows])
+        vectors = []
+        entries = []
+        for vector, position in zip(matrix, valid):
+            created, _, answer, related_verses, confidence = rows[position]
+            vector = self._normalize(vector)
+            if vector is None:
+                continue
+            try:
+                verses = json.loads(related_verses) if related_verses else []
+            except ValueError:
+                verses = []
+            vectors.append(vector)
+            entries.append({
+                'answer': answer,
+                'related_verses': verses,
+                'confidence': confidence or 0.0,
+                'created': created
+            })
+        # ورودی‌های تاریخچه قدیمی‌تر از ورودی‌های همین پروسه هستند
+        self._vectors = vectors + self._vectors
+        self._entries = entries + self._entries
+        self._matrix = None
+        self._loaded = True
+
+    def _expire(self, now: float):
+        """حذف ورودی‌های منقضی (ورودی‌ها به ترتیب زمان ساخت هستند)"""
+        floor = max(self._valid_after, now - self.ttl)
+        expired = 0
+        while expired < len(self._entries) and self._entries[expired]['created'] < floor:
+            expired += 1
+        overflow = max(0, len(self._entries) - expired - self.max_entries)
+        drop = expired + overflow
+        if drop:
+            del self._entries[:drop]
+            del self._vectors[:drop]
+            self._matrix = None
+
+    def lookup(self, embedding: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+        """پاسخ ذخیره‌شده نزدیک‌ترین سوال، اگر شباهت از آستانه بیشتر باشد"""
+        query = self._normalize(embedding) if embedding is not None else None
+        if query is None:
+            return None
+
+        with self._lock:
+            if not self._loaded:
+                try:
+                    self._load()
+                except Exception as e:
+                    print(f"❌ خطا در بارگذاری کش پاسخ‌ها: {e}")
+                    self._loaded = True
+
+            now = time.time()
+            if now - self._checked_at > self.check_interval:
+                try:
+                    self._refresh_valid_after(now)
+                except Exception as e:
+                    print(f"❌ خطا در بررسی تغییر آیات: {e}")
+            self._expire(now)
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix = np.vstack(self._vectors)
+                if self._matrix.shape[1] == query.shape[0]:
+                    scores = self._matrix @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        self.hits += 1
+                        return dict(self._entries[best], similarity=float(scores[best]))
+
+            self.misses += 1
+            return None
+
+    def add(self, embedding: Optional[np.ndarray], answer: Dict[str, Any]):
+        """افزودن پاسخ تازه به کش"""
+        vector = self._normalize(embedding) if embedding is not None else None
+        # پاسخ جایگزین بدون آیه (مثلاً وقتی مرحله معنایی اجرا نشده) نباید برای سوالات مشابه تکرار شود
+        if vector is None or not answer.get('answer') or not answer.get('related_verses'):
+            return
+
+        with self._lock:
+            self._vectors.append(vector)
+            self._entries.append({
+                'answer': answer.get('answer'),
+                'related_verses': answer.get('related_verses', []),
+                'confidence': answer.get('confidence', 0.0),
+                'created': time.time()
+            })
+            self._matrix = None
+            self._expire(time.time())
+
+    def invalidate(self):
+        """باطل کردن همه ورودی‌ها (پس از تغییر آیات)"""
+        with self._lock:
+            self._vectors = []
+            self._entries = []
+            self._matrix = None
+            self._valid_after = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """آمار کش: تعداد ورودی‌ها و نرخ hit"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
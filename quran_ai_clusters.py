@@ -0,0 +1,440 @@
+# quran_ai_clusters.py
+"""
+خوشه‌بندی سوالات کاربران برای یافتن موضوعات بی‌پاسخ (تکمیل دستی QuranQA)
+
+منابع سوالات بازه اخیر:
+- quran_qa_history: embedding ذخیره‌شده و confidence پاسخ
+- AIQuestion و UserQuranChat: متن سوال (دسته‌ای encode می‌شود)؛ کم‌اطمینان
+  یعنی is_quranic نادرست یا چت بدون آیه مرتبط (پاسخ پیش‌فرض)
+
+حافظه محدود، مستقل از طول تاریخچه:
+1. سوالات تکه‌تکه خوانده و embedding نرمال‌شده آن‌ها در فایل موقت روی دیسک
+   نوشته می‌شود (در حافظه فقط فراداده کوچک هر سوال می‌ماند)
+2. MiniBatchKMeans با partial_fit روی تکه‌های memory-map آموزش می‌بیند
+3. گذر آخر برچسب هر تکه را پیش‌بینی و آمار خوشه‌ها را با bincount جمع می‌کند
+
+خوشه‌ها به ترتیب تعداد سوالات کم‌اطمینان و سپس حجم رتبه‌بندی و در جدول
+quran_question_clusters ذخیره می‌شوند؛ داشبورد /admin/ai آخرین اجرا را
+نشان می‌دهد. سوالات /ai/ask هم در AIQuestion و هم در quran_qa_history ثبت
+می‌شوند، پس تعداد هر منبع جداگانه گزارش می‌شود.
+
+نمونه:
+    python quran_ai_clusters.py --days 365 --clusters 30
+    python quran_ai_clusters.py --history-only
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from quran_ai_db import get_connection, default_db_path
+from quran_ai_codec import decode_embeddings
+from quran_ai_index import normalize_rows
+
+
+# یک تکه سوال: شناسه‌ها، متن‌ها، blobهای embedding (یا None)، confidence (nan: نامعلوم)، کم‌اطمینان
+QuestionChunk = namedtuple('QuestionChunk', ['ids', 'texts', 'blobs', 'confidence', 'low'])
+
+
+class HistorySource:
+    """سوالات quran_qa_history (دیتابیس هوش مصنوعی)"""
+
+    name = 'history'
+
+    def __init__(self, db_path: str, low_threshold: float = 0.35):
+        self.db_path = db_path
+        self.low_threshold = low_threshold
+
+    def iter_chunks(self, since: datetime, chunk_size: int) -> Iterator[QuestionChunk]:
+        conn = get_connection(self.db_path)
+        first = conn.execute(
+            "SELECT MIN(id) FROM quran_qa_history WHERE created_at >= ?",
+            (since.strftime('%Y-%m-%d %H:%M:%S'),)
+        ).fetchone()[0]
+        if first is None:
+            return
+        last_id = first - 1
+        while True:
+            rows = conn.execute("""
+                SELECT id, question, question_embedding, confidence FROM quran_qa_history
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            confidence = np.array([np.nan if r[3] is None else r[3] for r in rows], dtype=np.float32)
+            with np.errstate(invalid='ignore'):
+                low = confidence < self.low_threshold
+            yield QuestionChunk([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows],
+                                confidence, low)
+
+    def fetch_questions(self, ids: Sequence[int]) -> Dict[int, str]:
+        rows = get_connection(self.db_path).execute(f"""
+            SELECT id, question FROM quran_qa_history WHERE id IN ({','.join('?' * len(ids))})
+        """, list(ids)).fetchall()
+        return dict(rows)
+
+
+class ModelSource:
+    """سوالات یک مدل SQLAlchemy با ستون‌های id، question و created_at (نیازمند app context)"""
+
+    def __init__(self, name: str, model, low_column, is_low: Callable[[Any], bool]):
+        self.name = name
+        self.model = model
+        self.low_column = low_column
+        self.is_low = is_low
+
+    def iter_chunks(self, since: datetime, chunk_size: int) -> Iterator[QuestionChunk]:
+        model = self.model
+        last_id = 0
+        while True:
+            # فقط ستون‌های لازم (بدون متن پاسخ) و صفحه‌بندی با کلید اصلی
+            rows = model.query.with_entities(model.id, model.question, self.low_column).filter(
+                model.id > last_id, model.created_at >= since
+            ).order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield QuestionChunk([r[0] for r in rows], [r[1] for r in rows], None,
+                                np.full(len(rows), np.nan, dtype=np.float32),
+                                np.array([self.is_low(r[2]) for r in rows], dtype=bool))
+
+    def fetch_questions(self, ids: Sequence[int]) -> Dict[int, str]:
+        model = self.model
+        return dict(model.query.with_entities(model.id, model.question).filter(model.id.in_(list(ids))).all())
+
+
+def app_sources() -> List[ModelSource]:
+    """منابع دیتابیس برنامه: AIQuestion و UserQuranChat"""
+    from models import AIQuestion, UserQuranChat
+    return [
+        ModelSource('ai_questions', AIQuestion, AIQuestion.is_quranic, lambda is_quranic: is_quranic is False),
+        ModelSource('chats', UserQuranChat, UserQuranChat.related_verses, lambda related: not related),
+    ]
+
+
+def _model_dim(system) -> Optional[int]:
+    probe = system.get_embeddings(['قرآن'])
+    return None if probe is None else probe.shape[1]
+
+
+def _chunk_embeddings(system, chunk: QuestionChunk, dim: Optional[int]):
+    """embedding ردیف‌های تکه: blob ذخیره‌شده یا encode دسته‌ای؛ خروجی (ماتریس، اندیس ردیف‌ها)"""
+    vectors: List[Optional[np.ndarray]] = [None] * len(chunk.ids)
+    if chunk.blobs is not None:
+        decoded, valid = decode_embeddings(chunk.blobs)
+        if len(valid) and (dim is None or decoded.shape[1] == dim):
+            for row, position in zip(decoded, valid):
+                vectors[position] = row
+
+    # ردیف‌های بدون embedding یا با مدل قبلی (بُعد متفاوت)
+    missing = [i for i, vector in enumerate(vectors) if vector is None and chunk.texts[i]]
+    if missing:
+        encoded = system.get_embeddings([chunk.texts[i] for i in missing])
+        if encoded is not None and (dim is None or encoded.shape[1] == dim):
+            for i, row in zip(missing, encoded):
+                vectors[i] = row
+
+    positions = [i for i, vector in enumerate(vectors) if vector is not None]
+    if not positions:
+        return None, positions
+    return normalize_rows(np.stack([vectors[i] for i in positions])), positions
+
+
+def _spill_embeddings(system, sources, since: datetime, chunk_size: int, spill_path: str):
+    """گذر اول: نوشتن embeddingها در فایل و جمع کردن فراداده کوچک هر سوال"""
+    dim = _model_dim(system)
+    codes, ids, confidence, low = [], [], [], []
+    skipped = 0
+    with open(spill_path, 'wb') as spill:
+        for code, source in enumerate(sources):
+            for chunk in source.iter_chunks(since, chunk_size):
+                matrix, positions = _chunk_embeddings(system, chunk, dim)
+                skipped += len(chunk.ids) - len(positions)
+                if matrix is None:
+                    continue
+                dim = matrix.shape[1]
+                spill.write(matrix.tobytes())
+                codes.append(np.full(len(positions), code, dtype=np.int8))
+                ids.append(np.asarray(chunk.ids, dtype=np.int64)[positions])
+                confidence.append(chunk.confidence[positions])
+                low.append(chunk.low[positions])
+    if skipped:
+        print(f"⚠️ {skipped} سوال بدون embedding کنار گذاشته شد")
+    if not codes:
+        return 0, dim, None
+    meta = {
+        'codes': np.concatenate(codes),
+        'ids': np.concatenate(ids),
+        'confidence': np.concatenate(confidence),
+        'low': np.concatenate(low),
+    }
+    return len(meta['ids']), dim, meta
+
+
+def _fit(matrix: np.ndarray, n_clusters: int, chunk_size: int, epochs: int, seed: int):
+    """آموزش MiniBatchKMeans با partial_fit روی تکه‌های memory-map"""
+    from sklearn.cluster import MiniBatchKMeans
+
+    model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=chunk_size, random_state=seed)
+    rng = np.random.default_rng(seed)
+    starts = np.arange(0, len(matrix), chunk_size)
+    for epoch in range(epochs):
+        order = rng.permutation(len(starts))
+        if epoch == 0:
+            # اولین تکه (کامل) برای مقداردهی اولیه مراکز
+            order = np.concatenate([[0], order[order != 0]])
+        for start in starts[order]:
+            model.partial_fit(np.asarray(matrix[start:start + chunk_size]))
+    return model
+
+
+def _merge_nearest(best: List[list], labels: np.ndarray, distances: np.ndarray, offset: int,
+                   mask: np.ndarray, keep: int):
+    """
+    نگه داشتن keep ردیف نزدیک‌تر به مرکز هر خوشه (از ردیف‌های mask)
+
+    نمونه‌های هر خوشه فقط از ردیف‌های همان خوشه انتخاب می‌شوند:
+        >>> best = [[], [], []]
+        >>> labels = np.array([0, 1, 1, 1, 2])
+        >>> distances = np.array([0.1, 0.4, 0.2, 0.3, 0.5])
+        >>> _merge_nearest(best, labels, distances, 10, np.ones(5, dtype=bool), 3)
+        >>> [[index for _, index in examples] for examples in best]
+        [[10], [12, 13, 11], [14]]
+    """
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        return
+    order = rows[np.lexsort((distances[rows], labels[rows]))]
+    sorted_labels = labels[order]
+    bounds = np.searchsorted(sorted_labels, np.arange(len(best) + 1))
+    for cluster in np.flatnonzero(np.diff(bounds)):
+        top = order[bounds[cluster]:min(bounds[cluster + 1], bounds[cluster] + keep)]
+        merged = best[cluster] + [(float(distances[i]), offset + int(i)) for i in top]
+        best[cluster] = sorted(merged)[:keep]
+
+
+def _summarize(matrix: np.ndarray, model, meta: Dict[str, np.ndarray], n_sources: int,
+               chunk_size: int, keep: int) -> Dict[str, Any]:
+    """گذر آخر: برچسب هر تکه و آمار خوشه‌ها با bincount"""
+    k = model.n_clusters
+    centers = model.cluster_centers_.astype(np.float32)
+    size = np.zeros(k, dtype=np.int64)
+    low_count = np.zeros(k, dtype=np.int64)
+    confidence_sum = np.zeros(k)
+    confidence_n = np.zeros(k, dtype=np.int64)
+    by_source = np.zeros((k, n_sources), dtype=np.int64)
+    nearest_low: List[list] = [[] for _ in range(k)]
+    nearest_all: List[list] = [[] for _ in range(k)]
+
+    for start in range(0, len(matrix), chunk_size):
+        batch = np.asarray(matrix[start:start + chunk_size])
+        end = start + len(batch)
+        labels = model.predict(batch)
+        distances = np.linalg.norm(batch - centers[labels], axis=1)
+        low = meta['low'][start:end]
+        confidence = meta['confidence'][start:end]
+        known = ~np.isnan(confidence)
+
+        size += np.bincount(labels, minlength=k)
+        low_count += np.bincount(labels[low], minlength=k)
+        confidence_sum += np.bincount(labels[known], weights=confidence[known], minlength=k)
+        confidence_n += np.bincount(labels[known], minlength=k)
+        np.add.at(by_source, (labels, meta['codes'][start:end]), 1)
+        _merge_nearest(nearest_low, labels, distances, start, low, keep)
+        _merge_nearest(nearest_all, labels, distances, start, np.ones(len(batch), dtype=bool), keep)
+
+    return {
+        'size': size, 'low_count': low_count, 'confidence_sum': confidence_sum,
+        'confidence_n': confidence_n, 'by_source': by_source,
+        # نمونه‌ها ترجیحاً از سوالات کم‌اطمینان خوشه
+        'examples': [low_rows or all_rows for low_rows, all_rows in zip(nearest_low, nearest_all)],
+    }
+
+
+def _build_clusters(stats: Dict[str, Any], sources, meta: Dict[str, np.ndarray],
+                    examples: int) -> List[Dict[str, Any]]:
+    """ساخت خروجی رتبه‌بندی‌شده به همراه متن نمونه سوالات"""
+    wanted: Dict[int, List[int]] = {}
+    for rows in stats['examples']:
+        for _, row in rows:
+            wanted.setdefault(int(meta['codes'][row]), []).append(int(meta['ids'][row]))
+    texts = {code: sources[code].fetch_questions(ids) for code, ids in wanted.items()}
+
+    clusters = []
+    for cluster, size in enumerate(stats['size']):
+        if not size:
+            continue
+        sample = []
+        for _, row in stats['examples'][cluster]:
+            text = texts[int(meta['codes'][row])].get(int(meta['ids'][row]))
+            if text and text not in sample:
+                sample.append(text)
+        confidence_n = stats['confidence_n'][cluster]
+        clusters.append({
+            'size': int(size),
+            'low_confidence': int(stats['low_count'][cluster]),
+            'low_ratio': float(stats['low_count'][cluster] / size),
+            'avg_confidence': float(stats['confidence_sum'][cluster] / confidence_n) if confidence_n else None,
+            'sources': {source.name: int(count) for source, count in zip(sources, stats['by_source'][cluster]) if count},
+            'examples': sample[:examples],
+        })
+
+    clusters.sort(key=lambda c: (c['low_confidence'], c['size']), reverse=True)
+    for rank, cluster in enumerate(clusters, 1):
+        cluster['rank'] = rank
+    return clusters
+
+
+def ensure_cluster_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_cluster_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            n_questions INTEGER,
+            n_clusters INTEGER,
+            days INTEGER,
+            duration FLOAT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_question_clusters (
+            run_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            size INTEGER,
+            low_confidence INTEGER,
+            low_ratio FLOAT,
+            avg_confidence FLOAT,
+            sources TEXT,
+            examples TEXT,
+            PRIMARY KEY (run_id, rank),
+            FOREIGN KEY (run_id) REFERENCES quran_cluster_runs(id)
+        )
+    """)
+    conn.commit()
+
+
+def save_clusters(db_path: str, clusters: List[Dict[str, Any]], n_questions: int, days: int,
+                  duration: float, keep_runs: int = 5) -> int:
+    """ذخیره یک اجرا و حذف اجراهای قدیمی‌تر از keep_runs"""
+    conn = get_connection(db_path)
+    ensure_cluster_tables(conn)
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO quran_cluster_runs (n_questions, n_clusters, days, duration)
+            VALUES (?, ?, ?, ?)
+        """, (n_questions, len(clusters), days, duration))
+        run_id = cursor.lastrowid
+        cursor.executemany("""
+            INSERT INTO quran_question_clusters
+            (run_id, rank, size, low_confidence, low_ratio, avg_confidence, sources, examples)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(run_id, c['rank'], c['size'], c['low_confidence'], c['low_ratio'], c['avg_confidence'],
+               json.dumps(c['sources'], ensure_ascii=False), json.dumps(c['examples'], ensure_ascii=False))
+              for c in clusters])
+        cursor.execute("""
+            DELETE FROM quran_question_clusters WHERE run_id IN (
+                SELECT id FROM quran_cluster_runs ORDER BY id DESC LIMIT -1 OFFSET ?
+            )
+        """, (keep_runs,))
+        cursor.execute("""
+            DELETE FROM quran_cluster_runs WHERE id IN (
+                SELECT id FROM quran_cluster_runs ORDER BY id DESC LIMIT -1 OFFSET ?
+            )
+        """, (keep_runs,))
+    return run_id
+
+
+def cluster_questions(system, sources, days: int = 365, n_clusters: int = 30, chunk_size: int = 2048,
+                      epochs: int = 3, examples: int = 5, seed: int = 0) -> Optional[int]:
+    """اجرای کامل job؛ شناسه اجرای ذخیره‌شده را برمی‌گرداند"""
+    start = time.time()
+    since = datetime.utcnow() - timedelta(days=days)
+
+    with tempfile.TemporaryDirectory(prefix='quran-clusters-') as workdir:
+        spill_path = os.path.join(workdir, 'embeddings.f32')
+        n, dim, meta = _spill_embeddings(system, sources, since, chunk_size, spill_path)
+        if not n:
+            print("⚠️ سوالی با embedding در این بازه پیدا نشد")
+            return None
+
+        k = min(n_clusters, n)
+        chunk_size = max(chunk_size, k)
+        matrix = np.memmap(spill_path, dtype=np.float32, mode='r', shape=(n, dim))
+        model = _fit(matrix, k, chunk_size, epochs, seed)
+        stats = _summarize(matrix, model, meta, len(sources), chunk_size, examples * 3)
+        del matrix
+
+    clusters = _build_clusters(stats, sources, meta, examples)
+    duration = time.time() - start
+    run_id = save_clusters(system.db_path, clusters, n, days, duration)
+    print(f"✅ {n} سوال در {len(clusters)} خوشه در {duration:.2f} ثانیه (اجرای {run_id})")
+    return run_id
+
+
+def get_latest_clusters(db_path: Optional[str] = None, limit: int = 10) -> Optional[Dict[str, Any]]:
+    """آخرین اجرای خوشه‌بندی برای داشبورد؛ None اگر هنوز اجرا نشده"""
+    conn = get_connection(db_path or default_db_path())
+    try:
+        run = conn.execute("""
+            SELECT id, n_questions, n_clusters, days, created_at FROM quran_cluster_runs
+            ORDER BY id DESC LIMIT 1
+        """).fetchone()
+    except Exception:
+        return None
+    if run is None:
+        return None
+
+    rows = conn.execute("""
+        SELECT rank, size, low_confidence, low_ratio, avg_confidence, sources, examples
+        FROM quran_question_clusters WHERE run_id = ? ORDER BY rank LIMIT ?
+    """, (run[0], limit)).fetchall()
+    return {
+        'run_id': run[0],
+        'n_questions': run[1],
+        'n_clusters': run[2],
+        'days': run[3],
+        'created_at': run[4],
+        'clusters': [{
+            'rank': r[0],
+            'size': r[1],
+            'low_confidence': r[2],
+            'low_ratio': r[3],
+            'avg_confidence': r[4],
+            'sources': json.loads(r[5] or '{}'),
+            'examples': json.loads(r[6] or '[]'),
+        } for r in rows]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="خوشه‌بندی سوالات برای یافتن موضوعات بی‌پاسخ")
+    parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    parser.add_argument('--days', type=int, default=365, help='بازه سوالات (روز)')
+    parser.add_argument('--clusters', type=int, default=30, help='تعداد خوشه‌ها')
+    parser.add_argument('--chunk-size', type=int, default=2048, help='تعداد سوالات هر تکه')
+    parser.add_argument('--epochs', type=int, default=3, help='تعداد گذرهای partial_fit')
+    parser.add_argument('--low-confidence', type=float, default=0.35, help='آستانه confidence کم')
+    parser.add_argument('--history-only', action='store_true', help='فقط quran_qa_history (بدون دیتابیس برنامه)')
+    args = parser.parse_args()
+
+    from quran_ai_complete import QuranAISystem
+    ai = QuranAISystem(args.db or default_db_path())
+    sources = [HistorySource(ai.db_path, args.low_confidence)]
+    options = dict(days=args.days, n_clusters=args.clusters, chunk_size=args.chunk_size, epochs=args.epochs)
+
+    if args.history_only:
+        cluster_questions(ai, sources, **options)
+    else:
+        from app import app
+        with app.app_context():
+            cluster_questions(ai, sources + app_sources(), **options)
+    ai.history_writer.close()
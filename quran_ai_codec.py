@@ -0,0 +1,272 @@
+# quran_ai_codec.py
+"""
+فشرده‌سازی embeddingهای ذخیره‌شده در دیتابیس
+
+قالب‌ها:
+- float32: بایت‌های خام بردار (قالب قدیمی، بدون سرآیند)
+- float16: سرآیند + نیم‌دقت (نصف حجم)
+- int8: سرآیند + ضریب مقیاس float32 هر بردار + مقادیر int8 (حدود یک‌چهارم حجم)
+
+سرآیند ۴ بایتی است: b'QE' + نوع قالب + نسخه. بایت آخر (1) اگر به عنوان
+float32 خوانده شود عددی در حد 1e-38 می‌سازد که در embedding واقعی رخ
+نمی‌دهد، پس blobهای قدیمی float32 بدون ابهام تشخیص داده می‌شوند.
+
+سنجش recall@5، حافظه و تأخیر نسبت به float32:
+    python quran_ai_codec.py bench
+تبدیل embeddingهای موجود به قالب فشرده:
+    python quran_ai_codec.py recode --codec float16 --history-codec int8
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+CODEC_FLOAT32 = 'float32'
+CODEC_FLOAT16 = 'float16'
+CODEC_INT8 = 'int8'
+CODECS = (CODEC_FLOAT32, CODEC_FLOAT16, CODEC_INT8)
+
+_MAGIC = b'QE'
+_VERSION = 1
+_TAGS = {CODEC_FLOAT16: b'h', CODEC_INT8: b'b'}
+_HEADERS = {codec: _MAGIC + tag + bytes([_VERSION]) for codec, tag in _TAGS.items()}
+_HEADER_SIZE = 4
+
+
+def encode_embedding(vector: np.ndarray, codec: Optional[str] = None) -> bytes:
+    """تبدیل بردار به blob با قالب داده‌شده (پیش‌فرض: QURAN_AI_EMBEDDING_CODEC)"""
+    codec = codec or Config.QURAN_AI_EMBEDDING_CODEC
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+
+    if codec == CODEC_FLOAT32:
+        return vector.tobytes()
+    if codec == CODEC_FLOAT16:
+        return _HEADERS[CODEC_FLOAT16] + vector.astype('<f2').tobytes()
+    if codec == CODEC_INT8:
+        # مقیاس جداگانه برای هر بردار: بزرگ‌ترین مقدار مطلق به 127 نگاشت می‌شود
+        max_abs = float(np.abs(vector).max()) if len(vector) else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return _HEADERS[CODEC_INT8] + np.float32(scale).astype('<f4').tobytes() + quantized.tobytes()
+    raise ValueError(f"قالب embedding ناشناخته: {codec}")
+
+
+def blob_codec(blob: bytes) -> Optional[str]:
+    """تشخیص قالب یک blob؛ None برای blob نامعتبر"""
+    if not blob:
+        return None
+    header = bytes(blob[:_HEADER_SIZE])
+    for codec, codec_header in _HEADERS.items():
+        if header == codec_header:
+            return codec
+    if len(blob) % 4 == 0:
+        return CODEC_FLOAT32
+    return None
+
+
+def _decode_group(codec: str, blobs: Sequence[bytes]) -> np.ndarray:
+    """باز کردن یک گروه blob هم‌قالب و هم‌اندازه با یک frombuffer"""
+    data = b''.join(blobs)
+    count = len(blobs)
+    if codec == CODEC_FLOAT32:
+        return np.frombuffer(data, dtype='<f4').reshape(count, -1).astype(np.float32, copy=False)
+
+    records = np.frombuffer(data, dtype=np.uint8).reshape(count, -1)[:, _HEADER_SIZE:]
+    if codec == CODEC_FLOAT16:
+        return np.ascontiguousarray(records).view('<f2').astype(np.float32)
+    scales = np.ascontiguousarray(records[:, :4]).view('<f4').astype(np.float32)
+    values = np.ascontiguousarray(records[:, 4:]).view(np.int8)
+    return values.astype(np.float32) * scales
+
+
+def decode_embedding(blob: bytes) -> Optional[np.ndarray]:
+    """تبدیل یک blob به بردار float32"""
+    codec = blob_codec(blob)
+    if codec is None:
+        return None
+    return _decode_group(codec, [blob])[0]
+
+
+def decode_embeddings(blobs: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    باز کردن دسته‌ای blobها (قالب‌های مختلف می‌توانند کنار هم باشند)
+    خروجی: (ماتریس float32 ردیف‌های معتبر، اندیس آن ردیف‌ها در ورودی)
+    ردیف‌هایی که قالب یا بُعدشان با اولین ردیف معتبر یکسان نیست کنار گذاشته می‌شوند.
+    """
+    groups: Dict[Tuple[str, int], List[int]] = {}
+    for i, blob in enumerate(blobs):
+        codec = blob_codec(blob)
+        if codec is not None:
+            groups.setdefault((codec, len(blob)), []).append(i)
+
+    dim = None
+    decoded = []
+    for (codec, _), positions in groups.items():
+        block = _decode_group(codec, [blobs[i] for i in positions])
+        if dim is None:
+            dim = block.shape[1]
+        if block.shape[1] != dim:
+            continue
+        decoded.append((positions, block))
+
+    if not decoded:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+    positions = np.concatenate([np.asarray(p, dtype=np.int64) for p, _ in decoded])
+    matrix = np.concatenate([block for _, block in decoded])
+    order = np.argsort(positions, kind='stable')
+    return np.ascontiguousarray(matrix[order]), positions[order]
+
+
+def quantize_matrix_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """کوانتیزه کردن سطری ماتریس به int8؛ خروجی: (مقادیر int8، مقیاس هر سطر)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    values = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def score_int8(values: np.ndarray, scales: np.ndarray, query: np.ndarray,
+               chunk_size: int = 4096) -> np.ndarray:
+    """
+    امتیاز ضرب داخلی مستقیم روی مقادیر int8، بدون ساختن ماتریس float32 کامل
+    (تکه‌تکه باز می‌شود تا حافظه موقت محدود بماند)
+    """
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(len(values), dtype=np.float32)
+    for start in range(0, len(values), chunk_size):
+        block = values[start:start + chunk_size]
+        scores[start:start + chunk_size] = (block @ query) * scales[start:start + chunk_size]
+    return scores
+
+
+def benchmark(db_path: str, top_k: int = 5, n_queries: int = 200, noise: float = 0.05,
+              seed: int = 0, synthetic: int = 0, dim: int = 384) -> List[Dict]:
+    """
+    سنجش recall@k، حافظه و تأخیر هر قالب در برابر float32 (مرجع)
+    پرسش‌ها بردارهای خود آیات با کمی نویز هستند؛ با synthetic>0 به جای
+    دیتابیس، مجموعه‌ای تصادفی با همان تعداد آیه ساخته می‌شود.
+    """
+    from quran_ai_index import load_verse_matrix, normalize_rows, exact_search, top_k_indices
+
+    rng = np.random.default_rng(seed)
+    if synthetic:
+        matrix = normalize_rows(rng.normal(0, 1, (synthetic, dim)))
+    else:
+        matrix, _ = load_verse_matrix(db_path)
+    if not len(matrix):
+        print("⚠️ هیچ آیه‌ای با embedding پیدا نشد")
+        return []
+
+    picks = rng.choice(len(matrix), min(n_queries, len(matrix)), replace=False)
+    queries = normalize_rows(matrix[picks] + rng.normal(0, noise, (len(picks), matrix.shape[1])))
+    k = min(top_k, len(matrix))
+    truth = [set(exact_search(matrix, q, k)[0].tolist()) for q in queries]
+
+    def measure(name, stored_bytes, decode, search):
+        start = time.perf_counter()
+        searchable = decode()
+        decode_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        found = [search(searchable, q) for q in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(expected & set(got.tolist())) for expected, got in zip(truth, found))
+        return {
+            'codec': name,
+            'bytes_per_vector': stored_bytes / len(matrix),
+            'memory_mb': stored_bytes / (1024 * 1024),
+            'decode_ms': decode_ms,
+            'latency_ms': latency_ms,
+            'recall': hits / (len(queries) * k)
+        }
+
+    results = []
+    for codec in CODECS:
+        blobs = [encode_embedding(vector, codec) for vector in matrix]
+        stored = sum(len(blob) for blob in blobs)
+        results.append(measure(
+            codec, stored,
+            lambda blobs=blobs: normalize_rows(decode_embeddings(blobs)[0]),
+            lambda m, q: exact_search(m, q, k)[0]
+        ))
+
+    # int8 بدون باز کردن: امتیازدهی مستقیم روی مقادیر کوانتیزه‌شده
+    values, scales = quantize_matrix_int8(matrix)
+    results.append(measure(
+        'int8-direct', values.nbytes + scales.nbytes,
+        lambda: (values, scales),
+        lambda m, q: top_k_indices(score_int8(m[0], m[1], q), k)
+    ))
+
+    print(f"{'قالب':<12}{'bytes/vec':>11}{'MB':>9}{'decode ms':>11}{'ms/query':>10}{'recall@' + str(k):>11}")
+    for r in results:
+        print(f"{r['codec']:<12}{r['bytes_per_vector']:>11.0f}{r['memory_mb']:>9.2f}"
+              f"{r['decode_ms']:>11.1f}{r['latency_ms']:>10.3f}{r['recall']:>11.3f}")
+    return results
+
+
+def recode(db_path: str, codec: str, history_codec: str, batch_size: int = 500) -> Dict[str, int]:
+    """تبدیل embeddingهای آیات و تاریخچه به قالب‌های داده‌شده (دسته‌ای، با executemany)"""
+    from quran_ai_db import get_connection
+
+    conn = get_connection(db_path)
+    counts = {}
+    for table, column, target in (('quran_verses_ai', 'embedding', codec),
+                                  ('quran_qa_history', 'question_embedding', history_codec)):
+        converted = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, {column} FROM {table} WHERE id > ? AND {column} IS NOT NULL ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for row_id, blob in rows:
+                if blob_codec(blob) == target:
+                    continue
+                vector = decode_embedding(blob)
+                if vector is not None:
+                    updates.append((encode_embedding(vector, target), row_id))
+            if updates:
+                with conn:
+                    conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+                converted += len(updates)
+        counts[table] = converted
+        print(f"✅ {converted} ردیف از {table} به قالب {target} تبدیل شد")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="قالب ذخیره embeddingهای هوش مصنوعی قرآنی")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bench_parser = subparsers.add_parser('bench', help='سنجش recall، حافظه و تأخیر')
+    bench_parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    bench_parser.add_argument('--k', type=int, default=5)
+    bench_parser.add_argument('--queries', type=int, default=200)
+    bench_parser.add_argument('--synthetic', type=int, default=0,
+                              help='تعداد بردار تصادفی به جای دیتابیس (مثلاً 6236)')
+    bench_parser.add_argument('--dim', type=int, default=384)
+
+    recode_parser = subparsers.add_parser('recode', help='تبدیل embeddingهای ذخیره‌شده')
+    recode_parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    recode_parser.add_argument('--codec', choices=CODECS, default=Config.QURAN_AI_EMBEDDING_CODEC)
+    recode_parser.add_argument('--history-codec', choices=CODECS, default=Config.QURAN_AI_HISTORY_EMBEDDING_CODEC)
+
+    args = parser.parse_args()
+    from quran_ai_db import default_db_path
+    db_path = args.db or default_db_path()
+    if args.command == 'bench':
+        benchmark(db_path, top_k=args.k, n_queries=args.queries, synthetic=args.synthetic, dim=args.dim)
+    else:
+        recode(db_path, args.codec, args.history_codec)
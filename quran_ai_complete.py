@@ -4,21 +4,23 @@
 برای جستجوی معنایی و پردازش زبان طبیعی
 """
 
-import sqlite3
 import json
 import numpy as np
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 import hashlib
+import random
 import re
+import threading
+import time
+from collections import OrderedDict
 
 # برای embedding
-try:
-    from sentence_transformers import SentenceTransformer
-    import torch
-    EMBEDDING_AVAILABLE = True
-except ImportError:
-    EMBEDDING_AVAILABLE = False
+# خود import (torch و sentence-transformers) چند ثانیه طول می‌کشد، پس اینجا فقط
+# وجود بسته بررسی می‌شود و import واقعی هنگام بارگذاری مدل انجام می‌شود
+from quran_ai_encoders import EMBEDDING_MODEL_NAME, TORCH_AVAILABLE, create_encoder, encoder_available
+EMBEDDING_AVAILABLE = encoder_available()
+if not TORCH_AVAILABLE:
     print("⚠️ sentence-transformers نصب نیست. برای نصب: pip install sentence-transformers")
 
 # برای پردازش زبان فارسی
@@ -31,31 +33,274 @@ except ImportError:
 
 import os
 
+from config import Config
+from quran_ai_db import get_connection, default_db_path
+from quran_ai_codec import encode_embedding
+from quran_ai_index import load_verse_matrix, exact_search, exact_search_batch, normalize_rows, load_index_for_db
+from quran_ai_fts import ensure_fts, search_fts
+from quran_ai_history import QAHistoryWriter
+from quran_ai_answer_cache import SemanticAnswerCache
+from quran_ai_matcher import get_matcher
+from text_normalizer import normalize_text
+from quran_verse_sampler import get_ai_verse_sampler
+from quran_ai_profile import ensure_profile_table, update_from_history_batch, apply_feedback, preferred_topic
+from quran_ai_stats import ensure_stat_counters
+
+
+DAILY_VERSE_COLUMNS = 'surah_name, verse_number, arabic_text, translation'
+
+
+def verse_embedding_text(verse: Dict) -> str:
+    """متن ورودی مدل برای یک آیه: ترکیب متن عربی و فارسی برای embedding بهتر"""
+    return f"{verse.get('arabic_text') or ''} {verse.get('persian_text') or ''} {verse.get('translation') or ''}"
+
+
+VERSE_KEY_INDEX = 'idx_quran_verses_ai_key'
+
+
+def ensure_verse_key(conn) -> int:
+    """
+    ایندکس یکتای (surah_number, verse_number) که نوشتن آیات روی آن UPSERT می‌شود
+    آیات تکراری موجود پیش از ساخت ایندکس ادغام می‌شوند: قدیمی‌ترین شناسه (که
+    verse_topic_mapping و quran_suggestions به آن اشاره می‌کنند) می‌ماند و محتوای
+    تازه‌ترین ردیف را می‌گیرد. تریگرهای شمارنده و FTS حذف‌ها را دنبال می‌کنند.
+    خروجی: تعداد ردیف‌های تکراری حذف‌شده (commit با فراخواننده)
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                    (VERSE_KEY_INDEX,)).fetchone():
+        return 0
+
+    conn.execute("DROP TABLE IF EXISTS temp.verse_duplicates")
+    conn.execute("""
+        CREATE TEMP TABLE verse_duplicates AS
+        SELECT v.id AS id, k.keep_id AS keep_id, k.latest_id AS latest_id
+        FROM quran_verses_ai v
+        JOIN (
+            SELECT surah_number, verse_number, MIN(id) AS keep_id, MAX(id) AS latest_id
+            FROM quran_verses_ai
+            WHERE surah_number IS NOT NULL AND verse_number IS NOT NULL
+            GROUP BY surah_number, verse_number
+            HAVING COUNT(*) > 1
+        ) k ON v.surah_number = k.surah_number AND v.verse_number = k.verse_number
+    """)
+    conn.execute("""
+        UPDATE quran_verses_ai
+        SET (surah_name, arabic_text, persian_text, translation, embedding, keywords, topics) = (
+            SELECT l.surah_name, l.arabic_text, l.persian_text, l.translation, l.embedding, l.keywords, l.topics
+            FROM verse_duplicates d JOIN quran_verses_ai l ON l.id = d.latest_id
+            WHERE d.id = quran_verses_ai.id
+        )
+        WHERE id IN (SELECT id FROM verse_duplicates WHERE id = keep_id AND latest_id != keep_id)
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO verse_topic_mapping (verse_id, topic_id, relevance)
+        SELECT d.keep_id, m.topic_id, m.relevance
+        FROM verse_topic_mapping m JOIN verse_duplicates d ON m.verse_id = d.id
+        WHERE d.id != d.keep_id
+    """)
+    conn.execute("""
+        DELETE FROM verse_topic_mapping
+        WHERE verse_id IN (SELECT id FROM verse_duplicates WHERE id != keep_id)
+    """)
+    conn.execute("""
+        UPDATE quran_suggestions
+        SET verse_id = (SELECT keep_id FROM verse_duplicates WHERE id = quran_suggestions.verse_id)
+        WHERE verse_id IN (SELECT id FROM verse_duplicates WHERE id != keep_id)
+    """)
+    removed = conn.execute("""
+        DELETE FROM quran_verses_ai
+        WHERE id IN (SELECT id FROM verse_duplicates WHERE id != keep_id)
+    """).rowcount
+    conn.execute("DROP TABLE temp.verse_duplicates")
+
+    conn.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS {VERSE_KEY_INDEX}
+        ON quran_verses_ai (surah_number, verse_number)
+    """)
+    return removed
+
+
+class EmbeddingCache:
+    """کش LRU با انقضای زمانی (TTL) برای embedding متن سوالات"""
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> (زمان انقضا، embedding)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(text: str) -> str:
+        """کلید نرمال‌شده: یکسان‌سازی حروف عربی/فارسی، اعراب، نیم‌فاصله، حروف کوچک و فاصله‌ها"""
+        return normalize_text(text)
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, embedding: np.ndarray):
+        # بردار کش‌شده بین فراخواننده‌ها مشترک است و نباید تغییر کند
+        embedding.setflags(write=False)
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, embedding)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
 class QuranAISystem:
     """سیستم هوش مصنوعی قرآنی"""
     
-    def __init__(self, db_path: str = 'instance/seraj.db'):
-        self.db_path = db_path
+    # کلیدواژه‌های تشخیص موضوع و احساس (matcher کامپایل‌شده‌شان کش می‌شود)
+    TOPIC_KEYWORDS = {
+        'توحید': ['خدا', 'الله', 'رب', 'اله', 'وحدانیت', 'یکتا'],
+        'نبوت': ['پیامبر', 'رسول', 'نبی', 'محمد', 'خاتم'],
+        'معاد': ['قیامت', 'آخرت', 'مرگ', 'پس از مرگ', 'رستاخیز', 'بهشت', 'جهنم'],
+        'اخلاق': ['اخلاق', 'رفتار', 'پاکی', 'صداقت', 'عدالت', 'انصاف', 'بخشش'],
+        'عبادت': ['نماز', 'روزه', 'حج', 'زکات', 'عبادت', 'پرستش', 'سجده'],
+        'خانواده': ['خانواده', 'همسر', 'فرزند', 'والدین', 'ازدواج', 'طلاق'],
+        'صبر': ['صبر', 'شکیبایی', 'استقامت', 'پایداری'],
+        'توکل': ['توکل', 'اعتماد', 'توسل', 'یاوری']
+    }
+    
+    SENTIMENT_WORDS = {
+        'positive': ['خوب', 'عالی', 'زیبا', 'امید', 'شادی', 'نعمت', 'رحمت', 'بخشش', 'محبت'],
+        'negative': ['بد', 'شر', 'گناه', 'عذاب', 'دوزخ', 'ناراحتی', 'اندوه', 'ترس', 'نگرانی']
+    }
+    
+    # وضعیت‌های بارگذاری مدل
+    MODEL_UNAVAILABLE = 'unavailable'
+    MODEL_LOADING = 'loading'
+    MODEL_READY = 'ready'
+    MODEL_FAILED = 'failed'
+    
+    def __init__(self, db_path: Optional[str] = None, ann_nprobe: int = 8,
+                 embedding_cache_size: int = 1024, embedding_cache_ttl: float = 3600,
+                 background_model: bool = False):
+        self.db_path = db_path or default_db_path()
         self.model = None
-        self._init_model()
+        # تا آماده شدن مدل، جستجو از مسیر کلیدواژه‌ای انجام می‌شود
+        self.model_state = self.MODEL_UNAVAILABLE
+        self.model_load_time = None
+        self.model_error = None
+        self._model_thread = None
+        self._model_lock = threading.Lock()
+        self._model_ready = threading.Event()
+        # کش embedding سوالات (مشترک بین جستجو و ذخیره تاریخچه)
+        self.embedding_cache = EmbeddingCache(embedding_cache_size, embedding_cache_ttl)
+        # نوشتن تاریخچه پرسش و پاسخ در thread پس‌زمینه
+        # (پروفایل موضوعی کاربران در همان تراکنش به‌روز می‌شود)
+        self.history_writer = QAHistoryWriter(self.db_path, after_write=update_from_history_batch)
+        # پاسخ‌های قبلی برای سوالات تقریباً تکراری
+        self.answer_cache = SemanticAnswerCache(self.db_path, Config.QURAN_AI_ANSWER_CACHE_THRESHOLD,
+                                                Config.QURAN_AI_ANSWER_CACHE_TTL)
+        # تعداد لیست‌های بررسی‌شده در ایندکس ANN (تعادل دقت و سرعت)
+        self.ann_nprobe = ann_nprobe
+        self._ann_index = None
+        # ماتریس embedding آیات: (ماتریس نرمال‌شده float32، اطلاعات ردیف‌ها)
+        # یک بار در هر پروسه بارگذاری و پس از افزودن آیات باطل می‌شود
+        self._verse_index = None
+        self._verse_index_lock = threading.Lock()
+        if background_model:
+            self.start_model_loading()
+        else:
+            self._init_model()
         self._init_database()
+        self._ann_index = load_index_for_db(self.db_path)
         
     def _init_model(self):
         """بارگذاری مدل embedding"""
-        if EMBEDDING_AVAILABLE:
-            try:
-                # مدل multilingual برای پشتیبانی از فارسی و عربی
-                self.model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
-                print("✅ مدل هوش مصنوعی بارگذاری شد")
-            except Exception as e:
-                print(f"❌ خطا در بارگذاری مدل: {e}")
-                self.model = None
-        else:
+        if Config.QURAN_AI_EMBED_SERVER:
+            # مدل در پروسه سرور است؛ اینجا فقط کلاینت ساخته می‌شود
+            from quran_ai_embed_server import EmbeddingClient
+            self.model = EmbeddingClient(Config.QURAN_AI_EMBED_SERVER, Config.QURAN_AI_EMBED_TIMEOUT)
+            self.model_state = self.MODEL_READY
+            self.model_load_time = 0.0
+            print(f"✅ اتصال به سرور embedding: {Config.QURAN_AI_EMBED_SERVER}")
+            self._model_ready.set()
+            return
+        
+        if not EMBEDDING_AVAILABLE:
             print("⚠️ مدل embedding در دسترس نیست")
+            self._model_ready.set()
+            return
+        
+        self.model_state = self.MODEL_LOADING
+        start_time = time.time()
+        try:
+            # پشتوانه encode از Config (پیش‌فرض: مدل multilingual برای فارسی و عربی)
+            self.model = create_encoder(Config.QURAN_AI_ENCODER)
+            self.model_state = self.MODEL_READY
+            print("✅ مدل هوش مصنوعی بارگذاری شد")
+        except Exception as e:
+            print(f"❌ خطا در بارگذاری مدل: {e}")
+            self.model = None
+            self.model_error = str(e)
+            self.model_state = self.MODEL_FAILED
+        finally:
+            self.model_load_time = time.time() - start_time
+            self._model_ready.set()
+    
+    def start_model_loading(self):
+        """بارگذاری مدل در thread پس‌زمینه تا راه‌اندازی برنامه منتظر نماند"""
+        with self._model_lock:
+            if self._model_thread is not None or self._model_ready.is_set():
+                return
+            if EMBEDDING_AVAILABLE:
+                self.model_state = self.MODEL_LOADING
+            self._model_thread = threading.Thread(target=self._init_model, name='quran-ai-model-loader', daemon=True)
+            self._model_thread.start()
+    
+    def wait_for_model(self, timeout: Optional[float] = None) -> bool:
+        """انتظار برای پایان بارگذاری مدل؛ خروجی: آیا مدل آماده است"""
+        self._model_ready.wait(timeout)
+        return self.model is not None
+    
+    def get_model_status(self) -> Dict[str, Any]:
+        """وضعیت مدل embedding برای /health"""
+        status = {
+            'state': self.model_state,
+            'model': EMBEDDING_MODEL_NAME,
+            'encoder': Config.QURAN_AI_ENCODER,
+            'load_time': round(self.model_load_time, 3) if self.model_load_time is not None else None,
+            'error': self.model_error
+        }
+        if Config.QURAN_AI_EMBED_SERVER and self.model is not None:
+            # با سرور مشترک، آماده بودن یعنی در دسترس بودن سرور
+            status['server'] = Config.QURAN_AI_EMBED_SERVER
+            if not self.model.ping():
+                status['state'] = self.MODEL_FAILED
+                status['error'] = 'سرور embedding در دسترس نیست'
+        return status
     
     def _init_database(self):
         """ایجاد جداول دیتابیس در صورت نیاز"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         # جدول آیات با embedding
@@ -131,22 +376,53 @@ class QuranAISystem:
             )
         """)
         
-        conn.commit()
-        conn.close()
+        # کلید یکتای آیه (ادغام تکراری‌های ورودهای قبلی)
+        with conn:
+            removed = ensure_verse_key(conn)
+        if removed:
+            print(f"⚠️ {removed} آیه تکراری ادغام و حذف شد")
+        
+        # پروفایل موضوعی کاربران (آیه روز شخصی)
+        if ensure_profile_table(conn):
+            print("✅ پروفایل موضوعی کاربران از تاریخچه ساخته شد")
+        
+        # شمارنده‌های آماری (به‌روزرسانی با تریگر در همان تراکنش)
+        ensure_stat_counters(conn)
+        
+        # ایندکس متن کامل برای جستجوی کلیدواژه‌ای
+        self._fts_enabled = ensure_fts(conn)
         print("✅ جداول هوش مصنوعی قرآنی ایجاد/بررسی شدند")
     
     def get_embedding(self, text: str) -> Optional[np.ndarray]:
-        """دریافت بردار embedding برای یک متن"""
+        """دریافت بردار embedding برای یک متن (با کش LRU)"""
         if self.model is None or not text:
             return None
         
+        key = EmbeddingCache.make_key(text)
+        embedding = self.embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+        
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
+            embedding = np.asarray(self.model.encode(text, convert_to_numpy=True), dtype=np.float32)
+            self.embedding_cache.set(key, embedding)
             return embedding
         except Exception as e:
             print(f"خطا در تولید embedding: {e}")
             return None
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """آمار کش embedding (تعداد hit و miss)"""
+        return self.embedding_cache.stats()
+    
+    def get_answer_cache_stats(self) -> Dict[str, Any]:
+        """آمار کش معنایی پاسخ‌ها (نرخ hit)"""
+        return self.answer_cache.stats()
+    
+    def get_history_writer_stats(self) -> Dict[str, Any]:
+        """وضعیت صف نوشتن تاریخچه (عمق صف و تعداد ردیف‌های کنار گذاشته)"""
+        return self.history_writer.stats()
+    
     def extract_keywords(self, text: str) -> List[str]:
         """استخراج کلمات کلیدی از متن"""
         keywords = []
@@ -181,27 +457,60 @@ class QuranAISystem:
         
         return keywords[:10]  # حداکثر 10 کلمه کلیدی
     
-    def add_quran_verses(self, verses_data: List[Dict]):
-        """اضافه کردن آیات قرآن به دیتابیس با embedding"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_embeddings(self, texts: List[str], batch_size: int = 64) -> Optional[np.ndarray]:
+        """دریافت embedding چند متن با یک فراخوانی دسته‌ای مدل"""
+        if self.model is None or not texts:
+            return None
         
-        for verse in verses_data:
-            # ترکیب متن عربی و فارسی برای embedding بهتر
-            combined_text = f"{verse.get('arabic_text', '')} {verse.get('persian_text', '')} {verse.get('translation', '')}"
-            
-            # تولید embedding
-            embedding = self.get_embedding(combined_text)
-            embedding_blob = embedding.tobytes() if embedding is not None else None
+        try:
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+            return np.asarray(embeddings, dtype=np.float32)
+        except Exception as e:
+            print(f"خطا در تولید embedding: {e}")
+            return None
+    
+    def get_query_embeddings(self, texts: List[str], batch_size: int = 64) -> List[Optional[np.ndarray]]:
+        """
+        embedding چند سوال: موارد موجود در کش LRU خوانده می‌شوند و بقیه (بدون تکرار)
+        با یک فراخوانی دسته‌ای مدل ساخته و در کش قرار می‌گیرند
+        """
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        if self.model is None:
+            return embeddings
+        
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            key = EmbeddingCache.make_key(text)
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                missing.setdefault(key, []).append(i)
+        
+        if missing:
+            encoded = self.get_embeddings([texts[positions[0]] for positions in missing.values()], batch_size)
+            if encoded is not None:
+                for (key, positions), embedding in zip(missing.items(), encoded):
+                    self.embedding_cache.set(key, embedding)
+                    for i in positions:
+                        embeddings[i] = embedding
+        return embeddings
+    
+    def insert_verses_batch(self, cursor, verses_data: List[Dict], batch_size: int = 64):
+        """نوشتن یک دسته آیه با embedding دسته‌ای و executemany (commit با فراخواننده)"""
+        texts = [verse_embedding_text(verse) for verse in verses_data]
+        embeddings = self.get_embeddings(texts, batch_size)
+        
+        rows = []
+        for i, verse in enumerate(verses_data):
+            embedding_blob = encode_embedding(embeddings[i]) if embeddings is not None else None
             
             # استخراج کلمات کلیدی
-            keywords = self.extract_keywords(verse.get('persian_text', '') + ' ' + verse.get('translation', ''))
+            keywords = self.extract_keywords((verse.get('persian_text') or '') + ' ' + (verse.get('translation') or ''))
             
-            cursor.execute("""
-                INSERT OR REPLACE INTO quran_verses_ai 
-                (surah_number, surah_name, verse_number, arabic_text, persian_text, translation, embedding, keywords)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            rows.append((
                 verse.get('surah_number'),
                 verse.get('surah_name'),
                 verse.get('verse_number'),
@@ -212,12 +521,60 @@ class QuranAISystem:
                 json.dumps(keywords, ensure_ascii=False)
             ))
         
-        conn.commit()
-        conn.close()
+        # آیه موجود در جای خود به‌روز می‌شود تا شناسه‌اش (مرجع موضوعات و پیشنهادات) ثابت بماند
+        cursor.executemany("""
+            INSERT INTO quran_verses_ai 
+            (surah_number, surah_name, verse_number, arabic_text, persian_text, translation, embedding, keywords)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (surah_number, verse_number) DO UPDATE SET
+                surah_name = excluded.surah_name,
+                arabic_text = excluded.arabic_text,
+                persian_text = excluded.persian_text,
+                translation = excluded.translation,
+                embedding = excluded.embedding,
+                keywords = excluded.keywords
+        """, rows)
+    
+    def on_verses_changed(self):
+        """باطل کردن داده‌های وابسته به آیات پس از هر نوشتن در quran_verses_ai"""
+        self.invalidate_verse_index()
+        self.answer_cache.invalidate()
+        get_ai_verse_sampler(self.db_path).invalidate()
+        if self._ann_index is not None:
+            # ایندکس ANN آیات جدید را ندارد؛ تا ساخت دوباره از جستجوی دقیق استفاده می‌شود
+            self._ann_index = None
+            print("⚠️ ایندکس ANN کهنه شد. برای ساخت دوباره: python quran_ai_index.py build")
+    
+    def add_quran_verses(self, verses_data: List[Dict], batch_size: int = 64):
+        """اضافه کردن آیات قرآن به دیتابیس با embedding"""
+        conn = get_connection(self.db_path)
+        with conn:
+            self.insert_verses_batch(conn.cursor(), verses_data, batch_size)
+        
+        self.on_verses_changed()
         print(f"✅ {len(verses_data)} آیه به دیتابیس اضافه شد")
     
-    def search_similar_verses(self, query: str, top_k: int = 5) -> List[Dict]:
-        """جستجوی آیات مشابه با استفاده از embedding"""
+    def _load_verse_index(self) -> Tuple[np.ndarray, List[Dict]]:
+        """خواندن همه embeddingها در یک ماتریس پیوسته و نرمال‌شده"""
+        return load_verse_matrix(self.db_path)
+    
+    def _get_verse_index(self) -> Tuple[np.ndarray, List[Dict]]:
+        """ماتریس آیات (بارگذاری تنبل و یک‌باره در هر پروسه)"""
+        index = self._verse_index
+        if index is None:
+            with self._verse_index_lock:
+                if self._verse_index is None:
+                    self._verse_index = self._load_verse_index()
+                index = self._verse_index
+        return index
+    
+    def invalidate_verse_index(self):
+        """باطل کردن ماتریس آیات تا در جستجوی بعدی از نو ساخته شود"""
+        with self._verse_index_lock:
+            self._verse_index = None
+    
+    def search_similar_verses(self, query: str, top_k: int = 5, exact: bool = False) -> List[Dict]:
+        """جستجوی آیات مشابه با استفاده از embedding (ایندکس ANN در صورت وجود، وگرنه جستجوی دقیق)"""
         if self.model is None:
             return self._search_by_keywords(query, top_k)
         
@@ -226,52 +583,118 @@ class QuranAISystem:
         if query_embedding is None:
             return self._search_by_keywords(query, top_k)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        if top_k <= 0:
+            return []
         
-        # دریافت همه آیات با embedding
-        cursor.execute("SELECT id, surah_name, verse_number, arabic_text, persian_text, translation, embedding FROM quran_verses_ai WHERE embedding IS NOT NULL")
-        verses = cursor.fetchall()
-        conn.close()
+        query_vector = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm == 0:
+            return []
+        query_vector = query_vector / query_norm
         
-        if not verses:
+        ann_index = self._ann_index
+        if not exact and ann_index is not None and ann_index.vectors.shape[1] == query_vector.shape[0]:
+            verse_ids, scores = ann_index.search(query_vector, top_k, self.ann_nprobe)
+            return self._get_verses_by_ids(verse_ids.tolist(), scores.tolist())
+        
+        matrix, rows = self._get_verse_index()
+        if not rows or query_vector.shape[0] != matrix.shape[1]:
             return []
         
-        # محاسبه شباهت کسینوسی
-        similarities = []
-        for verse in verses:
-            verse_id, surah_name, verse_number, arabic_text, persian_text, translation, embedding_blob = verse
-            
-            try:
-                verse_embedding = np.frombuffer(embedding_blob, dtype=np.float32)
-                # شباهت کسینوسی
-                similarity = np.dot(query_embedding, verse_embedding) / (np.linalg.norm(query_embedding) * np.linalg.norm(verse_embedding))
-                similarities.append((similarity, {
-                    'id': verse_id,
-                    'surah': surah_name,
-                    'ayah': verse_number,
-                    'text': arabic_text,
-                    'translation': translation or persian_text,
-                    'similarity': float(similarity)
-                }))
-            except:
+        # شباهت کسینوسی همه آیات با یک ضرب ماتریس در بردار
+        top, scores = exact_search(matrix, query_vector, top_k)
+        return [dict(rows[i], similarity=float(score)) for i, score in zip(top, scores)]
+    
+    def search_similar_verses_batch(self, queries: List[str], top_k: int = 5, exact: bool = False,
+                                    embeddings: Optional[List[Optional[np.ndarray]]] = None) -> List[List[Dict]]:
+        """جستجوی آیات مشابه چند پرسش با یک encode دسته‌ای و یک ضرب ماتریس در ماتریس"""
+        if embeddings is None:
+            embeddings = self.get_query_embeddings(queries)
+        results: List[List[Dict]] = [[] for _ in queries]
+        if top_k <= 0:
+            return results
+        
+        positions = []
+        vectors = []
+        for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+            if embedding is None:
+                results[i] = self._search_by_keywords(query, top_k)
                 continue
+            vector = np.asarray(embedding, dtype=np.float32).ravel()
+            if np.linalg.norm(vector) > 0:
+                positions.append(i)
+                vectors.append(vector)
+        if not vectors:
+            return results
+        query_matrix = normalize_rows(np.vstack(vectors))
+        
+        ann_index = self._ann_index
+        if not exact and ann_index is not None and ann_index.vectors.shape[1] == query_matrix.shape[1]:
+            for i, query_vector in zip(positions, query_matrix):
+                verse_ids, scores = ann_index.search(query_vector, top_k, self.ann_nprobe)
+                results[i] = self._get_verses_by_ids(verse_ids.tolist(), scores.tolist())
+            return results
         
-        # مرتب‌سازی بر اساس شباهت
-        similarities.sort(key=lambda x: x[0], reverse=True)
+        matrix, rows = self._get_verse_index()
+        if not rows or query_matrix.shape[1] != matrix.shape[1]:
+            return results
         
-        return [item[1] for item in similarities[:top_k]]
+        # شباهت کسینوسی همه پرسش‌ها با همه آیات در یک ضرب ماتریس در ماتریس
+        tops, scores = exact_search_batch(matrix, query_matrix, top_k)
+        for i, top, row_scores in zip(positions, tops, scores):
+            results[i] = [dict(rows[j], similarity=float(score)) for j, score in zip(top, row_scores)]
+        return results
+    
+    def _get_verses_by_ids(self, verse_ids: List[int], scores: List[float]) -> List[Dict]:
+        """دریافت اطلاعات آیات با کلید اصلی، به ترتیب شناسه‌های ورودی"""
+        if not verse_ids:
+            return []
+        
+        conn = get_connection(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT id, surah_name, verse_number, arabic_text, persian_text, translation
+            FROM quran_verses_ai
+            WHERE id IN ({','.join('?' * len(verse_ids))})
+        """, verse_ids)
+        found = {r[0]: r for r in cursor.fetchall()}
+        
+        verses = []
+        for verse_id, score in zip(verse_ids, scores):
+            r = found.get(verse_id)
+            if r is None:
+                continue
+            verses.append({
+                'id': r[0],
+                'surah': r[1],
+                'ayah': r[2],
+                'text': r[3],
+                'translation': r[5] or r[4],
+                'similarity': float(score)
+            })
+        return verses
     
     def _search_by_keywords(self, query: str, top_k: int = 5) -> List[Dict]:
-        """جستجوی مبتنی بر کلمات کلیدی (fallback)"""
+        """جستجوی مبتنی بر کلمات کلیدی (fallback)؛ با FTS5 و رتبه‌بندی bm25 در صورت وجود"""
         keywords = self.extract_keywords(query)
         
         if not keywords:
             return []
         
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
+        if self._fts_enabled:
+            results = search_fts(conn, keywords[:5], top_k)
+            return [{
+                'id': r[0],
+                'surah': r[1],
+                'ayah': r[2],
+                'text': r[3],
+                'translation': r[5] or r[4],
+                'snippet': r[6]
+            } for r in results]
+        
         # ساخت شرط جستجو
         conditions = []
         params = []
@@ -280,7 +703,6 @@ class QuranAISystem:
             params.extend([f'%{kw}%', f'%{kw}%', f'%{kw}%'])
         
         if not conditions:
-            conn.close()
             return []
         
         sql = f"""
@@ -293,7 +715,6 @@ class QuranAISystem:
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
-        conn.close()
         
         return [{
             'id': r[0],
@@ -305,13 +726,79 @@ class QuranAISystem:
     
     def ask_question(self, question: str, user_id: Optional[int] = None) -> Dict[str, Any]:
         """پاسخ به سوال کاربر با استفاده از آیات مرتبط"""
-        import time
         start_time = time.time()
         
-        # جستجوی آیات مرتبط
-        similar_verses = self.search_similar_verses(question, top_k=5)
+        # پاسخ سوال تقریباً تکراری از کش معنایی (بدون بازیابی و ساخت پاسخ)
+        question_embedding = self.get_embedding(question)
+        cached = self.answer_cache.lookup(question_embedding)
+        if cached:
+            answer = self._answer_from_cache(cached)
+        else:
+            # جستجوی آیات مرتبط و ساخت پاسخ
+            answer = self._answer_from_verses(question, self.search_similar_verses(question, top_k=5))
+        
+        # ذخیره در تاریخچه و کش پاسخ‌ها
+        self._save_qa_history(question, answer, user_id, time.time() - start_time)
+        if not cached:
+            self.answer_cache.add(question_embedding, answer)
         
-        # ساخت پاسخ بر اساس آیات پیدا شده
+        # تولید پیشنهادات
+        answer['suggestions'] = self._generate_suggestions(question, answer['related_verses'])
+        
+        return answer
+    
+    def ask_questions(self, questions: List[str], user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        پاسخ به چند سوال با یک encode دسته‌ای و یک ضرب ماتریس در ماتریس
+        خروجی: {'results': پاسخ هر سوال به ترتیب ورودی، 'count'، 'total_ms'}
+        """
+        start_time = time.time()
+        embeddings = self.get_query_embeddings(questions)
+        
+        answers: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        pending = []
+        for i, embedding in enumerate(embeddings):
+            cached = self.answer_cache.lookup(embedding)
+            if cached:
+                answers[i] = self._answer_from_cache(cached)
+            else:
+                pending.append(i)
+        
+        if pending:
+            verse_lists = self.search_similar_verses_batch(
+                [questions[i] for i in pending], top_k=5, embeddings=[embeddings[i] for i in pending]
+            )
+            for i, verses in zip(pending, verse_lists):
+                answers[i] = self._answer_from_verses(questions[i], verses)
+                self.answer_cache.add(embeddings[i], answers[i])
+        
+        # زمان پاسخ هر سوال در تاریخچه: سهم آن از زمان کل دسته
+        response_time = (time.time() - start_time) / len(questions) if questions else 0.0
+        for question, answer in zip(questions, answers):
+            self._save_qa_history(question, answer, user_id, response_time)
+            answer['suggestions'] = self._generate_suggestions(question, answer['related_verses'])
+        
+        return {
+            'success': True,
+            'results': answers,
+            'count': len(answers),
+            'total_ms': (time.time() - start_time) * 1000
+        }
+    
+    def _answer_from_cache(self, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """پاسخ ذخیره‌شده در کش معنایی"""
+        return {
+            'success': True,
+            'answer': cached['answer'],
+            'is_quranic': bool(cached['related_verses']),
+            'related_verses': cached['related_verses'],
+            'confidence': cached['confidence'],
+            'cached': True,
+            'cache_similarity': cached['similarity']
+        }
+    
+    def _answer_from_verses(self, question: str, similar_verses: List[Dict]) -> Dict[str, Any]:
+        """ساخت پاسخ بر اساس آیات پیدا شده (بدون پیشنهادات)"""
         if similar_verses:
             answer = self._generate_answer_from_verses(question, similar_verses)
         else:
@@ -323,14 +810,7 @@ class QuranAISystem:
         
         # اضافه کردن آیات مرتبط به پاسخ
         answer['related_verses'] = similar_verses
-        answer['confidence'] = similar_verses[0]['similarity'] if similar_verses else 0.0
-        
-        # ذخیره در تاریخچه
-        self._save_qa_history(question, answer, user_id, time.time() - start_time)
-        
-        # تولید پیشنهادات
-        answer['suggestions'] = self._generate_suggestions(question, similar_verses)
-        
+        answer['confidence'] = similar_verses[0].get('similarity', 0.0) if similar_verses else 0.0
         return answer
     
     def _generate_answer_from_verses(self, question: str, verses: List[Dict]) -> Dict:
@@ -385,19 +865,14 @@ class QuranAISystem:
         return suggestions[:4]
     
     def _save_qa_history(self, question: str, answer: Dict, user_id: Optional[int], response_time: float):
-        """ذخیره سوال و پاسخ در تاریخچه"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # تولید embedding سوال
+        """ثبت سوال و پاسخ در صف نوشتن پس‌زمینه تاریخچه (بدون انتظار برای دیتابیس)"""
+        # embedding سوال از کش جستجو خوانده می‌شود
         question_embedding = self.get_embedding(question)
-        embedding_blob = question_embedding.tobytes() if question_embedding is not None else None
+        embedding_blob = None
+        if question_embedding is not None:
+            embedding_blob = encode_embedding(question_embedding, Config.QURAN_AI_HISTORY_EMBEDDING_CODEC)
         
-        cursor.execute("""
-            INSERT INTO quran_qa_history 
-            (user_id, question, question_embedding, answer, related_verses, confidence, response_time)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
+        self.history_writer.submit((
             user_id,
             question,
             embedding_blob,
@@ -406,9 +881,6 @@ class QuranAISystem:
             answer.get('confidence'),
             response_time
         ))
-        
-        conn.commit()
-        conn.close()
     
     def analyze_content(self, text: str) -> Dict[str, Any]:
         """تحلیل محتوای دینی متن ورودی"""
@@ -434,37 +906,14 @@ class QuranAISystem:
         }
     
     def _detect_topics(self, text: str) -> List[str]:
-        """تشخیص موضوعات قرآنی از متن"""
-        topic_keywords = {
-            'توحید': ['خدا', 'الله', 'رب', 'اله', 'وحدانیت', 'یکتا'],
-            'نبوت': ['پیامبر', 'رسول', 'نبی', 'محمد', 'خاتم'],
-            'معاد': ['قیامت', 'آخرت', 'مرگ', 'پس از مرگ', 'رستاخیز', 'بهشت', 'جهنم'],
-            'اخلاق': ['اخلاق', 'رفتار', 'پاکی', 'صداقت', 'عدالت', 'انصاف', 'بخشش'],
-            'عبادت': ['نماز', 'روزه', 'حج', 'زکات', 'عبادت', 'پرستش', 'سجده'],
-            'خانواده': ['خانواده', 'همسر', 'فرزند', 'والدین', 'ازدواج', 'طلاق'],
-            'صبر': ['صبر', 'شکیبایی', 'استقامت', 'پایداری'],
-            'توکل': ['توکل', 'اعتماد', 'توسل', 'یاوری']
-        }
-        
-        detected_topics = []
-        text_lower = text.lower()
-        
-        for topic, keywords in topic_keywords.items():
-            for kw in keywords:
-                if kw in text_lower:
-                    detected_topics.append(topic)
-                    break
-        
-        return detected_topics[:5]
+        """تشخیص موضوعات قرآنی از متن (همه کلیدواژه‌ها در یک گذر)"""
+        return get_matcher(self.TOPIC_KEYWORDS).labels_in(text)[:5]
     
     def _analyze_sentiment(self, text: str) -> str:
         """تحلیل احساسات متن (ساده)"""
-        positive_words = ['خوب', 'عالی', 'زیبا', 'امید', 'شادی', 'نعمت', 'رحمت', 'بخشش', 'محبت']
-        negative_words = ['بد', 'شر', 'گناه', 'عذاب', 'دوزخ', 'ناراحتی', 'اندوه', 'ترس', 'نگرانی']
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for w in positive_words if w in text_lower)
-        negative_count = sum(1 for w in negative_words if w in text_lower)
+        counts = get_matcher(self.SENTIMENT_WORDS).count_by_label(text)
+        positive_count = counts['positive']
+        negative_count = counts['negative']
         
         if positive_count > negative_count:
             return 'positive'
@@ -475,7 +924,7 @@ class QuranAISystem:
     
     def get_user_history(self, user_id: int, limit: int = 10) -> List[Dict]:
         """دریافت تاریخچه سوالات کاربر"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -487,7 +936,6 @@ class QuranAISystem:
         """, (user_id, limit))
         
         results = cursor.fetchall()
-        conn.close()
         
         return [{
             'id': r[0],
@@ -498,36 +946,19 @@ class QuranAISystem:
         } for r in results]
     
     def get_daily_verse(self, user_id: Optional[int] = None) -> Dict:
-        """دریافت آیه روز (با در نظر گرفتن تاریخچه کاربر)"""
-        import random
-        from datetime import date
+        """دریافت آیه روز (با در نظر گرفتن پروفایل موضوعی کاربر)"""
+        conn = get_connection(self.db_path)
+        sampler = get_ai_verse_sampler(self.db_path)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # اگر کاربر دارد، بر اساس تاریخچه او پیشنهاد بده
+        # اگر کاربر دارد، بر اساس پروفایل موضوعی او پیشنهاد بده
         if user_id:
-            cursor.execute("""
-                SELECT topic_id FROM verse_topic_mapping
-                WHERE verse_id IN (
-                    SELECT verse_id FROM quran_suggestions WHERE user_id = ?
-                )
-                GROUP BY topic_id ORDER BY COUNT(*) DESC LIMIT 1
-            """, (user_id,))
-            preferred_topic = cursor.fetchone()
+            topic_id = preferred_topic(conn, user_id)
             
-            if preferred_topic:
-                cursor.execute("""
-                    SELECT v.id, v.surah_name, v.verse_number, v.arabic_text, v.translation
-                    FROM quran_verses_ai v
-                    JOIN verse_topic_mapping vt ON vt.verse_id = v.id
-                    WHERE vt.topic_id = ?
-                    ORDER BY RANDOM() LIMIT 1
-                """, (preferred_topic[0],))
-                verse = cursor.fetchone()
+            if topic_id is not None:
+                verses = sampler.sample(DAILY_VERSE_COLUMNS, 1, topic=topic_id)
+                verse = verses[0] if verses else None
                 
                 if verse:
-                    conn.close()
                     return {
                         'id': verse[0],
                         'surah': verse[1],
@@ -537,14 +968,9 @@ class QuranAISystem:
                         'reason': 'بر اساس سوالات قبلی شما'
                     }
         
-        # آیه تصادفی
-        cursor.execute("""
-            SELECT id, surah_name, verse_number, arabic_text, translation
-            FROM quran_verses_ai
-            ORDER BY RANDOM() LIMIT 1
-        """)
-        verse = cursor.fetchone()
-        conn.close()
+        # آیه تصادفی (شناسه از حافظه و خواندن با کلید اصلی)
+        verses = sampler.sample(DAILY_VERSE_COLUMNS, 1)
+        verse = verses[0] if verses else None
         
         if verse:
             return {
@@ -560,17 +986,24 @@ class QuranAISystem:
     
     def add_feedback(self, qa_id: int, feedback: int):
         """ثبت بازخورد کاربر برای بهبود سیستم"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE quran_qa_history
-            SET feedback = ?
-            WHERE id = ?
-        """, (feedback, qa_id))
-        
-        conn.commit()
-        conn.close()
+        conn = get_connection(self.db_path)
+        with conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT user_id, related_verses, feedback FROM quran_qa_history WHERE id = ?
+            """, (qa_id,))
+            row = cursor.fetchone()
+            
+            cursor.execute("""
+                UPDATE quran_qa_history
+                SET feedback = ?
+                WHERE id = ?
+            """, (feedback, qa_id))
+            
+            # اعمال تغییر بازخورد روی پروفایل موضوعی کاربر
+            if row:
+                apply_feedback(conn, row[0], row[1], row[2], feedback)
 
 
 # نمونه داده برای تست
@@ -634,16 +1067,29 @@ SAMPLE_VERSES = [
 ]
 
 
-def init_quran_ai_system(db_path: str = 'instance/seraj.db'):
-    """راه‌اندازی اولیه سیستم هوش مصنوعی قرآنی"""
+def init_quran_ai_system(db_path: Optional[str] = None, corpus_path: Optional[str] = None,
+                         translation_path: Optional[str] = None):
+    """
+    راه‌اندازی اولیه سیستم هوش مصنوعی قرآنی
+    
+    اگر corpus_path (یا متغیر محیطی QURAN_AI_CORPUS) داده شود، کل قرآن از فایل
+    tanzil/CSV وارد می‌شود؛ در غیر این صورت فقط آیات نمونه بارگذاری می‌شوند.
+    """
     system = QuranAISystem(db_path)
+    db_path = system.db_path
+    
+    corpus_path = corpus_path or os.environ.get('QURAN_AI_CORPUS')
+    translation_path = translation_path or os.environ.get('QURAN_AI_TRANSLATION')
+    if corpus_path:
+        from quran_ai_ingest import import_corpus
+        import_corpus(system, corpus_path, translation_path=translation_path)
+        return system
     
     # بررسی اینکه آیا داده وجود دارد
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM quran_verses_ai")
     count = cursor.fetchone()[0]
-    conn.close()
     
     if count == 0:
         print("📖 در حال بارگذاری آیات نمونه...")
@@ -0,0 +1,77 @@
+# quran_ai_db.py
+"""
+اتصال‌های SQLite مشترک برای موتورهای هوش مصنوعی قرآنی
+
+هر thread برای هر فایل دیتابیس یک اتصال ماندگار دارد که با WAL و mmap
+تنظیم شده است، پس هزینه باز کردن اتصال و از دست رفتن page cache در هر
+درخواست حذف می‌شود. مسیر پیش‌فرض دیتابیس از SQLALCHEMY_DATABASE_URI در
+Config خوانده می‌شود تا موتورها همان دیتابیس برنامه Flask را استفاده کنند.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from config import Config
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_local = threading.local()
+
+
+def resolve_db_path(uri: Optional[str] = None) -> str:
+    """
+    تبدیل URI دیتابیس (مثل sqlite:///seraj.db) به مسیر فایل
+    مسیرهای نسبی مانند Flask-SQLAlchemy نسبت به پوشه instance در نظر گرفته می‌شوند.
+    """
+    uri = uri or Config.SQLALCHEMY_DATABASE_URI
+    if not uri.startswith('sqlite:///'):
+        raise ValueError(f"موتور هوش مصنوعی قرآنی فقط از SQLite پشتیبانی می‌کند: {uri}")
+
+    path = uri[len('sqlite:///'):].split('?', 1)[0]
+    if os.path.isabs(path):
+        return path
+    return os.path.join(BASE_DIR, 'instance', path)
+
+
+def default_db_path() -> str:
+    """مسیر دیتابیس برنامه بر اساس Config"""
+    return resolve_db_path()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=Config.QURAN_AI_SQLITE_TIMEOUT, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={int(Config.QURAN_AI_SQLITE_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size=-{int(Config.QURAN_AI_SQLITE_CACHE_KB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    اتصال ماندگار thread فعلی به دیتابیس
+    فراخواننده نباید اتصال را ببندد. اتصال همان‌طور که هست برگردانده می‌شود
+    (تراکنش باز تابعی که تابع کمکی دیگری را صدا زده از دست نمی‌رود)، پس
+    نویسنده‌ها باید در `with conn:` بنویسند تا در خطا rollback شود.
+    """
+    db_path = db_path or default_db_path()
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _connect(db_path)
+    return conn
+
+
+def close_connections():
+    """بستن اتصال‌های thread فعلی (مثلاً در پایان یک اسکریپت)"""
+    connections = getattr(_local, 'connections', None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
@@ -0,0 +1,218 @@
+# quran_ai_embed_server.py
+"""
+سرویس مشترک تولید embedding
+
+یک پروسه مدل را بارگذاری می‌کند و worker‌های gunicorn از طریق Unix socket
+(multiprocessing.connection) درخواست encode می‌فرستند، پس torch و مدل فقط
+یک بار در حافظه هستند. درخواست‌های هم‌زمان در یک micro-batch با یک
+فراخوانی encode پردازش می‌شوند.
+
+اجرای سرور:
+    python quran_ai_embed_server.py --socket /tmp/seraj-embed.sock
+و در محیط برنامه:
+    QURAN_AI_EMBED_SERVER=/tmp/seraj-embed.sock
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from config import Config
+
+
+def _authkey() -> bytes:
+    return (Config.QURAN_AI_EMBED_AUTHKEY or Config.SECRET_KEY).encode('utf-8')
+
+
+class EmbeddingServer:
+    """سرور encode با ادغام درخواست‌های هم‌زمان در micro-batch"""
+
+    def __init__(self, model, address: str, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.model = model
+        self.address = address
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+
+        self.batches = 0
+        self.encoded = 0
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family='AF_UNIX', authkey=_authkey())
+        threading.Thread(target=self._batch_loop, name='embed-batcher', daemon=True).start()
+        print(f"✅ سرور embedding روی {self.address} آماده است")
+
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"⚠️ اتصال رد شد: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _handle(self, conn):
+        """خواندن درخواست‌های یک اتصال و قرار دادن آن‌ها در صف batch"""
+        send_lock = threading.Lock()
+        try:
+            while True:
+                message = conn.recv()
+                if message == 'ping':
+                    with send_lock:
+                        conn.send('pong')
+                    continue
+                request_id, texts = message
+                self.requests.put((conn, send_lock, request_id, list(texts)))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _collect(self) -> List[tuple]:
+        """اولین درخواست و هر درخواستی که تا max_wait برسد (تا سقف max_batch متن)"""
+        batch = [self.requests.get()]
+        total = len(batch[0][3])
+        deadline = time.perf_counter() + self.max_wait
+        while total < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            total += len(item[3])
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item in batch for text in item[3]]
+            try:
+                embeddings = np.asarray(
+                    self.model.encode(texts, batch_size=max(len(texts), 1), convert_to_numpy=True),
+                    dtype=np.float32
+                )
+                error = None
+            except Exception as e:
+                embeddings = None
+                error = str(e)
+
+            self.batches += 1
+            self.encoded += len(texts)
+
+            offset = 0
+            for conn, send_lock, request_id, request_texts in batch:
+                if error is None:
+                    result = embeddings[offset:offset + len(request_texts)]
+                else:
+                    result = RuntimeError(error)
+                offset += len(request_texts)
+                try:
+                    with send_lock:
+                        conn.send((request_id, result))
+                except (EOFError, OSError):
+                    # کلاینت پیش از پاسخ قطع شده (مثلاً timeout)
+                    pass
+
+
+class EmbeddingClient:
+    """
+    کلاینت سرور embedding با رابط مشابه SentenceTransformer.encode
+    هر thread اتصال خودش را دارد؛ پس از timeout اتصال بسته و دوباره ساخته می‌شود
+    تا پاسخ دیرهنگام با درخواست بعدی قاطی نشود.
+    """
+
+    def __init__(self, address: str, timeout: float = 2.0, ping_ttl: float = 5.0):
+        self.address = address
+        self.timeout = timeout
+        # نتیجه ping چند ثانیه نگه داشته می‌شود تا /health هر بار به سرور وصل نشود
+        self.ping_ttl = ping_ttl
+        self._ping_result = (0.0, False)
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, family='AF_UNIX', authkey=_authkey())
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def encode(self, texts: Union[str, Sequence[str]], batch_size: Optional[int] = None,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """ارسال متن(ها) به سرور؛ در صورت timeout یا قطع اتصال خطا می‌دهد"""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        # دسته‌های بزرگ (مثلاً ورود آیات) زمان بیشتری می‌گیرند: یک timeout به ازای هر ۶۴ متن
+        timeout = self.timeout * (1 + len(texts) // 64)
+        request_id = next(self._ids)
+        try:
+            conn = self._connection()
+            conn.send((request_id, texts))
+            if not conn.poll(timeout):
+                raise TimeoutError(f"سرور embedding در {timeout} ثانیه پاسخ نداد")
+            response_id, result = conn.recv()
+        except Exception:
+            self._reset()
+            raise
+
+        if response_id != request_id:
+            self._reset()
+            raise RuntimeError("پاسخ نامعتبر از سرور embedding")
+        if isinstance(result, Exception):
+            raise result
+        return result[0] if single else result
+
+    def ping(self) -> bool:
+        """بررسی در دسترس بودن سرور (نتیجه تا ping_ttl ثانیه کش می‌شود)"""
+        checked_at, alive = self._ping_result
+        if time.monotonic() - checked_at < self.ping_ttl:
+            return alive
+
+        alive = False
+        try:
+            conn = self._connection()
+            conn.send('ping')
+            alive = conn.poll(self.timeout) and conn.recv() == 'pong'
+        except Exception:
+            pass
+        if not alive:
+            self._reset()
+        self._ping_result = (time.monotonic(), alive)
+        return alive
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="سرور مشترک embedding هوش مصنوعی قرآنی")
+    parser.add_argument('--socket', default=Config.QURAN_AI_EMBED_SERVER or '/tmp/seraj-embed.sock',
+                        help='مسیر Unix socket')
+    parser.add_argument('--max-batch', type=int, default=64, help='حداکثر تعداد متن در هر micro-batch')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help='حداکثر انتظار برای پر شدن batch')
+    parser.add_argument('--encoder', default=Config.QURAN_AI_ENCODER, help='پشتوانه embedding')
+    args = parser.parse_args()
+
+    from quran_ai_encoders import create_encoder
+    model = create_encoder(args.encoder)
+    print(f"✅ مدل هوش مصنوعی بارگذاری شد ({args.encoder})")
+    EmbeddingServer(model, args.socket, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms).serve_forever()
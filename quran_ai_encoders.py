@@ -0,0 +1,217 @@
+# quran_ai_encoders.py
+"""
+پشتوانه‌های تولید embedding برای هوش مصنوعی قرآنی
+
+- sentence-transformers: مدل MiniLM چندزبانه روی مسیر پیش‌فرض torch
+- quantized: همان مدل با کوانتیزه‌سازی پویای int8 لایه‌های Linear برای CPU
+- hashing: رمزگذار قطعی و بدون وابستگی (hash واژه‌ها و سه‌حرفی‌ها) برای تست
+
+انتخاب با QURAN_AI_ENCODER در Config. همه پشتوانه‌ها رابط encode مشابه
+SentenceTransformer دارند. بردارهای پشتوانه‌های مختلف هم‌فضا نیستند؛ پس از
+تغییر پشتوانه، آیات باید دوباره وارد شوند (quran_ai_ingest.py --restart).
+
+سنجش سرعت encode و هم‌خوانی نتایج بازیابی روی آیات دیتابیس:
+    python quran_ai_encoders.py bench --encoders sentence-transformers quantized hashing
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from config import Config
+
+
+EMBEDDING_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+TORCH_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
+
+
+class SentenceTransformerEncoder:
+    """مدل SentenceTransformer روی torch (پیش‌فرض)"""
+
+    name = 'sentence-transformers'
+    requires_torch = True
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+
+    def encode(self, texts: Union[str, Sequence[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, **kwargs)
+
+
+class QuantizedEncoder(SentenceTransformerEncoder):
+    """
+    همان مدل با کوانتیزه‌سازی پویای int8 (torch.ao.quantization.quantize_dynamic)
+    وزن‌های لایه‌های Linear به int8 تبدیل می‌شوند و فعال‌سازی‌ها هنگام اجرا
+    کوانتیزه می‌شوند؛ روی CPU سریع‌تر و کم‌حجم‌تر است.
+    """
+
+    name = 'quantized'
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        super().__init__(model_name)
+        import torch
+        self.model.eval()
+        self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts: Union[str, Sequence[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        import torch
+        with torch.inference_mode():
+            return super().encode(texts, batch_size=batch_size, **kwargs)
+
+
+class HashingEncoder:
+    """
+    رمزگذار قطعی بدون مدل: hash علامت‌دار واژه‌ها و سه‌حرفی‌های هر واژه
+    خروجی برای یک متن همیشه یکسان است (مناسب تست و محیط‌های بدون torch).
+    """
+
+    name = 'hashing'
+    requires_torch = False
+
+    _TOKEN_RE = re.compile(r'\w+')
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        text = (text or '').replace('ي', 'ی').replace('ك', 'ک').lower()
+        features = []
+        for token in self._TOKEN_RE.findall(text):
+            features.append(token)
+            padded = f"<{token}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            vector[value % self.dim] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts: Union[str, Sequence[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self._encode_one(texts)
+        if not len(texts):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self._encode_one(text) for text in texts])
+
+
+ENCODERS = {
+    SentenceTransformerEncoder.name: SentenceTransformerEncoder,
+    QuantizedEncoder.name: QuantizedEncoder,
+    HashingEncoder.name: HashingEncoder,
+}
+
+
+def encoder_available(name: Optional[str] = None) -> bool:
+    """آیا وابستگی‌های پشتوانه نصب هستند"""
+    encoder_class = ENCODERS.get(name or Config.QURAN_AI_ENCODER)
+    if encoder_class is None:
+        return False
+    return TORCH_AVAILABLE or not encoder_class.requires_torch
+
+
+def create_encoder(name: Optional[str] = None):
+    """ساخت پشتوانه encode بر اساس نام (پیش‌فرض: QURAN_AI_ENCODER)"""
+    name = name or Config.QURAN_AI_ENCODER
+    if name not in ENCODERS:
+        raise ValueError(f"پشتوانه embedding ناشناخته: {name} (گزینه‌ها: {', '.join(ENCODERS)})")
+    return ENCODERS[name]()
+
+
+def benchmark(db_path: str, encoders: List[str], top_k: int = 5, n_queries: int = 100,
+              batch_size: int = 64, limit: Optional[int] = None, seed: int = 0) -> List[Dict]:
+    """
+    سنجش سرعت encode هر پشتوانه و هم‌خوانی بازیابی با پشتوانه اول (مرجع)
+    پرسش‌ها ترجمه فارسی آیات تصادفی هستند و هر پشتوانه روی embedding
+    آیات ساخته‌شده با خودش جستجو می‌کند؛ agreement میانگین اشتراک top-k است.
+    """
+    from quran_ai_db import get_connection
+    from quran_ai_complete import verse_embedding_text
+    from quran_ai_index import normalize_rows, exact_search
+
+    cursor = get_connection(db_path).cursor()
+    query = "SELECT arabic_text, persian_text, translation FROM quran_verses_ai ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    cursor.execute(query)
+    verses = [{'arabic_text': r[0], 'persian_text': r[1], 'translation': r[2]} for r in cursor.fetchall()]
+    if not verses:
+        print("⚠️ هیچ آیه‌ای در دیتابیس نیست")
+        return []
+
+    texts = [verse_embedding_text(verse) for verse in verses]
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(verses), min(n_queries, len(verses)), replace=False)
+    questions = [verses[i]['translation'] or verses[i]['persian_text'] or verses[i]['arabic_text'] or '' for i in picks]
+    k = min(top_k, len(verses))
+
+    results = []
+    reference = None
+    for name in encoders:
+        if not encoder_available(name):
+            print(f"⚠️ پشتوانه {name} در این محیط در دسترس نیست")
+            continue
+
+        start = time.perf_counter()
+        encoder = create_encoder(name)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matrix = normalize_rows(encoder.encode(texts, batch_size=batch_size))
+        encode_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        query_vectors = normalize_rows(np.vstack([encoder.encode(q) for q in questions]))
+        query_ms = (time.perf_counter() - start) * 1000 / len(questions)
+
+        found = [set(exact_search(matrix, q, k)[0].tolist()) for q in query_vectors]
+        if reference is None:
+            reference = found
+        agreement = sum(len(a & b) for a, b in zip(reference, found)) / (len(found) * k)
+
+        results.append({
+            'encoder': name,
+            'load_s': load_s,
+            'texts_per_s': len(texts) / encode_s if encode_s > 0 else float('inf'),
+            'query_ms': query_ms,
+            'agreement': agreement
+        })
+
+    print(f"{'پشتوانه':<24}{'load s':>8}{'متن/ثانیه':>12}{'ms/query':>10}{'agreement@' + str(k):>14}")
+    for r in results:
+        print(f"{r['encoder']:<24}{r['load_s']:>8.2f}{r['texts_per_s']:>12.1f}{r['query_ms']:>10.2f}{r['agreement']:>14.3f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="پشتوانه‌های embedding هوش مصنوعی قرآنی")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bench_parser = subparsers.add_parser('bench', help='سنجش سرعت و هم‌خوانی پشتوانه‌ها')
+    bench_parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    bench_parser.add_argument('--encoders', nargs='+', default=list(ENCODERS), choices=list(ENCODERS),
+                              help='پشتوانه‌ها (اولی مرجع هم‌خوانی است)')
+    bench_parser.add_argument('--k', type=int, default=5)
+    bench_parser.add_argument('--queries', type=int, default=100)
+    bench_parser.add_argument('--batch-size', type=int, default=64)
+    bench_parser.add_argument('--limit', type=int, default=None, help='حداکثر تعداد آیات')
+
+    args = parser.parse_args()
+    from quran_ai_db import default_db_path
+    benchmark(args.db or default_db_path(), args.encoders, top_k=args.k, n_queries=args.queries,
+              batch_size=args.batch_size, limit=args.limit)
@@ -4,19 +4,28 @@
 پاسخ در کمتر از 50 میلی‌ثانیه
 """
 
-import sqlite3
 import json
 import re
 import random
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+from quran_ai_db import get_connection, default_db_path
+from quran_ai_fts import ensure_fts, search_fts
+from quran_ai_matcher import get_matcher
+from quran_verse_sampler import get_ai_verse_sampler
+from quran_ai_stats import read_counters
+
+
+VERSE_COLUMNS = 'surah_name, verse_number, arabic_text, persian_text, translation'
+
 
 class FastQuranAI:
     """سیستم سریع قرآنی - پاسخ فوری از دیتابیس"""
     
-    def __init__(self, db_path: str = 'instance/seraj.db'):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_db_path()
+        self._fts_enabled = None
         
         # کلمات کلیدی و موضوعات
         self.topic_keywords = {
@@ -38,7 +47,27 @@ class FastQuranAI:
         }
     
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        # اتصال ماندگار thread فعلی (WAL + mmap)؛ نباید بسته شود
+        return get_connection(self.db_path)
+    
+    def _use_fts(self, conn):
+        """آیا ایندکس FTS5 در دسترس است (یک بار بررسی و در صورت نیاز ساخته می‌شود)"""
+        if self._fts_enabled is None:
+            self._fts_enabled = ensure_fts(conn)
+        return self._fts_enabled
+    
+    def _format_verse(self, row):
+        """تبدیل ردیف (id, surah_name, verse_number, arabic_text, persian_text, translation[, snippet])"""
+        verse = {
+            'id': row[0],
+            'surah': row[1] or 'قرآن',
+            'ayah': row[2] or '',
+            'text': row[3] or '',
+            'translation': row[5] or row[4] or ''
+        }
+        if len(row) > 6:
+            verse['snippet'] = row[6]
+        return verse
     
     def _extract_keywords(self, text: str):
         if not text:
@@ -52,123 +81,108 @@ class FastQuranAI:
                 keywords.append(word)
         return keywords[:5]
     
-    def search_verses(self, query: str, limit: int = 5):
+    def search_verses(self, query: str, limit: int = 5, random_fallback: bool = True):
+        keywords = self._extract_keywords(query)
+        if not keywords and not random_fallback:
+            return []
+        
         conn = self._get_connection()
         cursor = conn.cursor()
-        keywords = self._extract_keywords(query)
+        
+        if keywords and self._use_fts(conn):
+            results = search_fts(conn, keywords, limit)
+            return [self._format_verse(row) for row in results]
         
         if not keywords:
-            cursor.execute("""
-                SELECT surah_name, verse_number, arabic_text, persian_text, translation
-                FROM quran_verses_ai
-                WHERE arabic_text IS NOT NULL AND arabic_text != ''
-                ORDER BY RANDOM()
-                LIMIT ?
-            """, (limit,))
-        else:
-            conditions = []
-            params = []
-            for kw in keywords[:5]:
-                conditions.append("(persian_text LIKE ? OR translation LIKE ? OR keywords LIKE ?)")
-                params.extend([f'%{kw}%', f'%{kw}%', f'%{kw}%'])
-            
-            sql = f"""
-                SELECT surah_name, verse_number, arabic_text, persian_text, translation
-                FROM quran_verses_ai
-                WHERE {' OR '.join(conditions)}
-                LIMIT ?
-            """
-            params.append(limit)
-            cursor.execute(sql, params)
+            # آیات تصادفی: شناسه‌ها از حافظه و خواندن با کلید اصلی (بدون ORDER BY RANDOM)
+            results = get_ai_verse_sampler(self.db_path).sample(VERSE_COLUMNS, limit, require_arabic=True)
+            return [self._format_verse(row) for row in results]
         
+        # جستجوی LIKE فقط وقتی FTS5 در دسترس نیست
+        conditions = []
+        params = []
+        for kw in keywords[:5]:
+            conditions.append("(persian_text LIKE ? OR translation LIKE ? OR keywords LIKE ?)")
+            params.extend([f'%{kw}%', f'%{kw}%', f'%{kw}%'])
+        
+        sql = f"""
+            SELECT id, surah_name, verse_number, arabic_text, persian_text, translation
+            FROM quran_verses_ai
+            WHERE {' OR '.join(conditions)}
+            LIMIT ?
+        """
+        params.append(limit)
+        cursor.execute(sql, params)
         results = cursor.fetchall()
-        conn.close()
         
-        verses = []
-        for row in results:
-            verses.append({
-                'surah': row[0] or 'قرآن',
-                'ayah': row[1] or '',
-                'text': row[2] or '',
-                'translation': row[4] or row[3] or ''
-            })
-        return verses
+        return [self._format_verse(row) for row in results]
+    
+    def keyword_confidence(self, question: str, verses: List[Dict]) -> float:
+        """سهم کلیدواژه‌های سوال که در بهترین آیه آمده‌اند (اطمینان جستجوی کلیدواژه‌ای)"""
+        keywords = self._extract_keywords(question)
+        if not keywords or not verses:
+            return 0.0
+        best = 0
+        for verse in verses:
+            text = f"{verse.get('translation', '')} {verse.get('snippet', '')} {verse.get('text', '')}"
+            best = max(best, sum(1 for kw in keywords if kw in text))
+        return best / len(keywords)
     
     def detect_topic(self, question: str):
-        question_lower = question.lower()
-        for topic, keywords in self.topic_keywords.items():
-            for kw in keywords:
-                if kw in question_lower:
-                    return topic
-        return None
+        # همه کلیدواژه‌های موضوعات در یک گذر؛ اولین موضوع جدول برگردانده می‌شود
+        return get_matcher(self.topic_keywords).first_label(question)
     
     def get_fast_answer(self, question: str):
-        question_lower = question.lower()
-        for key, answer in self.fast_answers.items():
-            if key in question_lower:
-                return answer
-        return None
+        key = get_matcher({key: (key,) for key in self.fast_answers}).first_label(question)
+        return self.fast_answers[key] if key else None
     
     def get_random_verses(self, limit: int = 5):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT surah_name, verse_number, arabic_text, persian_text, translation
-            FROM quran_verses_ai
-            WHERE arabic_text IS NOT NULL
-            ORDER BY RANDOM()
-            LIMIT ?
-        """, (limit,))
-        results = cursor.fetchall()
-        conn.close()
-        verses = []
-        for row in results:
-            verses.append({
-                'surah': row[0] or 'قرآن',
-                'ayah': row[1] or '',
-                'text': row[2] or '',
-                'translation': row[4] or row[3] or ''
-            })
-        return verses
+        results = get_ai_verse_sampler(self.db_path).sample(VERSE_COLUMNS, limit, require_arabic=True)
+        return [self._format_verse(row) for row in results]
     
     def get_verses_by_topic(self, topic: str, limit: int = 5):
         keywords = self.topic_keywords.get(topic, [topic])
         conn = self._get_connection()
         cursor = conn.cursor()
+        
+        # آیات دسته‌بندی‌شده موضوع (quran_ai_topics.py) به ترتیب ارتباط
+        cursor.execute("""
+            SELECT v.id, v.surah_name, v.verse_number, v.arabic_text, v.persian_text, v.translation
+            FROM quran_topics t
+            JOIN verse_topic_mapping m ON m.topic_id = t.id
+            JOIN quran_verses_ai v ON v.id = m.verse_id
+            WHERE t.name = ?
+            ORDER BY m.relevance DESC
+            LIMIT ?
+        """, (topic, limit))
+        results = cursor.fetchall()
+        if results:
+            return [self._format_verse(row) for row in results]
+        
+        if keywords and self._use_fts(conn):
+            results = search_fts(conn, keywords, limit, columns=('persian_text', 'translation'))
+            return [self._format_verse(row) for row in results]
+        
         conditions = []
         params = []
         for kw in keywords[:3]:
             conditions.append("(persian_text LIKE ? OR translation LIKE ?)")
             params.extend([f'%{kw}%', f'%{kw}%'])
         
-        if conditions:
-            sql = f"""
-                SELECT surah_name, verse_number, arabic_text, persian_text, translation
-                FROM quran_verses_ai
-                WHERE {' OR '.join(conditions)}
-                LIMIT ?
-            """
-            params.append(limit)
-            cursor.execute(sql, params)
-        else:
-            cursor.execute("""
-                SELECT surah_name, verse_number, arabic_text, persian_text, translation
-                FROM quran_verses_ai
-                ORDER BY RANDOM()
-                LIMIT ?
-            """, (limit,))
+        if not conditions:
+            results = get_ai_verse_sampler(self.db_path).sample(VERSE_COLUMNS, limit)
+            return [self._format_verse(row) for row in results]
         
+        sql = f"""
+            SELECT id, surah_name, verse_number, arabic_text, persian_text, translation
+            FROM quran_verses_ai
+            WHERE {' OR '.join(conditions)}
+            LIMIT ?
+        """
+        params.append(limit)
+        cursor.execute(sql, params)
         results = cursor.fetchall()
-        conn.close()
-        verses = []
-        for row in results:
-            verses.append({
-                'surah': row[0] or 'قرآن',
-                'ayah': row[1] or '',
-                'text': row[2] or '',
-                'translation': row[4] or row[3] or ''
-            })
-        return verses
+        return [self._format_verse(row) for row in results]
     
     def _build_answer(self, question: str, verses: list):
         if not verses:
@@ -282,19 +296,12 @@ def get_verse_suggestions(mood='general', limit=5):
 def get_ai_statistics():
     """آمار سیستم"""
     try:
-        conn = sqlite3.connect('instance/seraj.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM quran_verses_ai")
-        total_verses = cursor.fetchone()[0] or 0
-        cursor.execute("SELECT COUNT(*) FROM quran_qa_history")
-        total_questions = cursor.fetchone()[0] or 0
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM quran_qa_history")
-        unique_users = cursor.fetchone()[0] or 0
-        conn.close()
+        # شمارنده‌های نگه‌داری‌شده با تریگر (بدون COUNT روی جداول)
+        counters = read_counters()
         return {
-            'total_verses': total_verses,
-            'total_questions': total_questions,
-            'unique_users': unique_users,
+            'total_verses': counters['total_verses'],
+            'total_questions': counters['total_questions'],
+            'unique_users': counters['unique_users'],
             'ai_enabled': True,
             'fast_mode': True
         }
@@ -304,7 +311,7 @@ def get_ai_statistics():
 def get_recent_qa(limit=10):
     """دریافت سوالات اخیر"""
     try:
-        conn = sqlite3.connect('instance/seraj.db')
+        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, user_id, question, answer, created_at
@@ -313,7 +320,6 @@ def get_recent_qa(limit=10):
             LIMIT ?
         """, (limit,))
         results = cursor.fetchall()
-        conn.close()
         return [{'id': r[0], 'user_id': r[1], 'question': r[2], 'answer': r[3], 'created_at': r[4]} for r in results]
     except:
         return []
\ No newline at end of file
@@ -0,0 +1,104 @@
+# quran_ai_fts.py
+"""
+ایندکس متن کامل (SQLite FTS5) برای جستجوی کلیدواژه‌ای آیات
+
+جدول مجازی quran_verses_fts آینه متن فارسی، ترجمه و کلمات کلیدی جدول
+quran_verses_ai است و با تریگرها همگام می‌ماند. نتایج با bm25 رتبه‌بندی
+و بخش منطبق متن با snippet برجسته می‌شود. اگر SQLite بدون FTS5 کامپایل
+شده باشد، ensure_fts مقدار False برمی‌گرداند و فراخواننده باید به LIKE برگردد.
+"""
+
+import sqlite3
+from typing import List, Optional, Sequence
+
+
+FTS_TABLE = 'quran_verses_fts'
+
+# متن عربی با اعراب در توکنایزر unicode61 شکسته می‌شود، پس فقط ستون‌های فارسی ایندکس می‌شوند
+FTS_COLUMNS = ('persian_text', 'translation', 'keywords')
+
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+
+
+def ensure_fts(conn: sqlite3.Connection) -> bool:
+    """ساخت جدول FTS و تریگرهای همگام‌سازی در صورت نیاز؛ خروجی: آیا FTS5 در دسترس است"""
+    columns = ', '.join(FTS_COLUMNS)
+    new_columns = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+    old_columns = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,))
+        exists = cursor.fetchone() is not None
+        if exists:
+            return True
+
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                {columns},
+                content='quran_verses_ai',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON quran_verses_ai BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_columns});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON quran_verses_ai BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON quran_verses_ai BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_columns});
+            END
+        """)
+        # ایندکس کردن آیاتی که پیش از ساخت جدول FTS وجود داشتند
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        conn.commit()
+        return True
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        print(f"⚠️ FTS5 در دسترس نیست، از جستجوی LIKE استفاده می‌شود: {e}")
+        return False
+
+
+def build_match_query(keywords: Sequence[str], columns: Optional[Sequence[str]] = None) -> str:
+    """ساخت عبارت MATCH: هر کلمه به صورت پیشوندی و با OR (مانند LIKE قبلی)"""
+    terms = []
+    for kw in keywords:
+        kw = kw.replace('"', ' ').strip()
+        if kw:
+            terms.append(f'"{kw}"*')
+    query = ' OR '.join(terms)
+    if query and columns:
+        query = f"{{{' '.join(columns)}}} : ({query})"
+    return query
+
+
+def search_fts(conn: sqlite3.Connection, keywords: Sequence[str], limit: int = 5,
+               columns: Optional[Sequence[str]] = None) -> List[tuple]:
+    """
+    جستجوی آیات با رتبه‌بندی bm25 (snippet از ستون ترجمه که در پاسخ نمایش داده می‌شود)
+    خروجی: ردیف‌های (id, surah_name, verse_number, arabic_text, persian_text, translation, snippet)
+    """
+    query = build_match_query(keywords, columns)
+    if not query:
+        return []
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT v.id, v.surah_name, v.verse_number, v.arabic_text, v.persian_text, v.translation,
+               snippet({FTS_TABLE}, {FTS_COLUMNS.index('translation')}, ?, ?, '…', 12)
+        FROM {FTS_TABLE}
+        JOIN quran_verses_ai v ON v.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY bm25({FTS_TABLE})
+        LIMIT ?
+    """, (SNIPPET_START, SNIPPET_END, query, limit))
+    return cursor.fetchall()
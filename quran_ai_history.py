@@ -0,0 +1,167 @@
+# quran_ai_history.py
+"""
+نوشتن ناهمگام تاریخچه پرسش و پاسخ قرآنی
+
+ask_question فقط ردیف تاریخچه را در صف حافظه می‌گذارد و بلافاصله پاسخ
+می‌دهد؛ یک thread پس‌زمینه صف را دسته‌دسته با executemany در جدول
+quran_qa_history می‌نویسد و هنگام خروج برنامه باقی‌مانده صف را ذخیره می‌کند.
+after_write (اختیاری) در همان تراکنش هر دسته و داخل یک SAVEPOINT اجرا می‌شود،
+مثلاً برای به‌روزرسانی پروفایل موضوعی کاربران؛ خطای آن فقط تغییرات خودش را
+برمی‌گرداند و ردیف‌های تاریخچه ذخیره می‌شوند.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from quran_ai_db import get_connection
+
+
+INSERT_HISTORY_SQL = """
+    INSERT INTO quran_qa_history
+    (user_id, question, question_embedding, answer, related_verses, confidence, response_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+
+class QAHistoryWriter:
+    """نویسنده پس‌زمینه تاریخچه با صف محدود و نوشتن دسته‌ای"""
+
+    def __init__(self, db_path: str, max_queue: int = 10000, batch_size: int = 100,
+                 flush_interval: float = 0.5,
+                 after_write: Optional[Callable[[Any, List[tuple]], None]] = None):
+        self.db_path = db_path
+        self.after_write = after_write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.hook_failed = 0
+        self.batches = 0
+
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='qa-history-writer', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def submit(self, row: tuple) -> bool:
+        """افزودن یک ردیف تاریخچه به صف؛ اگر صف پر باشد ردیف کنار گذاشته می‌شود"""
+        if self._closed:
+            self.dropped += 1
+            return False
+
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            stop = item is _STOP
+            if not stop:
+                batch.append(item)
+
+            # برداشتن بقیه ردیف‌های آماده تا سقف اندازه دسته
+            while len(batch) < self.batch_size and not stop:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+            if stop:
+                # ذخیره هر چه پس از علامت توقف در صف مانده است
+                remaining = []
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        remaining.append(item)
+                if remaining:
+                    self._write(remaining)
+                return
+
+    def _write(self, batch: List[tuple]):
+        conn = get_connection(self.db_path)
+        try:
+            conn.executemany(INSERT_HISTORY_SQL, batch)
+            if self.after_write:
+                self._run_after_write(conn, batch)
+            conn.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            conn.rollback()
+            self.failed += len(batch)
+            print(f"❌ خطا در ذخیره تاریخچه ({len(batch)} ردیف): {e}")
+
+    def _run_after_write(self, conn, batch: List[tuple]):
+        conn.execute("SAVEPOINT history_after_write")
+        try:
+            self.after_write(conn, batch)
+        except Exception as e:
+            conn.execute("ROLLBACK TO SAVEPOINT history_after_write")
+            self.hook_failed += len(batch)
+            print(f"⚠️ خطا در after_write تاریخچه ({len(batch)} ردیف)؛ تاریخچه ذخیره می‌شود: {e}")
+        finally:
+            conn.execute("RELEASE SAVEPOINT history_after_write")
+
+    def close(self, timeout: float = 5.0):
+        """توقف thread و ذخیره ردیف‌های باقی‌مانده در صف"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            return
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                self.queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._thread.join(max(0.0, deadline - time.time()))
+
+    def stats(self) -> Dict[str, Any]:
+        """وضعیت صف: عمق صف و شمارنده‌های نوشته‌شده/کنار گذاشته/ناموفق"""
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue': self.queue.maxsize,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'hook_failed': self.hook_failed,
+            'batches': self.batches,
+            'running': self._thread is not None and self._thread.is_alive()
+        }
@@ -0,0 +1,396 @@
+# quran_ai_hybrid.py
+"""
+موتور ترکیبی پرسش و پاسخ قرآنی
+
+دو مرحله بازیابی اجرا می‌شود:
+1. واژگانی (FTS5 در FastQuranAI) - ارزان و همیشه فعال
+2. معنایی (embedding در QuranAISystem) - فقط اگر در بودجه زمانی جا شود
+
+نتایج دو مرحله با Reciprocal Rank Fusion ترکیب می‌شوند و زمان هر مرحله
+در پاسخ (کلید timings) برگردانده می‌شود.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from quran_ai_fast import FastQuranAI
+from quran_ai_complete import QuranAISystem
+from quran_ai_codec import encode_embedding
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """
+    ترکیب چند فهرست رتبه‌بندی‌شده با RRF: امتیاز هر آیه = Σ 1/(k + رتبه)
+    آیات با شناسه (id) یکسان ادغام می‌شوند.
+    """
+    scores = {}
+    merged = {}
+    for results in result_lists:
+        for rank, verse in enumerate(results, start=1):
+            verse_id = verse.get('id')
+            if verse_id is None:
+                continue
+            scores[verse_id] = scores.get(verse_id, 0.0) + 1.0 / (k + rank)
+            if verse_id in merged:
+                # نگه داشتن اطلاعات تکمیلی هر دو مرحله (similarity و snippet)
+                merged[verse_id] = dict(verse, **merged[verse_id])
+            else:
+                merged[verse_id] = dict(verse)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [dict(merged[verse_id], rrf_score=scores[verse_id]) for verse_id in ranked]
+
+
+class HybridQuranAI:
+    """جستجوی ترکیبی واژگانی + معنایی با بودجه زمانی برای هر درخواست"""
+
+    # ضریب هموارسازی میانگین متحرک زمان مرحله معنایی
+    EWMA_ALPHA = 0.2
+    # اگر مرحله معنایی این مدت (ثانیه) به خاطر برآورد اجرا نشده باشد، یک بار
+    # در همان بودجه باقی‌مانده اجرا می‌شود تا برآورد قدیمی (مثلاً زمان گرم شدن مدل) اصلاح شود
+    PROBE_INTERVAL_S = 30.0
+    # تعداد thread مرحله معنایی؛ وقتی همه مشغول‌اند (مثلاً با کار timeoutشده) کار تازه صف نمی‌شود
+    SEMANTIC_WORKERS = 2
+
+    def __init__(self, db_path: Optional[str] = None, latency_budget_ms: Optional[float] = None,
+                 rrf_k: int = 60, semantic: Optional[QuranAISystem] = None):
+        # مدل در پس‌زمینه بارگذاری می‌شود؛ تا آن زمان فقط مرحله واژگانی اجرا می‌شود
+        self.semantic = semantic if semantic is not None else QuranAISystem(db_path, background_model=True)
+        self.fast = FastQuranAI(self.semantic.db_path)
+        self.db_path = self.semantic.db_path
+        self.latency_budget_ms = latency_budget_ms if latency_budget_ms is not None else Config.QURAN_AI_LATENCY_BUDGET_MS
+        self.rrf_k = rrf_k
+
+        # برآورد زمان مرحله معنایی (میلی‌ثانیه) برای تصمیم‌گیری پیش از اجرا
+        self._semantic_estimate_ms = None
+        self._last_semantic_run = 0.0
+        self._estimate_lock = threading.Lock()
+        self._semantic_inflight = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.SEMANTIC_WORKERS, thread_name_prefix='quran-semantic')
+
+    @property
+    def semantic_ready(self) -> bool:
+        return self.semantic.model is not None
+
+    def _record_semantic_time(self, elapsed_ms: float, probe: bool = False):
+        with self._estimate_lock:
+            self._last_semantic_run = time.monotonic()
+            if self._semantic_estimate_ms is None or probe:
+                self._semantic_estimate_ms = elapsed_ms
+            else:
+                self._semantic_estimate_ms += self.EWMA_ALPHA * (elapsed_ms - self._semantic_estimate_ms)
+
+    def _run_semantic(self, question: str, top_k: int,
+                      probe: bool = False) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Any]], List[Dict]]:
+        """
+        مرحله معنایی در بودجه زمانی: یک encode سوال، سپس کش معنایی پاسخ‌ها و در
+        صورت نبود پاسخ مشابه، جستجوی آیات
+        خروجی: (embedding سوال، پاسخ کش‌شده یا None، آیات مشابه)
+        """
+        start = time.perf_counter()
+        try:
+            embedding = self.semantic.get_embedding(question)
+            if embedding is None:
+                return None, None, []
+            cached = self.semantic.answer_cache.lookup(embedding)
+            if cached:
+                return embedding, cached, []
+            # embedding همین سوال از کش LRU خوانده می‌شود (بدون encode دوباره)
+            return embedding, None, self.semantic.search_similar_verses(question, top_k=top_k)
+        finally:
+            # نتیجه آزمایش دوباره جایگزین برآورد قدیمی می‌شود
+            self._record_semantic_time((time.perf_counter() - start) * 1000, probe=probe)
+
+    def _reserve_worker(self) -> bool:
+        """رزرو یک thread آزاد مرحله معنایی (False اگر همه هنوز مشغول کارهای قبلی باشند)"""
+        with self._estimate_lock:
+            if self._semantic_inflight >= self.SEMANTIC_WORKERS:
+                return False
+            self._semantic_inflight += 1
+            return True
+
+    def _release_worker(self, _future=None):
+        with self._estimate_lock:
+            self._semantic_inflight -= 1
+
+    def _over_budget(self, remaining_ms: float, timings: Dict[str, Any]) -> bool:
+        """آیا برآورد مرحله معنایی از بودجه باقی‌مانده بیشتر است (جز در نوبت آزمایش دوباره)"""
+        with self._estimate_lock:
+            if self._semantic_estimate_ms is None or self._semantic_estimate_ms <= remaining_ms:
+                return False
+            if time.monotonic() - self._last_semantic_run < self.PROBE_INTERVAL_S:
+                return True
+            # فقط یک درخواست در هر بازه آزمایش می‌کند
+            self._last_semantic_run = time.monotonic()
+        timings['semantic_probe'] = True
+        return False
+
+    def _retrieve(self, question: str, top_k: int,
+                  budget_ms: Optional[float]) -> Tuple[List[Dict], Dict[str, Any], Optional[np.ndarray],
+                                                       Optional[Dict[str, Any]]]:
+        """
+        بازیابی ترکیبی
+        خروجی: (آیات رتبه‌بندی‌شده، زمان‌بندی مراحل، embedding سوال اگر مرحله معنایی
+        در بودجه تمام شد، پاسخ کش معنایی اگر سوال مشابهی قبلاً پاسخ داده شده بود)
+        """
+        budget_ms = self.latency_budget_ms if budget_ms is None else budget_ms
+        start = time.perf_counter()
+        timings = {'budget_ms': budget_ms, 'semantic_used': False}
+
+        # مرحله ۱: واژگانی
+        lexical = self.fast.search_verses(question, limit=top_k * 2, random_fallback=False)
+        timings['lexical_ms'] = (time.perf_counter() - start) * 1000
+
+        # مرحله ۲: معنایی، فقط اگر برآورد زمانش در بودجه باقی‌مانده جا شود
+        semantic, embedding, cached = [], None, None
+        remaining_ms = budget_ms - timings['lexical_ms']
+        if not self.semantic_ready:
+            timings['semantic_skipped'] = 'model_unavailable'
+        elif not self._reserve_worker():
+            # کار معنایی پشت کارهای قبلی (که هنوز پس از timeout اجرا می‌شوند) صف نمی‌شود
+            timings['semantic_skipped'] = 'over_budget'
+        elif self._over_budget(remaining_ms, timings):
+            self._release_worker()
+            timings['semantic_skipped'] = 'over_budget'
+        else:
+            semantic_start = time.perf_counter()
+            future = self._executor.submit(self._run_semantic, question, top_k * 2,
+                                           timings.get('semantic_probe', False))
+            future.add_done_callback(self._release_worker)
+            try:
+                embedding, cached, semantic = future.result(timeout=max(remaining_ms, 0) / 1000)
+                timings['semantic_used'] = True
+            except FutureTimeout:
+                # نتیجه دیرهنگام دور ریخته می‌شود ولی embedding آن در کش می‌ماند
+                timings['semantic_skipped'] = 'timeout'
+            except Exception as e:
+                print(f"❌ خطا در جستجوی معنایی: {e}")
+                timings['semantic_skipped'] = 'error'
+            timings['semantic_ms'] = (time.perf_counter() - semantic_start) * 1000
+
+        if cached:
+            timings['answer_cache'] = True
+            timings['cache_similarity'] = cached['similarity']
+        fusion_start = time.perf_counter()
+        if semantic:
+            verses = reciprocal_rank_fusion([lexical, semantic], k=self.rrf_k)[:top_k]
+        else:
+            verses = lexical[:top_k]
+        timings['fusion_ms'] = (time.perf_counter() - fusion_start) * 1000
+        timings['total_ms'] = (time.perf_counter() - start) * 1000
+        return verses, timings, embedding, cached
+
+    def retrieve(self, question: str, top_k: int = 5,
+                 budget_ms: Optional[float] = None) -> Tuple[List[Dict], Dict[str, Any]]:
+        """بازیابی ترکیبی؛ خروجی: (آیات رتبه‌بندی‌شده، زمان‌بندی مراحل)"""
+        verses, timings, _, _ = self._retrieve(question, top_k, budget_ms)
+        return verses, timings
+
+    def _save_history(self, question: str, answer: Dict, user_id: Optional[int], response_time: float,
+                      embedding: Optional[np.ndarray] = None):
+        """ثبت در صف تاریخچه با embedding همان مرحله معنایی (بدون encode جدید)"""
+        self.semantic.history_writer.submit((
+            user_id,
+            question,
+            encode_embedding(embedding, Config.QURAN_AI_HISTORY_EMBEDDING_CODEC) if embedding is not None else None,
+            answer.get('answer'),
+            json.dumps(answer.get('related_verses', []), ensure_ascii=False),
+            answer.get('confidence'),
+            response_time
+        ))
+
+    def ask_question(self, question: str, user_id: Optional[int] = None,
+                     budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        پاسخ به سوال با بازیابی ترکیبی و گزارش زمان هر مرحله
+        سوال تقریباً تکراری (کش معنایی در مرحله معنایی) پاسخ قبلی را برمی‌گرداند.
+        """
+        start = time.perf_counter()
+        verses, timings, embedding, cached = self._retrieve(question, 5, budget_ms)
+        if cached:
+            answer = self._cached_answer(question, cached)
+        else:
+            answer = self._build_answer(question, self.fast.get_fast_answer(question), verses)
+
+        response_time = (time.perf_counter() - start) * 1000
+        timings['response_ms'] = response_time
+        answer['response_time'] = response_time
+        answer['timings'] = timings
+        self._save_history(question, answer, user_id, response_time / 1000, embedding)
+        if not cached:
+            self.semantic.answer_cache.add(embedding, answer)
+        return answer
+
+    def ask_question_stream(self, question: str, user_id: Optional[int] = None,
+                            budget_ms: Optional[float] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        پاسخ مرحله‌ای برای Server-Sent Events؛ هر خروجی (نام رویداد، داده) است:
+        verse (بهترین آیه، بلافاصله پس از بازیابی) ← answer ← related ← suggestions ← done
+        ثبت تاریخچه و کش پاسخ پس از آخرین رویداد (یا قطع اتصال) انجام می‌شود.
+        زمان اولین رویداد (first_event_ms) جدا از زمان کل (total_ms) گزارش می‌شود.
+        """
+        start = time.perf_counter()
+        answer = None
+        verses, timings, embedding, cached = self._retrieve(question, 5, budget_ms)
+        try:
+            if cached:
+                verses = cached['related_verses']
+
+            timings['first_event_ms'] = (time.perf_counter() - start) * 1000
+            yield 'verse', {'verse': verses[0] if verses else None}
+
+            if cached:
+                answer = self._cached_answer(question, cached)
+            else:
+                answer = self._build_answer(question, self.fast.get_fast_answer(question), verses)
+            yield 'answer', {
+                'answer': answer['answer'],
+                'is_quranic': answer['is_quranic'],
+                'confidence': answer['confidence'],
+                'cached': bool(cached)
+            }
+            yield 'related', {'related_verses': answer['related_verses']}
+            yield 'suggestions', {'suggestions': answer['suggestions']}
+
+            timings['total_ms'] = (time.perf_counter() - start) * 1000
+            answer['response_time'] = timings['total_ms']
+            answer['timings'] = timings
+            yield 'done', {'timings': timings}
+        finally:
+            if answer is not None:
+                self._save_history(question, answer, user_id, (time.perf_counter() - start) / 1000, embedding)
+                if not cached:
+                    self.semantic.answer_cache.add(embedding, answer)
+
+    def ask_questions(self, questions: List[str], user_id: Optional[int] = None,
+                      top_k: int = 5) -> Dict[str, Any]:
+        """
+        پاسخ به چند سوال در یک فراخوانی
+        مرحله واژگانی برای هر سوال جدا اجرا می‌شود؛ مرحله معنایی برای همه سوال‌ها
+        با یک encode دسته‌ای و یک ضرب ماتریس در ماتریس. بودجه زمانی درخواست تکی
+        اینجا اعمال نمی‌شود چون هزینه مدل بین همه سوال‌ها تقسیم می‌شود.
+        خروجی: {'results': پاسخ هر سوال به ترتیب ورودی، 'count'، 'total_ms'، 'timings'}
+        """
+        start = time.perf_counter()
+        timings = {'semantic_used': False}
+
+        embeddings = [None] * len(questions)
+        if self.semantic_ready:
+            encode_start = time.perf_counter()
+            embeddings = self.semantic.get_query_embeddings(questions)
+            timings['encode_ms'] = (time.perf_counter() - encode_start) * 1000
+
+        answers: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        pending = []
+        for i, embedding in enumerate(embeddings):
+            cached = self.semantic.answer_cache.lookup(embedding)
+            if cached:
+                answers[i] = self._cached_answer(questions[i], cached)
+            else:
+                pending.append(i)
+        timings['answer_cache_hits'] = len(questions) - len(pending)
+
+        lexical_start = time.perf_counter()
+        lexical = [self.fast.search_verses(questions[i], limit=top_k * 2, random_fallback=False) for i in pending]
+        timings['lexical_ms'] = (time.perf_counter() - lexical_start) * 1000
+
+        semantic = [[] for _ in pending]
+        if pending and not self.semantic_ready:
+            timings['semantic_skipped'] = 'model_unavailable'
+        elif pending:
+            semantic_start = time.perf_counter()
+            try:
+                semantic = self.semantic.search_similar_verses_batch(
+                    [questions[i] for i in pending], top_k=top_k * 2, embeddings=[embeddings[i] for i in pending]
+                )
+                timings['semantic_used'] = True
+            except Exception as e:
+                print(f"❌ خطا در جستجوی معنایی دسته‌ای: {e}")
+                timings['semantic_skipped'] = 'error'
+            timings['semantic_ms'] = (time.perf_counter() - semantic_start) * 1000
+
+        for i, lexical_verses, semantic_verses in zip(pending, lexical, semantic):
+            if semantic_verses:
+                verses = reciprocal_rank_fusion([lexical_verses, semantic_verses], k=self.rrf_k)[:top_k]
+            else:
+                verses = lexical_verses[:top_k]
+            answers[i] = self._build_answer(questions[i], self.fast.get_fast_answer(questions[i]), verses)
+            self.semantic.answer_cache.add(embeddings[i], answers[i])
+
+        total_ms = (time.perf_counter() - start) * 1000
+        # زمان پاسخ هر سوال در تاریخچه: سهم آن از زمان کل دسته
+        response_time = total_ms / len(questions) if questions else 0.0
+        for question, answer, embedding in zip(questions, answers, embeddings):
+            self._save_history(question, answer, user_id, response_time / 1000, embedding)
+
+        timings['total_ms'] = total_ms
+        return {
+            'success': True,
+            'results': answers,
+            'count': len(answers),
+            'total_ms': total_ms,
+            'timings': timings
+        }
+
+    def _cached_answer(self, question: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """پاسخ ذخیره‌شده در کش معنایی"""
+        return {
+            'success': True,
+            'answer': cached['answer'],
+            'is_quranic': bool(cached['related_verses']),
+            'related_verses': cached['related_verses'],
+            'confidence': cached['confidence'],
+            'suggestions': self.fast.get_suggestions(question),
+            'cached': True
+        }
+
+    def _confidence(self, question: str, verses: List[Dict]) -> float:
+        """
+        بهترین شباهت معنایی در نتایج ترکیب‌شده (آیه اول RRF ممکن است فقط واژگانی باشد)؛
+        اگر آیه‌ای از مرحله معنایی نیامده باشد، اطمینان کلیدواژه‌ای موتور سریع
+        """
+        similarities = [verse['similarity'] for verse in verses if 'similarity' in verse]
+        if similarities:
+            return max(similarities)
+        return self.fast.keyword_confidence(question, verses)
+
+    def _build_answer(self, question: str, fast_answer: Optional[str], verses: List[Dict]) -> Dict[str, Any]:
+        """ساخت پاسخ از پاسخ سریع یا آیات بازیابی‌شده"""
+        if fast_answer:
+            answer_text = fast_answer
+            is_quranic = True
+        elif verses:
+            answer_text = self.fast._build_answer(question, verses)
+            is_quranic = True
+        else:
+            answer_text = self.fast._get_fallback_answer(question)
+            is_quranic = False
+
+        return {
+            'success': True,
+            'answer': answer_text,
+            'is_quranic': is_quranic,
+            'related_verses': verses[:3],
+            'confidence': self._confidence(question, verses),
+            'suggestions': self.fast.get_suggestions(question)
+        }
+
+
+hybrid_ai = None
+_hybrid_lock = threading.Lock()
+
+
+def get_hybrid_ai() -> HybridQuranAI:
+    """موتور ترکیبی مشترک در هر پروسه"""
+    global hybrid_ai
+    if hybrid_ai is None:
+        with _hybrid_lock:
+            if hybrid_ai is None:
+                hybrid_ai = HybridQuranAI()
+    return hybrid_ai
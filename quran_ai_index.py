@@ -0,0 +1,363 @@
+# quran_ai_index.py
+"""
+ایندکس برداری آیات قرآن برای جستجوی معنایی
+
+- load_verse_matrix: ماتریس نرمال‌شده embedding آیات (جستجوی دقیق)
+- IVFIndex: ایندکس تقریبی (IVF) با مراکز k-means که روی دیسک ذخیره
+  و هنگام راه‌اندازی به صورت memory-map باز می‌شود
+
+ساخت ایندکس:
+    python quran_ai_index.py build --lists 64
+سنجش دقت (recall) و سرعت نسبت به جستجوی دقیق:
+    python quran_ai_index.py bench --nprobe 1 2 4 8 16
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from quran_ai_db import get_connection, default_db_path
+from quran_ai_codec import decode_embeddings
+
+
+def load_verse_matrix(db_path: str) -> Tuple[np.ndarray, List[Dict]]:
+    """خواندن همه embeddingهای آیات در یک ماتریس پیوسته و نرمال‌شده float32"""
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, surah_name, verse_number, arabic_text, persian_text, translation, embedding FROM quran_verses_ai WHERE embedding IS NOT NULL")
+    verses = cursor.fetchall()
+
+    # blobها ممکن است float32 قدیمی، float16 یا int8 باشند؛ باز کردن دسته‌ای
+    # ردیف‌های خالی یا ناهم‌بعد را کنار می‌گذارد
+    matrix, valid = decode_embeddings([verse[6] for verse in verses])
+    if not len(valid):
+        return np.zeros((0, 0), dtype=np.float32), []
+
+    rows = []
+    for position in valid:
+        verse_id, surah_name, verse_number, arabic_text, persian_text, translation, _ = verses[position]
+        rows.append({
+            'id': verse_id,
+            'surah': surah_name,
+            'ayah': verse_number,
+            'text': arabic_text,
+            'translation': translation or persian_text
+        })
+
+    return normalize_rows(matrix), rows
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """نرمال‌سازی L2 سطرهای ماتریس"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """اندیس k امتیاز برتر به ترتیب نزولی (بدون مرتب‌سازی کل آرایه)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def exact_search(matrix: np.ndarray, query: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """جستجوی دقیق: یک ضرب ماتریس در بردار روی همه آیات (query باید نرمال باشد)"""
+    scores = matrix @ query
+    top = top_k_indices(scores, top_k)
+    return top, scores[top]
+
+
+def exact_search_batch(matrix: np.ndarray, queries: np.ndarray, top_k: int = 5,
+                       chunk_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    جستجوی دقیق چند پرسش با ضرب ماتریس در ماتریس (سطرهای queries باید نرمال باشند)
+    خروجی: (اندیس‌ها، امتیازها) هر دو به شکل (تعداد پرسش، k) و مرتب نزولی
+    پرسش‌ها در تکه‌های chunk_size ضرب می‌شوند تا ماتریس امتیازها کوچک بماند.
+    """
+    n_queries = len(queries)
+    k = min(top_k, matrix.shape[0])
+    top = np.zeros((n_queries, max(k, 0)), dtype=np.int64)
+    top_scores = np.zeros((n_queries, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return top, top_scores
+
+    for start in range(0, n_queries, chunk_size):
+        scores = queries[start:start + chunk_size] @ matrix.T
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        top[start:start + chunk_size] = np.take_along_axis(part, order, axis=1)
+        top_scores[start:start + chunk_size] = np.take_along_axis(part_scores, order, axis=1)
+    return top, top_scores
+
+
+def kmeans(matrix: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 0,
+           chunk_size: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+    """k-means کروی (شباهت کسینوسی) روی سطرهای نرمال‌شده؛ خروجی: (مراکز، برچسب‌ها)"""
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    n_clusters = max(1, min(n_clusters, n))
+    centroids = matrix[rng.choice(n, n_clusters, replace=False)].copy()
+    labels = np.zeros(n, dtype=np.int64)
+
+    for iteration in range(iterations):
+        # تخصیص هر بردار به نزدیک‌ترین مرکز (تکه‌تکه برای محدود ماندن حافظه)
+        for start in range(0, n, chunk_size):
+            block = matrix[start:start + chunk_size]
+            labels[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, matrix)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        # مراکز خالی دوباره با یک بردار تصادفی مقداردهی می‌شوند
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = matrix[rng.choice(n, len(empty), replace=False)]
+        new_centroids = normalize_rows(sums)
+
+        if np.allclose(new_centroids, centroids, atol=1e-6):
+            centroids = new_centroids
+            break
+        centroids = new_centroids
+
+    return centroids, labels
+
+
+class IVFIndex:
+    """ایندکس فایل معکوس (IVF): بردارها بر اساس نزدیک‌ترین مرکز k-means گروه‌بندی می‌شوند"""
+
+    FILES = ('centroids.npy', 'offsets.npy', 'ids.npy', 'vectors.npy')
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray,
+                 vectors: np.ndarray, meta: Optional[Dict] = None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, ids, n_lists: Optional[int] = None,
+              iterations: int = 20, seed: int = 0) -> 'IVFIndex':
+        """ساخت ایندکس از ماتریس نرمال‌شده و شناسه آیات"""
+        matrix = normalize_rows(matrix)
+        ids = np.asarray(ids, dtype=np.int64)
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(ids))) or 1
+
+        centroids, labels = kmeans(matrix, n_lists, iterations=iterations, seed=seed)
+
+        # مرتب‌سازی بردارها بر اساس لیست تا هر لیست یک بازه پیوسته باشد
+        order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        meta = {
+            'count': int(len(ids)),
+            'dim': int(matrix.shape[1]),
+            'n_lists': int(len(centroids)),
+            'max_id': int(ids.max()) if len(ids) else 0,
+            'built_at': datetime.now().isoformat()
+        }
+        return cls(centroids, offsets, ids[order], np.ascontiguousarray(matrix[order]), meta)
+
+    def save(self, directory: str):
+        """ذخیره ایندکس در یک پوشه (فایل‌های npy قابل memory-map)"""
+        os.makedirs(directory, exist_ok=True)
+        for name, array in zip(self.FILES, (self.centroids, self.offsets, self.ids, self.vectors)):
+            np.save(os.path.join(directory, name), np.asarray(array))
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'IVFIndex':
+        """بارگذاری ایندکس؛ بردارها و شناسه‌ها به صورت memory-map باز می‌شوند"""
+        mode = 'r' if mmap else None
+        centroids = np.load(os.path.join(directory, 'centroids.npy'))
+        offsets = np.load(os.path.join(directory, 'offsets.npy'))
+        ids = np.load(os.path.join(directory, 'ids.npy'), mmap_mode=mode)
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode=mode)
+        meta = {}
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        return cls(centroids, offsets, ids, vectors, meta)
+
+    def search(self, query: np.ndarray, top_k: int = 5, nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        جستجوی تقریبی؛ nprobe تعداد لیست‌های بررسی‌شده است
+        (بیشتر = recall بالاتر و تأخیر بیشتر، برابر n_lists = جستجوی دقیق)
+        خروجی: (شناسه آیات، امتیاز شباهت)
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        probes = top_k_indices(self.centroids @ query, nprobe)
+
+        candidate_ids = []
+        candidate_scores = []
+        for probe in probes:
+            start, end = self.offsets[probe], self.offsets[probe + 1]
+            if start == end:
+                continue
+            candidate_scores.append(self.vectors[start:end] @ query)
+            candidate_ids.append(self.ids[start:end])
+
+        if not candidate_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = np.concatenate(candidate_scores)
+        ids = np.concatenate(candidate_ids)
+        top = top_k_indices(scores, top_k)
+        return ids[top], scores[top]
+
+
+def index_path(db_path: str) -> str:
+    """مسیر پوشه ایندکس کنار فایل دیتابیس"""
+    return f"{db_path}.ivf"
+
+
+def verse_fingerprint(db_path: str) -> Dict[str, int]:
+    """
+    امضای ارزان embeddingهای آیات برای تشخیص کهنه بودن ایندکس
+    تعداد، بیشترین و مجموع شناسه‌ها و حجم blobها افزودن و حذف آیه را نشان می‌دهند؛
+    شمارنده embedding_updates (تریگر quran_ai_stats.py) embed دوباره آیه موجود را
+    """
+    conn = get_connection(db_path)
+    count, max_id, id_sum, size = conn.execute("""
+        SELECT COUNT(*), MAX(id), SUM(id), SUM(LENGTH(embedding))
+        FROM quran_verses_ai WHERE embedding IS NOT NULL
+    """).fetchone()
+    try:
+        row = conn.execute("SELECT value FROM quran_ai_counters WHERE name = 'embedding_updates'").fetchone()
+    except sqlite3.OperationalError:
+        # جدول شمارنده‌ها هنوز ساخته نشده است
+        row = None
+    return {
+        'count': count,
+        'max_id': max_id or 0,
+        'id_sum': id_sum or 0,
+        'bytes': size or 0,
+        'embedding_updates': row[0] if row else 0
+    }
+
+
+def load_index_for_db(db_path: str) -> Optional[IVFIndex]:
+    """بارگذاری ایندکس ذخیره‌شده در صورت وجود و هم‌خوانی با دیتابیس"""
+    directory = index_path(db_path)
+    if not os.path.exists(os.path.join(directory, 'vectors.npy')):
+        return None
+
+    try:
+        index = IVFIndex.load(directory)
+        if index.meta.get('fingerprint') != verse_fingerprint(db_path):
+            print("⚠️ ایندکس ANN با دیتابیس هم‌خوان نیست؛ از جستجوی دقیق استفاده می‌شود. (python quran_ai_index.py build)")
+            return None
+        print(f"✅ ایندکس ANN بارگذاری شد ({len(index)} آیه، {index.n_lists} لیست)")
+        return index
+    except Exception as e:
+        print(f"❌ خطا در بارگذاری ایندکس ANN: {e}")
+        return None
+
+
+def build_index_for_db(db_path: str, n_lists: Optional[int] = None, iterations: int = 20,
+                       seed: int = 0) -> Optional[IVFIndex]:
+    """ساخت و ذخیره ایندکس از embeddingهای جدول quran_verses_ai"""
+    # امضا پیش از خواندن آیات گرفته می‌شود؛ تغییر هم‌زمان ایندکس را کهنه نشان می‌دهد
+    fingerprint = verse_fingerprint(db_path)
+    matrix, rows = load_verse_matrix(db_path)
+    if not rows:
+        print("⚠️ هیچ آیه‌ای با embedding پیدا نشد")
+        return None
+
+    start = time.time()
+    index = IVFIndex.build(matrix, [r['id'] for r in rows], n_lists=n_lists,
+                           iterations=iterations, seed=seed)
+    index.meta['fingerprint'] = fingerprint
+    index.save(index_path(db_path))
+    print(f"✅ ایندکس با {len(index)} آیه و {index.n_lists} لیست در {time.time() - start:.2f} ثانیه ساخته شد: {index_path(db_path)}")
+    return index
+
+
+def benchmark(db_path: str, nprobes: List[int], top_k: int = 5, n_queries: int = 200,
+              noise: float = 0.05, seed: int = 0) -> List[Dict]:
+    """
+    سنجش recall@k و تأخیر ایندکس در برابر جستجوی دقیق (مرجع)
+    پرسش‌ها بردارهای خود آیات با کمی نویز هستند تا نیازی به مدل نباشد
+    """
+    matrix, rows = load_verse_matrix(db_path)
+    if not rows:
+        print("⚠️ هیچ آیه‌ای با embedding پیدا نشد")
+        return []
+
+    index = IVFIndex.load(index_path(db_path))
+    ids = np.array([r['id'] for r in rows], dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(rows), min(n_queries, len(rows)), replace=False)
+    queries = normalize_rows(matrix[picks] + rng.normal(0, noise, (len(picks), matrix.shape[1])))
+
+    start = time.perf_counter()
+    truth = [set(ids[exact_search(matrix, q, top_k)[0]]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    results = [{'method': 'exact', 'nprobe': None, 'recall': 1.0, 'latency_ms': exact_ms}]
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        found = [index.search(q, top_k, nprobe)[0] for q in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        for expected, got in zip(truth, found):
+            hits += len(expected & set(got.tolist()))
+        results.append({
+            'method': 'ivf',
+            'nprobe': nprobe,
+            'recall': hits / (len(queries) * min(top_k, len(rows))),
+            'latency_ms': latency_ms
+        })
+
+    print(f"{'روش':<8}{'nprobe':>8}{'recall@' + str(top_k):>12}{'ms/query':>12}")
+    for r in results:
+        print(f"{r['method']:<8}{str(r['nprobe'] or '-'):>8}{r['recall']:>12.3f}{r['latency_ms']:>12.3f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ایندکس ANN آیات قرآن")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='ساخت ایندکس')
+    build_parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    build_parser.add_argument('--lists', type=int, default=None, help='تعداد لیست‌ها (پیش‌فرض: جذر تعداد آیات)')
+    build_parser.add_argument('--iterations', type=int, default=20)
+    build_parser.add_argument('--seed', type=int, default=0)
+
+    bench_parser = subparsers.add_parser('bench', help='سنجش recall و تأخیر')
+    bench_parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    bench_parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    bench_parser.add_argument('--k', type=int, default=5)
+    bench_parser.add_argument('--queries', type=int, default=200)
+
+    args = parser.parse_args()
+    db_path = args.db or default_db_path()
+    if args.command == 'build':
+        build_index_for_db(db_path, n_lists=args.lists, iterations=args.iterations, seed=args.seed)
+    else:
+        benchmark(db_path, args.nprobe, top_k=args.k, n_queries=args.queries)
@@ -0,0 +1,216 @@
+# quran_ai_ingest.py
+"""
+ورود انبوه آیات قرآن به جدول quran_verses_ai
+
+- خواندن جریانی فایل tanzil (sura|aya|text) یا CSV
+- embedding دسته‌ای با encode(batch_size=...)
+- نوشتن با executemany در تراکنش‌های تکه‌ای؛ آیه تکراری (همان سوره و شماره) به‌روز
+  می‌شود، پس ورود دوباره یا --restart آیات را دوبار نمی‌نویسد
+- ادامه از نقطه توقف پس از قطع شدن (جدول quran_ingest_progress)
+
+نمونه:
+    python quran_ai_ingest.py --corpus quran-simple.txt --translation fa.makarem.txt
+    python quran_ai_ingest.py --corpus verses.csv --chunk-size 1000 --batch-size 128
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional
+
+
+# نام سوره‌ها به ترتیب مصحف (فایل‌های tanzil فقط شماره سوره دارند)
+SURAH_NAMES = [
+    'فاتحه', 'بقره', 'آل عمران', 'نساء', 'مائده', 'انعام', 'اعراف', 'انفال', 'توبه', 'یونس',
+    'هود', 'یوسف', 'رعد', 'ابراهیم', 'حجر', 'نحل', 'اسراء', 'کهف', 'مریم', 'طه',
+    'انبیاء', 'حج', 'مؤمنون', 'نور', 'فرقان', 'شعراء', 'نمل', 'قصص', 'عنکبوت', 'روم',
+    'لقمان', 'سجده', 'احزاب', 'سبأ', 'فاطر', 'یس', 'صافات', 'ص', 'زمر', 'غافر',
+    'فصلت', 'شوری', 'زخرف', 'دخان', 'جاثیه', 'احقاف', 'محمد', 'فتح', 'حجرات', 'ق',
+    'ذاریات', 'طور', 'نجم', 'قمر', 'رحمن', 'واقعه', 'حدید', 'مجادله', 'حشر', 'ممتحنه',
+    'صف', 'جمعه', 'منافقون', 'تغابن', 'طلاق', 'تحریم', 'ملک', 'قلم', 'حاقه', 'معارج',
+    'نوح', 'جن', 'مزمل', 'مدثر', 'قیامت', 'انسان', 'مرسلات', 'نبأ', 'نازعات', 'عبس',
+    'تکویر', 'انفطار', 'مطففین', 'انشقاق', 'بروج', 'طارق', 'اعلی', 'غاشیه', 'فجر', 'بلد',
+    'شمس', 'لیل', 'ضحی', 'شرح', 'تین', 'علق', 'قدر', 'بینه', 'زلزله', 'عادیات',
+    'قارعه', 'تکاثر', 'عصر', 'همزه', 'فیل', 'قریش', 'ماعون', 'کوثر', 'کافرون', 'نصر',
+    'مسد', 'اخلاص', 'فلق', 'ناس'
+]
+
+
+def surah_name(surah_number: int) -> Optional[str]:
+    """نام فارسی سوره از روی شماره"""
+    if 1 <= surah_number <= len(SURAH_NAMES):
+        return SURAH_NAMES[surah_number - 1]
+    return None
+
+
+def _iter_tanzil_lines(path: str) -> Iterator[tuple]:
+    """خواندن خط به خط فایل tanzil با قالب sura|aya|text (خطوط # توضیح هستند)"""
+    with open(path, encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('|', 2)
+            if len(parts) != 3:
+                continue
+            yield int(parts[0]), int(parts[1]), parts[2].strip()
+
+
+def iter_tanzil(arabic_path: str, translation_path: Optional[str] = None) -> Iterator[Dict]:
+    """
+    آیات از فایل متن عربی tanzil، همراه با فایل ترجمه هم‌ترتیب (اختیاری)
+    هر دو فایل هم‌زمان و به صورت جریانی خوانده می‌شوند.
+    """
+    arabic_lines = _iter_tanzil_lines(arabic_path)
+    translation_lines = _iter_tanzil_lines(translation_path) if translation_path else itertools.repeat(None)
+
+    for arabic, translated in zip(arabic_lines, translation_lines):
+        surah_number, verse_number, arabic_text = arabic
+        translation = None
+        if translated is not None:
+            if translated[:2] != (surah_number, verse_number):
+                raise ValueError(f"ترتیب فایل ترجمه با متن عربی یکسان نیست: {translated[:2]} != {(surah_number, verse_number)}")
+            translation = translated[2]
+
+        yield {
+            'surah_number': surah_number,
+            'surah_name': surah_name(surah_number),
+            'verse_number': verse_number,
+            'arabic_text': arabic_text,
+            'persian_text': translation,
+            'translation': translation
+        }
+
+
+def iter_csv(path: str) -> Iterator[Dict]:
+    """
+    آیات از فایل CSV با سرستون‌های
+    surah_number, surah_name, verse_number, arabic_text, persian_text, translation
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            surah_number = int(row['surah_number']) if row.get('surah_number') else None
+            yield {
+                'surah_number': surah_number,
+                'surah_name': row.get('surah_name') or (surah_name(surah_number) if surah_number else None),
+                'verse_number': int(row['verse_number']) if row.get('verse_number') else None,
+                'arabic_text': row.get('arabic_text') or None,
+                'persian_text': row.get('persian_text') or None,
+                'translation': row.get('translation') or None
+            }
+
+
+def iter_corpus(corpus_path: str, translation_path: Optional[str] = None) -> Iterator[Dict]:
+    """انتخاب خواننده مناسب بر اساس پسوند فایل"""
+    if corpus_path.lower().endswith('.csv'):
+        return iter_csv(corpus_path)
+    return iter_tanzil(corpus_path, translation_path)
+
+
+def _ensure_progress_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_ingest_progress (
+            source TEXT PRIMARY KEY,
+            processed INTEGER DEFAULT 0,
+            finished BOOLEAN DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def _get_progress(conn, source: str) -> tuple:
+    cursor = conn.execute("SELECT processed, finished FROM quran_ingest_progress WHERE source = ?", (source,))
+    row = cursor.fetchone()
+    return (row[0], bool(row[1])) if row else (0, False)
+
+
+def _save_progress(cursor, source: str, processed: int, finished: bool = False):
+    cursor.execute("""
+        INSERT OR REPLACE INTO quran_ingest_progress (source, processed, finished, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    """, (source, processed, int(finished)))
+
+
+def bulk_ingest(system, verses: Iterator[Dict], source: str, batch_size: int = 64,
+                chunk_size: int = 512, resume: bool = True) -> int:
+    """
+    ورود انبوه آیات با تراکنش‌های تکه‌ای
+
+    هر تکه (chunk_size آیه) در یک تراکنش نوشته می‌شود و شمارنده پیشرفت منبع
+    در همان تراکنش به‌روز می‌شود، پس پس از قطع شدن، اجرای دوباره از اولین
+    تکه ننوشته ادامه می‌دهد. خروجی: تعداد آیات نوشته‌شده در این اجرا
+    """
+    conn = sqlite3.connect(system.db_path)
+    _ensure_progress_table(conn)
+
+    processed, finished = _get_progress(conn, source) if resume else (0, False)
+    if finished:
+        conn.close()
+        print(f"✅ منبع {source} قبلاً کامل وارد شده است")
+        return 0
+    if processed:
+        print(f"↩️ ادامه ورود {source} از آیه {processed + 1}")
+
+    verses = itertools.islice(verses, processed, None)
+    written = 0
+    start_time = time.time()
+
+    try:
+        while True:
+            chunk = list(itertools.islice(verses, chunk_size))
+            if not chunk:
+                break
+
+            cursor = conn.cursor()
+            system.insert_verses_batch(cursor, chunk, batch_size)
+            processed += len(chunk)
+            _save_progress(cursor, source, processed)
+            conn.commit()
+
+            written += len(chunk)
+            elapsed = time.time() - start_time
+            rate = written / elapsed if elapsed > 0 else 0.0
+            print(f"📥 {processed} آیه وارد شد ({rate:.1f} آیه در ثانیه)")
+
+        cursor = conn.cursor()
+        _save_progress(cursor, source, processed, finished=True)
+        conn.commit()
+    finally:
+        conn.close()
+        if written:
+            system.on_verses_changed()
+
+    elapsed = time.time() - start_time
+    print(f"✅ ورود {source} کامل شد: {written} آیه در {elapsed:.1f} ثانیه")
+    return written
+
+
+def import_corpus(system, corpus_path: str, translation_path: Optional[str] = None,
+                  batch_size: int = 64, chunk_size: int = 512, resume: bool = True) -> int:
+    """ورود یک فایل قرآن (tanzil یا CSV) با شناسه منبع ثابت برای ادامه پس از توقف"""
+    source = os.path.basename(corpus_path)
+    if translation_path:
+        source += '+' + os.path.basename(translation_path)
+    verses = iter_corpus(corpus_path, translation_path)
+    return bulk_ingest(system, verses, source, batch_size=batch_size,
+                       chunk_size=chunk_size, resume=resume)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ورود انبوه آیات قرآن به هوش مصنوعی قرآنی")
+    parser.add_argument('--corpus', required=True, help='فایل متن قرآن (tanzil: sura|aya|text یا CSV)')
+    parser.add_argument('--translation', help='فایل ترجمه tanzil هم‌ترتیب با متن عربی')
+    parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    parser.add_argument('--batch-size', type=int, default=64, help='اندازه دسته encode مدل')
+    parser.add_argument('--chunk-size', type=int, default=512, help='تعداد آیات هر تراکنش')
+    parser.add_argument('--restart', action='store_true', help='نادیده گرفتن پیشرفت ذخیره‌شده')
+    args = parser.parse_args()
+
+    from quran_ai_complete import QuranAISystem
+    ai = QuranAISystem(args.db)
+    import_corpus(ai, args.corpus, translation_path=args.translation, batch_size=args.batch_size,
+                  chunk_size=args.chunk_size, resume=not args.restart)
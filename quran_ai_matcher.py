@@ -0,0 +1,111 @@
+# quran_ai_matcher.py
+"""
+تطبیق هم‌زمان چند کلیدواژه در یک گذر
+
+جدول‌های کلیدواژه (موضوع ← کلمات) یک بار به یک عبارت منظم ترکیبی
+(?=(کلمه۱|کلمه۲|...)) کامپایل می‌شوند که در هر موقعیت متن، بلندترین
+کلیدواژه شروع‌شونده از آنجا را پیدا می‌کند. کلیدواژه‌هایی که پیشوند کلیدواژه
+پیدا شده هستند از قبل محاسبه شده‌اند، پس نتیجه دقیقاً همان «kw in text» برای
+همه کلیدواژه‌هاست، ولی متن فقط یک بار پیمایش می‌شود.
+
+کلیدواژه بدون فاصله فقط درون یک «کلمه» (بخش بین فاصله‌ها) می‌تواند باشد، پس
+برای متن‌های بلند عبارت منظم روی کلمات یکتای متن اجرا می‌شود و هزینه به
+اندازه واژگان متن بستگی دارد، نه طول آن. کلیدواژه‌های چندکلمه‌ای (که معدودند)
+جداگانه روی متن کامل بررسی می‌شوند.
+
+matcherهای کامپایل‌شده بر اساس محتوای جدول کش می‌شوند؛ با تغییر جدول،
+اثر انگشت آن تغییر می‌کند و matcher تازه ساخته می‌شود.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+
+class KeywordMatcher:
+    """matcher کامپایل‌شده برای یک جدول برچسب ← کلیدواژه‌ها"""
+
+    # از این طول به بعد، متن پیش از تطبیق به کلمات یکتا فشرده می‌شود
+    COMPACT_THRESHOLD = 512
+
+    def __init__(self, table: Mapping[str, Iterable[str]]):
+        self.labels = list(table)
+        self.keyword_labels: Dict[str, List[str]] = {}
+        for label, keywords in table.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword:
+                    self.keyword_labels.setdefault(keyword, []).append(label)
+
+        keywords = sorted(self.keyword_labels, key=len, reverse=True)
+        self._phrases = [k for k in keywords if any(ch.isspace() for ch in k)]
+        words = [k for k in keywords if k not in self._phrases]
+        # کلیدواژه‌هایی که با پیدا شدن هر کلیدواژه در همان موقعیت نیز حاضرند
+        self._prefixes = {
+            keyword: [other for other in words if keyword.startswith(other)]
+            for keyword in words
+        }
+        self._pattern = None
+        if words:
+            self._pattern = re.compile('(?=(' + '|'.join(re.escape(k) for k in words) + '))')
+
+    def find(self, text: str) -> Set[str]:
+        """مجموعه کلیدواژه‌هایی که در متن آمده‌اند"""
+        if not text:
+            return set()
+        text = text.lower()
+        found = {phrase for phrase in self._phrases if phrase in text}
+        if self._pattern is not None:
+            if len(text) > self.COMPACT_THRESHOLD:
+                words = '\n'.join(set(text.split()))
+            else:
+                words = text
+            for match in self._pattern.finditer(words):
+                found.update(self._prefixes[match.group(1)])
+        return found
+
+    def labels_in(self, text: str) -> List[str]:
+        """برچسب‌هایی که دست‌کم یک کلیدواژه‌شان در متن است (به ترتیب جدول)"""
+        matched = {label for keyword in self.find(text) for label in self.keyword_labels[keyword]}
+        return [label for label in self.labels if label in matched]
+
+    def first_label(self, text: str) -> Optional[str]:
+        """اولین برچسب جدول که در متن پیدا شود"""
+        labels = self.labels_in(text)
+        return labels[0] if labels else None
+
+    def count_by_label(self, text: str) -> Dict[str, int]:
+        """تعداد کلیدواژه‌های متمایز پیدا شده از هر برچسب"""
+        counts = {label: 0 for label in self.labels}
+        for keyword in self.find(text):
+            for label in self.keyword_labels[keyword]:
+                counts[label] += 1
+        return counts
+
+
+_cache: 'OrderedDict[tuple, KeywordMatcher]' = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 32
+
+
+def table_fingerprint(table: Mapping[str, Iterable[str]]) -> tuple:
+    """اثر انگشت محتوای جدول (تغییر هر کلیدواژه آن را تغییر می‌دهد)"""
+    return tuple((label, tuple(keywords)) for label, keywords in table.items())
+
+
+def get_matcher(table: Mapping[str, Iterable[str]]) -> KeywordMatcher:
+    """matcher کامپایل‌شده جدول؛ بین درخواست‌ها مشترک است و با تغییر جدول دوباره ساخته می‌شود"""
+    key = table_fingerprint(table)
+    with _cache_lock:
+        matcher = _cache.get(key)
+        if matcher is not None:
+            _cache.move_to_end(key)
+            return matcher
+
+    matcher = KeywordMatcher(table)
+    with _cache_lock:
+        _cache[key] = matcher
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return matcher
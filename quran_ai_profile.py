@@ -0,0 +1,141 @@
+# quran_ai_profile.py
+"""
+پروفایل موضوعی کاربران برای آیه روز شخصی
+
+جدول user_topic_profile امتیاز هر (کاربر، موضوع) را نگه می‌دارد و به‌صورت
+افزایشی به‌روز می‌شود:
+- هر سوال پاسخ‌داده‌شده: موضوعات آیات مرتبط پاسخ به اندازه relevance
+  (در همان تراکنش نوشتن دسته‌ای تاریخچه)
+- هر بازخورد (add_feedback): تغییر بازخورد ضرب در FEEDBACK_WEIGHT
+
+موضوع ترجیحی کاربر یک جستجوی ایندکسی روی (user_id, score) است، مستقل از
+تعداد سوالات قبلی او.
+"""
+
+import json
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# وزن هر سوال پاسخ‌داده‌شده و هر واحد بازخورد
+ANSWER_WEIGHT = 1.0
+FEEDBACK_WEIGHT = 2.0
+
+UPSERT_PROFILE_SQL = """
+    INSERT INTO user_topic_profile (user_id, topic_id, score, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id, topic_id) DO UPDATE SET
+        score = score + excluded.score,
+        updated_at = excluded.updated_at
+"""
+
+
+def ensure_profile_table(conn: sqlite3.Connection) -> bool:
+    """ایجاد جدول پروفایل؛ اگر تازه ساخته شد از تاریخچه موجود پر می‌شود"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_topic_profile'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_topic_profile (
+            user_id INTEGER NOT NULL,
+            topic_id INTEGER NOT NULL,
+            score FLOAT NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, topic_id),
+            FOREIGN KEY (topic_id) REFERENCES quran_topics(id)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_topic_profile_score
+        ON user_topic_profile (user_id, score DESC)
+    """)
+    if not exists:
+        with conn:
+            rebuild_profiles(conn)
+    return not exists
+
+
+def _verse_ids(related_verses_json: Optional[str]) -> List[int]:
+    """شناسه آیات مرتبط از JSON ذخیره‌شده در تاریخچه"""
+    if not related_verses_json:
+        return []
+    try:
+        verses = json.loads(related_verses_json)
+    except (TypeError, ValueError):
+        return []
+    return [v['id'] for v in verses if isinstance(v, dict) and v.get('id') is not None]
+
+
+def topic_weights(conn: sqlite3.Connection, verse_ids: List[int]) -> Dict[int, float]:
+    """مجموع relevance هر موضوع در آیات داده‌شده (کلید اصلی verse_topic_mapping)"""
+    if not verse_ids:
+        return {}
+    weights: Dict[int, float] = defaultdict(float)
+    rows = conn.execute(f"""
+        SELECT topic_id, COALESCE(relevance, 1.0) FROM verse_topic_mapping
+        WHERE verse_id IN ({','.join('?' * len(verse_ids))})
+    """, verse_ids).fetchall()
+    for topic_id, relevance in rows:
+        weights[topic_id] += relevance
+    return weights
+
+
+def _apply(conn: sqlite3.Connection, deltas: Dict[Tuple[int, int], float]):
+    conn.executemany(UPSERT_PROFILE_SQL, [
+        (user_id, topic_id, delta) for (user_id, topic_id), delta in deltas.items() if delta
+    ])
+
+
+def add_answers(conn: sqlite3.Connection, answers: Iterable[Tuple[Optional[int], Optional[str]]],
+                weight: float = ANSWER_WEIGHT):
+    """
+    افزودن سوالات پاسخ‌داده‌شده به پروفایل‌ها (بدون commit)
+    answers: (user_id، JSON آیات مرتبط)
+    """
+    deltas: Dict[Tuple[int, int], float] = defaultdict(float)
+    for user_id, related_verses_json in answers:
+        if not user_id:
+            continue
+        for topic_id, relevance in topic_weights(conn, _verse_ids(related_verses_json)).items():
+            deltas[(user_id, topic_id)] += weight * relevance
+    _apply(conn, deltas)
+
+
+def update_from_history_batch(conn: sqlite3.Connection, batch: List[tuple]):
+    """به‌روزرسانی پروفایل از ردیف‌های دسته تاریخچه (در تراکنش QAHistoryWriter)"""
+    add_answers(conn, ((row[0], row[4]) for row in batch))
+
+
+def apply_feedback(conn: sqlite3.Connection, user_id: Optional[int], related_verses_json: Optional[str],
+                   old_feedback: int, new_feedback: int):
+    """اعمال تغییر بازخورد یک سوال روی پروفایل کاربر (بدون commit)"""
+    change = (new_feedback or 0) - (old_feedback or 0)
+    if change:
+        add_answers(conn, [(user_id, related_verses_json)], weight=change * FEEDBACK_WEIGHT)
+
+
+def preferred_topic(conn: sqlite3.Connection, user_id: int) -> Optional[int]:
+    """موضوع با بیشترین امتیاز مثبت کاربر (جستجوی ایندکسی)"""
+    row = conn.execute("""
+        SELECT topic_id FROM user_topic_profile
+        WHERE user_id = ? AND score > 0
+        ORDER BY score DESC
+        LIMIT 1
+    """, (user_id,)).fetchone()
+    return row[0] if row else None
+
+
+def rebuild_profiles(conn: sqlite3.Connection):
+    """ساخت دوباره همه پروفایل‌ها از quran_qa_history (بدون commit)"""
+    conn.execute("DELETE FROM user_topic_profile")
+    deltas: Dict[Tuple[int, int], float] = defaultdict(float)
+    rows = conn.execute("""
+        SELECT user_id, related_verses, feedback FROM quran_qa_history
+        WHERE user_id IS NOT NULL
+    """)
+    for user_id, related_verses_json, feedback in rows:
+        weight = ANSWER_WEIGHT + (feedback or 0) * FEEDBACK_WEIGHT
+        for topic_id, relevance in topic_weights(conn, _verse_ids(related_verses_json)).items():
+            deltas[(user_id, topic_id)] += weight * relevance
+    _apply(conn, deltas)
@@ -0,0 +1,213 @@
+# quran_ai_stats.py
+"""
+شمارنده‌های آماری هوش مصنوعی قرآنی
+
+به جای COUNT(*) و COUNT(DISTINCT user_id) روی جداول رو به رشد، شمارنده‌ها در
+جدول quran_ai_counters (سراسری) و quran_ai_user_counters (هر کاربر) نگه داشته و با
+تریگرهای SQLite در همان تراکنش هر INSERT/DELETE به‌روز می‌شوند؛ خواندن آمار
+یک جستجوی کلید اصلی است. شمارنده embedding_updates با هر تغییر embedding یک آیه
+بالا می‌رود و ایندکس ANN (quran_ai_index.py) با آن کهنه بودن خود را تشخیص می‌دهد.
+شمارنده verse_changes با هر INSERT/UPDATE/DELETE آیات بالا می‌رود و
+verses_changed_at زمان (unix) آخرین تغییر را نگه می‌دارد؛ کش‌های پروسه‌های دیگر
+(کش معنایی پاسخ‌ها) با آن‌ها تغییر آیات را تشخیص می‌دهند. topic_mapping_changes
+با هر تغییر verse_topic_mapping بالا می‌رود (نمونه‌بردار آیات، quran_verse_sampler.py).
+
+reconcile_counters شمارنده‌ها را از روی خود جداول دوباره می‌سازد (برای
+تغییراتی که از تریگرها رد نمی‌شوند) و به‌صورت دوره‌ای اجرا می‌شود:
+    python stat_counters.py
+"""
+
+import sqlite3
+from typing import Dict, Optional
+
+from quran_ai_db import get_connection, default_db_path
+
+
+COUNTER_NAMES = ('total_verses', 'total_questions', 'unique_users')
+
+_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_verses_insert AFTER INSERT ON quran_verses_ai
+    BEGIN
+        UPDATE quran_ai_counters SET value = value + 1 WHERE name = 'total_verses';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_verses_delete AFTER DELETE ON quran_verses_ai
+    BEGIN
+        UPDATE quran_ai_counters SET value = value - 1 WHERE name = 'total_verses';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_verses_embedding AFTER UPDATE OF embedding ON quran_verses_ai
+    WHEN OLD.embedding IS NOT NEW.embedding
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('embedding_updates', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_verses_changed_insert AFTER INSERT ON quran_verses_ai
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('verse_changes', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        INSERT INTO quran_ai_counters (name, value) VALUES ('verses_changed_at', strftime('%s', 'now'))
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_verses_changed_update AFTER UPDATE ON quran_verses_ai
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('verse_changes', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        INSERT INTO quran_ai_counters (name, value) VALUES ('verses_changed_at', strftime('%s', 'now'))
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_verses_changed_delete AFTER DELETE ON quran_verses_ai
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('verse_changes', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        INSERT INTO quran_ai_counters (name, value) VALUES ('verses_changed_at', strftime('%s', 'now'))
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_topic_mapping_insert AFTER INSERT ON verse_topic_mapping
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('topic_mapping_changes', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_topic_mapping_update AFTER UPDATE ON verse_topic_mapping
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('topic_mapping_changes', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_topic_mapping_delete AFTER DELETE ON verse_topic_mapping
+    BEGIN
+        INSERT INTO quran_ai_counters (name, value) VALUES ('topic_mapping_changes', 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_history_insert AFTER INSERT ON quran_qa_history
+    BEGIN
+        UPDATE quran_ai_counters SET value = value + 1 WHERE name = 'total_questions';
+        INSERT OR IGNORE INTO quran_ai_user_counters (user_id, questions)
+            SELECT NEW.user_id, 0 WHERE NEW.user_id IS NOT NULL;
+        UPDATE quran_ai_counters SET value = value + 1
+            WHERE name = 'unique_users'
+              AND (SELECT questions FROM quran_ai_user_counters WHERE user_id = NEW.user_id) = 0;
+        UPDATE quran_ai_user_counters SET questions = questions + 1 WHERE user_id = NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_stat_history_delete AFTER DELETE ON quran_qa_history
+    BEGIN
+        UPDATE quran_ai_counters SET value = value - 1 WHERE name = 'total_questions';
+        UPDATE quran_ai_user_counters SET questions = questions - 1 WHERE user_id = OLD.user_id;
+        UPDATE quran_ai_counters SET value = value - 1
+            WHERE name = 'unique_users'
+              AND (SELECT questions FROM quran_ai_user_counters WHERE user_id = OLD.user_id) = 0;
+        DELETE FROM quran_ai_user_counters WHERE user_id = OLD.user_id AND questions <= 0;
+    END
+    """,
+]
+
+_ensured = set()
+
+
+def ensure_stat_counters(conn: sqlite3.Connection) -> bool:
+    """ایجاد جداول و تریگرهای شمارنده؛ اگر تازه ساخته شدند مقدار اولیه از جداول خوانده می‌شود"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quran_ai_counters'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_ai_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0,
+            reconciled_at DATETIME
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_ai_user_counters (
+            user_id INTEGER PRIMARY KEY,
+            questions INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for trigger in _TRIGGERS:
+        conn.execute(trigger)
+    if not exists:
+        with conn:
+            reconcile_counters(conn)
+    return not exists
+
+
+def _ensure_once(db_path: str) -> sqlite3.Connection:
+    conn = get_connection(db_path)
+    if db_path not in _ensured:
+        ensure_stat_counters(conn)
+        _ensured.add(db_path)
+    return conn
+
+
+def reconcile_counters(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    ساخت دوباره شمارنده‌ها از جداول (بدون commit)
+    خروجی: اختلاف هر شمارنده سراسری با مقدار قبلی (۰ یعنی بدون drift)
+    """
+    before = dict(conn.execute("SELECT name, value FROM quran_ai_counters").fetchall())
+
+    conn.execute("DELETE FROM quran_ai_user_counters")
+    conn.execute("""
+        INSERT INTO quran_ai_user_counters (user_id, questions)
+        SELECT user_id, COUNT(*) FROM quran_qa_history
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+    actual = {
+        'total_verses': conn.execute("SELECT COUNT(*) FROM quran_verses_ai").fetchone()[0],
+        'total_questions': conn.execute("SELECT COUNT(*) FROM quran_qa_history").fetchone()[0],
+        'unique_users': conn.execute("SELECT COUNT(*) FROM quran_ai_user_counters").fetchone()[0],
+    }
+    conn.executemany("""
+        INSERT OR REPLACE INTO quran_ai_counters (name, value, reconciled_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+    """, list(actual.items()))
+    return {name: value - before.get(name, 0) for name, value in actual.items()}
+
+
+def reconcile(db_path: Optional[str] = None) -> Dict[str, int]:
+    """اجرای تطبیق در یک تراکنش"""
+    conn = _ensure_once(db_path or default_db_path())
+    with conn:
+        return reconcile_counters(conn)
+
+
+def read_counter(conn: sqlite3.Connection, name: str) -> int:
+    """مقدار یک شمارنده سراسری (۰ اگر هنوز ساخته نشده باشد)"""
+    try:
+        row = conn.execute("SELECT value FROM quran_ai_counters WHERE name = ?", (name,)).fetchone()
+    except sqlite3.OperationalError:
+        # جدول شمارنده‌ها هنوز ساخته نشده است
+        return 0
+    return row[0] if row else 0
+
+
+def read_counters(db_path: Optional[str] = None) -> Dict[str, int]:
+    """شمارنده‌های سراسری (یک جستجوی کوچک روی quran_ai_counters)"""
+    conn = _ensure_once(db_path or default_db_path())
+    values = dict(conn.execute("SELECT name, value FROM quran_ai_counters").fetchall())
+    return {name: values.get(name, 0) for name in COUNTER_NAMES}
+
+
+def user_question_count(user_id: int, db_path: Optional[str] = None) -> int:
+    """تعداد سوالات یک کاربر (جستجوی کلید اصلی)"""
+    conn = _ensure_once(db_path or default_db_path())
+    row = conn.execute("SELECT questions FROM quran_ai_user_counters WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
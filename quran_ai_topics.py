@@ -0,0 +1,232 @@
+# quran_ai_topics.py
+"""
+دسته‌بندی برداری آیات در موضوعات (پر کردن verse_topic_mapping)
+
+- هر موضوع quran_topics (نام، توضیح و کلیدواژه‌ها) با یک encode دسته‌ای به
+  یک بردار مرکز (میانگین نرمال‌شده) تبدیل می‌شود
+- ماتریس embedding آیات با یک ضرب ماتریسی در برابر همه مراکز امتیاز می‌گیرد
+- top_k موضوع هر آیه (با امتیاز حداقل min_score) با executemany نوشته می‌شود
+
+اجرای دوباره افزایشی است: فقط آیاتی که در quran_topic_classified نیستند امتیاز
+می‌گیرند؛ تریگرها آیه‌ای را که embedding آن تغییر کند (ورود دوباره) یا حذف شود از
+این جدول برمی‌دارند. اگر مراکز موضوعات (تعریف موضوعات یا مدل) تغییر کرده باشند
+همه آیات از نو دسته‌بندی می‌شوند.
+
+نمونه:
+    python quran_ai_topics.py
+    python quran_ai_topics.py --top-k 3 --min-score 0.3 --full
+"""
+
+import argparse
+import hashlib
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from quran_ai_db import get_connection, default_db_path
+from quran_ai_index import load_verse_matrix, normalize_rows
+from quran_ai_profile import rebuild_profiles
+from quran_verse_sampler import get_ai_verse_sampler
+
+
+def ensure_topic_tables(conn):
+    """جداول وضعیت اجرای job و آیات دسته‌بندی‌شده، تریگرهای آن و ایندکس مرور آیات هر موضوع"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_topic_job (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            signature TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS quran_topic_classified (
+            verse_id INTEGER PRIMARY KEY,
+            classified_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_topic_verse_embedding AFTER UPDATE OF embedding ON quran_verses_ai
+        WHEN OLD.embedding IS NOT NEW.embedding
+        BEGIN
+            DELETE FROM quran_topic_classified WHERE verse_id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_topic_verse_delete AFTER DELETE ON quran_verses_ai
+        BEGIN
+            DELETE FROM quran_topic_classified WHERE verse_id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_verse_topic_mapping_topic
+        ON verse_topic_mapping (topic_id, relevance DESC)
+    """)
+    conn.commit()
+
+
+def seed_topics(conn, topic_keywords: Dict[str, List[str]]) -> int:
+    """افزودن موضوعات پیش‌فرض که هنوز در quran_topics نیستند"""
+    with conn:
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO quran_topics (name, keywords) VALUES (?, ?)",
+            [(name, '،'.join(keywords)) for name, keywords in topic_keywords.items()]
+        )
+    return cursor.rowcount
+
+
+def default_topic_keywords() -> Dict[str, List[str]]:
+    """موضوعات و کلیدواژه‌های موتورهای سریع و کامل (ادغام‌شده)"""
+    from quran_ai_complete import QuranAISystem
+    from quran_ai_fast import FastQuranAI
+
+    merged: Dict[str, List[str]] = {}
+    for source in (QuranAISystem.TOPIC_KEYWORDS, FastQuranAI(None).topic_keywords):
+        for name, keywords in source.items():
+            merged.setdefault(name, [])
+            merged[name] += [kw for kw in keywords if kw not in merged[name]]
+    return merged
+
+
+def _topic_texts(name: str, keywords: Optional[str], description: Optional[str]) -> List[str]:
+    keyword_list = [kw.strip() for kw in (keywords or '').replace('،', ',').split(',') if kw.strip()]
+    texts = [name] + keyword_list
+    if description:
+        texts.append(description)
+    if keyword_list:
+        texts.append(f"{name}: {'، '.join(keyword_list)}")
+    return texts
+
+
+def build_topic_centroids(system, conn) -> Tuple[List[int], Optional[np.ndarray]]:
+    """بردار مرکز هر موضوع با یک encode دسته‌ای همه متن‌های موضوعات"""
+    topics = conn.execute("SELECT id, name, keywords, description FROM quran_topics ORDER BY id").fetchall()
+    if not topics:
+        return [], None
+
+    texts, owners = [], []
+    for position, (_, name, keywords, description) in enumerate(topics):
+        for text in _topic_texts(name, keywords, description):
+            texts.append(text)
+            owners.append(position)
+
+    embeddings = system.get_embeddings(texts)
+    if embeddings is None:
+        return [], None
+
+    # میانگین embeddingهای نرمال‌شده هر موضوع با یک ضرب ماتریس عضویت
+    membership = np.zeros((len(topics), len(texts)), dtype=np.float32)
+    membership[owners, np.arange(len(texts))] = 1.0
+    centroids = normalize_rows(membership @ normalize_rows(embeddings))
+    return [topic[0] for topic in topics], centroids
+
+
+def centroid_signature(topic_ids: List[int], centroids: np.ndarray) -> str:
+    """امضای مراکز؛ با تغییر تعریف موضوعات یا مدل عوض می‌شود"""
+    digest = hashlib.sha1(np.asarray(topic_ids, dtype=np.int64).tobytes())
+    digest.update(np.round(centroids, 4).astype(np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def score_verses(matrix: np.ndarray, centroids: np.ndarray, top_k: int,
+                 min_score: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    امتیاز همه آیات در برابر همه مراکز با یک ضرب ماتریسی
+    خروجی: (ردیف آیه، ستون موضوع، امتیاز) برای top_k موضوع هر آیه بالای min_score
+    """
+    scores = matrix @ centroids.T
+    k = min(top_k, scores.shape[1])
+    if k <= 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=scores.dtype)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    rows, cols = np.nonzero(top_scores >= min_score)
+    return rows, top[rows, cols], top_scores[rows, cols]
+
+
+def classify_verses(system, top_k: int = 3, min_score: float = 0.3, full: bool = False,
+                    topic_keywords: Optional[Dict[str, List[str]]] = None) -> int:
+    """اجرای job؛ تعداد ردیف‌های نوشته‌شده در verse_topic_mapping را برمی‌گرداند"""
+    db_path = system.db_path
+    conn = get_connection(db_path)
+    ensure_topic_tables(conn)
+    added = seed_topics(conn, topic_keywords if topic_keywords is not None else default_topic_keywords())
+    if added:
+        print(f"✅ {added} موضوع پیش‌فرض اضافه شد")
+
+    start = time.time()
+    topic_ids, centroids = build_topic_centroids(system, conn)
+    if centroids is None:
+        print("⚠️ موضوعی برای دسته‌بندی نیست یا مدل embedding در دسترس نیست")
+        return 0
+
+    signature = centroid_signature(topic_ids, centroids)
+    state = conn.execute("SELECT signature FROM quran_topic_job WHERE id = 1").fetchone()
+    full = full or state is None or state[0] != signature
+
+    matrix, rows = load_verse_matrix(db_path)
+    verse_ids = np.asarray([row['id'] for row in rows], dtype=np.int64)
+    if not full:
+        # آیات جدید و آیاتی که embedding آن‌ها پس از دسته‌بندی تغییر کرده است
+        classified = np.fromiter((row[0] for row in conn.execute("SELECT verse_id FROM quran_topic_classified")),
+                                 dtype=np.int64)
+        pending = ~np.isin(verse_ids, classified)
+        matrix, verse_ids = matrix[pending], verse_ids[pending]
+    if len(verse_ids) and matrix.shape[1] != centroids.shape[1]:
+        print(f"❌ ابعاد embedding آیات ({matrix.shape[1]}) و مدل ({centroids.shape[1]}) یکسان نیست؛ "
+              f"آیات باید با همین مدل دوباره embed شوند")
+        return 0
+
+    mapping = []
+    if len(verse_ids):
+        verse_rows, topic_cols, scores = score_verses(matrix, centroids, top_k, min_score)
+        topic_array = np.asarray(topic_ids, dtype=np.int64)
+        mapping = list(zip(verse_ids[verse_rows].tolist(), topic_array[topic_cols].tolist(),
+                           scores.astype(float).tolist()))
+
+    with conn:
+        cursor = conn.cursor()
+        processed = [(verse_id,) for verse_id in verse_ids.tolist()]
+        removed = 0
+        if full:
+            cursor.execute("DELETE FROM verse_topic_mapping")
+            cursor.execute("DELETE FROM quran_topic_classified")
+        else:
+            # ردیف‌های آیات حذف‌شده و موضوعات قبلی آیات دوباره embed شده
+            cursor.execute("DELETE FROM verse_topic_mapping WHERE verse_id NOT IN (SELECT id FROM quran_verses_ai)")
+            removed = cursor.rowcount
+            cursor.executemany("DELETE FROM verse_topic_mapping WHERE verse_id = ?", processed)
+        cursor.executemany("""
+            INSERT OR REPLACE INTO verse_topic_mapping (verse_id, topic_id, relevance)
+            VALUES (?, ?, ?)
+        """, mapping)
+        cursor.executemany("INSERT OR REPLACE INTO quran_topic_classified (verse_id) VALUES (?)", processed)
+        cursor.execute("""
+            INSERT OR REPLACE INTO quran_topic_job (id, signature, updated_at)
+            VALUES (1, ?, CURRENT_TIMESTAMP)
+        """, (signature,))
+        if full or processed or removed:
+            # امتیاز پروفایل کاربران به موضوعات آیات وابسته است (در اجرای افزایشی هم)
+            rebuild_profiles(conn)
+
+    get_ai_verse_sampler(db_path).invalidate()
+    mode = 'کامل' if full else 'افزایشی'
+    print(f"✅ دسته‌بندی {mode}: {len(verse_ids)} آیه، {len(topic_ids)} موضوع، "
+          f"{len(mapping)} ارتباط در {time.time() - start:.2f} ثانیه")
+    return len(mapping)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="دسته‌بندی برداری آیات در موضوعات قرآنی")
+    parser.add_argument('--db', default=None, help='مسیر دیتابیس (پیش‌فرض: از Config)')
+    parser.add_argument('--top-k', type=int, default=3, help='حداکثر موضوع برای هر آیه')
+    parser.add_argument('--min-score', type=float, default=0.3, help='حداقل شباهت کسینوسی آیه و موضوع')
+    parser.add_argument('--full', action='store_true', help='دسته‌بندی دوباره همه آیات')
+    args = parser.parse_args()
+    if args.top_k < 1:
+        parser.error('--top-k باید دست‌کم ۱ باشد')
+
+    from quran_ai_complete import QuranAISystem
+    ai = QuranAISystem(args.db or default_db_path())
+    classify_verses(ai, top_k=args.top_k, min_score=args.min_score, full=args.full)
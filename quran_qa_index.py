@@ -0,0 +1,225 @@
+# quran_qa_index.py
+"""
+ایندکس معکوس درون‌حافظه‌ای پرسش و پاسخ‌های قرآنی (جدول quran_qa)
+
+پرسش‌ها و کلمات کلیدی فعال یک بار نرمال و واژه‌به‌واژه ایندکس می‌شوند؛
+پیدا کردن بهترین پاسخ فقط پیمایش دیکشنری است و به دیتابیس کوئری نمی‌زند.
+مسیرهای مدیریت (افزودن، ویرایش، فعال/غیرفعال، حذف) ایندکس را ردیف‌به‌ردیف
+به‌روز می‌کنند و برای تغییرات پروسه‌های دیگر، امضای جدول هر چند ثانیه یک
+بار بررسی و در صورت تغییر ایندکس از نو ساخته می‌شود.
+
+امتیاز هر پاسخ:
+    ۱۰ اگر کل سوال در متن پرسش یا کلمات کلیدی آمده باشد
+  + ۲ برای هر واژه سوال که در کلمات کلیدی است و ۱ اگر فقط در متن پرسش است
+  + ۰٫۵ × priority
+فقط پاسخی برگردانده می‌شود که کل سوال در آن آمده باشد یا دست‌کم یک واژه سوال
+در کلمات کلیدی آن باشد (مانند جستجوی قبلی)؛ واژه مشترک فقط با متن پرسش امتیاز
+رتبه‌بندی است و به تنهایی پاسخ نمی‌سازد. واژه‌های کوتاه‌تر از ۳ حرف شمرده نمی‌شوند.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func
+
+from models import QuranQA
+from text_normalizer import normalize_search
+
+
+QAEntry = namedtuple('QAEntry', [
+    'id', 'question', 'keywords', 'answer', 'related_verses', 'category', 'priority'
+])
+
+CONTAINS_WEIGHT = 10.0
+KEYWORD_WEIGHT = 2.0
+QUESTION_WEIGHT = 1.0
+PRIORITY_WEIGHT = 0.5
+
+_STOPWORDS = {
+    'و', 'به', 'از', 'با', 'برای', 'در', 'که', 'این', 'آن', 'را', 'است', 'بود',
+    'شود', 'می', 'نیز', 'تا', 'بر', 'یا', 'چه', 'چی', 'آیا'
+}
+
+
+def _words(text_norm: str) -> List[str]:
+    return [word for word in text_norm.split() if len(word) > 2 and word not in _STOPWORDS]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """واژه‌های معنادار متن نرمال‌شده"""
+    return _words(normalize_search(text))
+
+
+class QAIndex:
+    """ایندکس معکوس واژه ← شناسه پرسش و پاسخ‌های فعال"""
+
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self.entries: Dict[int, QAEntry] = {}
+        self._question_norm: Dict[int, str] = {}
+        self._keywords_norm: Dict[int, str] = {}
+        self._exact: Dict[str, Set[int]] = {}
+        self._keyword_postings: Dict[str, Set[int]] = {}
+        self._question_postings: Dict[str, Set[int]] = {}
+
+        self._signature = None
+        self._checked_at = 0.0
+        self._built = False
+        self._lock = threading.RLock()
+
+    # ---------- ساخت و به‌روزرسانی ----------
+
+    @staticmethod
+    def _table_signature():
+        """امضای جدول برای تشخیص تغییرات پروسه‌های دیگر"""
+        return tuple(QuranQA.query.with_entities(
+            func.count(QuranQA.id), func.max(QuranQA.id), func.max(QuranQA.updated_at)
+        ).one())
+
+    def rebuild(self):
+        """ساخت کامل ایندکس از ردیف‌های فعال"""
+        with self._lock:
+            self._clear()
+            for qa in QuranQA.query.filter(QuranQA.is_active == True).all():
+                self._add(qa)
+            self._signature = self._table_signature()
+            self._checked_at = time.time()
+            self._built = True
+
+    def _clear(self):
+        self.entries.clear()
+        self._question_norm.clear()
+        self._keywords_norm.clear()
+        self._exact.clear()
+        self._keyword_postings.clear()
+        self._question_postings.clear()
+
+    def _add(self, qa):
+        entry = QAEntry(qa.id, qa.question, qa.keywords, qa.answer, qa.related_verses,
+                        qa.category, qa.priority or 0)
+        # ستون‌های سایه با همان normalize_search پر شده‌اند
+        question_norm = qa.question_norm or normalize_search(qa.question)
+        keywords_norm = qa.keywords_norm or normalize_search(qa.keywords)
+
+        self.entries[qa.id] = entry
+        self._question_norm[qa.id] = question_norm
+        self._keywords_norm[qa.id] = keywords_norm
+        self._exact.setdefault(question_norm, set()).add(qa.id)
+        for word in set(_words(keywords_norm)):
+            self._keyword_postings.setdefault(word, set()).add(qa.id)
+        for word in set(_words(question_norm)):
+            self._question_postings.setdefault(word, set()).add(qa.id)
+
+    def _discard(self, qa_id: int):
+        if qa_id not in self.entries:
+            return
+        question_norm = self._question_norm.pop(qa_id)
+        keywords_norm = self._keywords_norm.pop(qa_id)
+        del self.entries[qa_id]
+
+        self._unpost(self._exact, [question_norm], qa_id)
+        self._unpost(self._keyword_postings, set(keywords_norm.split()), qa_id)
+        self._unpost(self._question_postings, set(question_norm.split()), qa_id)
+
+    @staticmethod
+    def _unpost(postings: Dict[str, Set[int]], words, qa_id: int):
+        for word in words:
+            ids = postings.get(word)
+            if ids is not None:
+                ids.discard(qa_id)
+                if not ids:
+                    del postings[word]
+
+    def _mark_changed(self):
+        # تغییر همین پروسه؛ امضای جدید خوانده می‌شود تا بررسی بعدی ایندکس را از نو نسازد
+        try:
+            self._signature = self._table_signature()
+        except Exception:
+            self._signature = None
+
+    def upsert(self, qa):
+        """افزودن یا به‌روزرسانی یک ردیف (ردیف غیرفعال از ایندکس حذف می‌شود)"""
+        with self._lock:
+            if not self._built:
+                return
+            self._discard(qa.id)
+            if qa.is_active:
+                self._add(qa)
+            self._mark_changed()
+
+    def remove(self, qa_id: int):
+        """حذف یک ردیف از ایندکس"""
+        with self._lock:
+            if not self._built:
+                return
+            self._discard(qa_id)
+            self._mark_changed()
+
+    def ensure_fresh(self):
+        """ساخت اولیه و بررسی دوره‌ای تغییرات پروسه‌های دیگر"""
+        now = time.time()
+        if self._built and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+                return
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            if self._table_signature() != self._signature:
+                self.rebuild()
+
+    # ---------- جستجو ----------
+
+    def search(self, question: str) -> Optional[QAEntry]:
+        """بهترین پاسخ برای سوال یا None"""
+        question_norm = normalize_search(question)
+        if not question_norm:
+            return None
+
+        with self._lock:
+            exact = self._exact.get(question_norm)
+            if exact:
+                return max((self.entries[i] for i in exact), key=lambda e: (e.priority, -e.id))
+
+            scores: Dict[int, float] = {}
+            keyword_matched: Set[int] = set()
+            for word in set(_words(question_norm)):
+                for qa_id in self._keyword_postings.get(word, ()):
+                    scores[qa_id] = scores.get(qa_id, 0.0) + KEYWORD_WEIGHT
+                    keyword_matched.add(qa_id)
+                for qa_id in self._question_postings.get(word, ()):
+                    if qa_id not in self._keyword_postings.get(word, ()):
+                        scores[qa_id] = scores.get(qa_id, 0.0) + QUESTION_WEIGHT
+
+            best_id = None
+            best_score = None
+            for qa_id, score in scores.items():
+                if question_norm in self._question_norm[qa_id] or question_norm in self._keywords_norm[qa_id]:
+                    score += CONTAINS_WEIGHT
+                elif qa_id not in keyword_matched:
+                    # فقط واژه‌های مشترک با متن پرسش: پاسخ این سوال نیست
+                    continue
+                score += PRIORITY_WEIGHT * self.entries[qa_id].priority
+                if best_score is None or score > best_score or (score == best_score and qa_id < best_id):
+                    best_id, best_score = qa_id, score
+            return self.entries[best_id] if best_id is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self.entries),
+            'keyword_terms': len(self._keyword_postings),
+            'question_terms': len(self._question_postings)
+        }
+
+
+qa_index = QAIndex()
+
+
+def find_best_answer(question: str) -> Optional[QAEntry]:
+    """پیدا کردن بهترین پاسخ برای سوال کاربر از ایندکس (بدون کوئری به دیتابیس)"""
+    qa_index.ensure_fresh()
+    return qa_index.search(question)
@@ -0,0 +1,227 @@
+# quran_verse_sampler.py
+"""
+نمونه‌برداری تصادفی آیات بدون ORDER BY RANDOM()
+
+ORDER BY RANDOM() برای هر درخواست کل جدول را مرتب می‌کند. اینجا شناسه
+آیات فعال یک بار در حافظه نگه داشته می‌شوند (به تفکیک موضوع و داشتن متن
+عربی) و n شناسه تصادفی با random.sample انتخاب و فقط همان ردیف‌ها با کلید
+اصلی خوانده می‌شوند.
+
+- AIVerseSampler: جدول quran_verses_ai موتورهای هوش مصنوعی (sqlite3)
+- QuranVerseSampler: مدل QuranVerse برنامه Flask
+
+فهرست شناسه‌ها پس از تغییر آیات باطل می‌شود (on_verses_changed و رویدادهای
+SQLAlchemy) و برای تغییرات پروسه‌های دیگر امضای جدول هر چند ثانیه یک بار
+بررسی می‌شود (برای quran_verses_ai شمارنده‌های تغییر quran_ai_stats.py، که
+به‌روزرسانی درجای آیه و دسته‌بندی دوباره با همان تعداد ردیف را هم نشان می‌دهند).
+"""
+
+import random
+import threading
+from abc import ABC, abstractmethod
+import time
+from typing import Dict, Hashable, List, Optional, Sequence
+
+from quran_ai_db import get_connection, default_db_path
+from quran_ai_stats import read_counter
+
+
+class RandomIdSampler(ABC):
+    """پایه نمونه‌بردار: بارگذاری تنبل شناسه‌ها و انتخاب تصادفی O(n)"""
+
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self._ids: List[int] = []
+        self._arabic_ids: List[int] = []
+        self._topic_ids: Dict[Hashable, List[int]] = {}
+        self._topic_arabic_ids: Dict[Hashable, List[int]] = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _load_rows(self):
+        """ردیف‌های (شناسه، دارای متن عربی) آیات قابل نمونه‌برداری"""
+
+    @abstractmethod
+    def _load_topics(self):
+        """ردیف‌های (کلید موضوع، شناسه آیه)"""
+
+    @abstractmethod
+    def _table_signature(self):
+        """امضای ارزان جدول برای تشخیص تغییر در پروسه‌های دیگر"""
+
+    def _reload(self):
+        ids, arabic_ids = [], []
+        has_arabic = {}
+        for verse_id, arabic in self._load_rows():
+            ids.append(verse_id)
+            has_arabic[verse_id] = bool(arabic)
+            if arabic:
+                arabic_ids.append(verse_id)
+
+        topic_ids: Dict[Hashable, List[int]] = {}
+        for topic, verse_id in self._load_topics():
+            if verse_id in has_arabic:
+                topic_ids.setdefault(topic, []).append(verse_id)
+
+        self._ids = ids
+        self._arabic_ids = arabic_ids
+        self._topic_ids = topic_ids
+        self._topic_arabic_ids = {
+            topic: [verse_id for verse_id in verse_ids if has_arabic[verse_id]]
+            for topic, verse_ids in topic_ids.items()
+        }
+        self._signature = self._table_signature()
+        self._checked_at = time.time()
+        self._loaded = True
+
+    def ensure_fresh(self):
+        """بارگذاری اولیه و بررسی دوره‌ای تغییرات پروسه‌های دیگر"""
+        now = time.time()
+        if self._loaded and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._reload()
+            elif now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                if self._table_signature() != self._signature:
+                    self._reload()
+
+    def invalidate(self):
+        """باطل کردن فهرست شناسه‌ها تا در نمونه‌برداری بعدی از نو خوانده شود"""
+        with self._lock:
+            self._loaded = False
+
+    def sample_ids(self, n: int, topic: Optional[Hashable] = None, require_arabic: bool = False) -> List[int]:
+        """n شناسه تصادفی متمایز (یا کمتر اگر آیه کافی نباشد)"""
+        if n <= 0:
+            return []
+        self.ensure_fresh()
+        if topic is None:
+            pool = self._arabic_ids if require_arabic else self._ids
+        else:
+            pool = (self._topic_arabic_ids if require_arabic else self._topic_ids).get(topic, [])
+        return random.sample(pool, min(n, len(pool)))
+
+    def count(self, topic: Optional[Hashable] = None, require_arabic: bool = False) -> int:
+        self.ensure_fresh()
+        if topic is None:
+            return len(self._arabic_ids if require_arabic else self._ids)
+        return len((self._topic_arabic_ids if require_arabic else self._topic_ids).get(topic, []))
+
+
+class AIVerseSampler(RandomIdSampler):
+    """
+    نمونه‌بردار جدول quran_verses_ai
+    موضوع هم با شناسه و هم با نام جدول quran_topics پذیرفته می‌شود.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, check_interval: float = 30.0):
+        super().__init__(check_interval)
+        self.db_path = db_path or default_db_path()
+
+    def _load_rows(self):
+        return get_connection(self.db_path).execute(
+            "SELECT id, arabic_text IS NOT NULL AND arabic_text != '' FROM quran_verses_ai"
+        ).fetchall()
+
+    def _load_topics(self):
+        rows = get_connection(self.db_path).execute("""
+            SELECT m.topic_id, t.name, m.verse_id
+            FROM verse_topic_mapping m
+            LEFT JOIN quran_topics t ON t.id = m.topic_id
+        """).fetchall()
+        for topic_id, name, verse_id in rows:
+            yield topic_id, verse_id
+            if name:
+                yield name, verse_id
+
+    def _table_signature(self):
+        # شمارنده‌ها هر INSERT/UPDATE/DELETE آیات و ارتباط موضوعات را می‌شمارند
+        # (تریگرهای quran_ai_stats.py)؛ تعداد ردیف‌ها برای دیتابیس بدون شمارنده
+        conn = get_connection(self.db_path)
+        return (read_counter(conn, 'verse_changes'), read_counter(conn, 'topic_mapping_changes')) + conn.execute("""
+            SELECT (SELECT COUNT(*) FROM quran_verses_ai), (SELECT MAX(id) FROM quran_verses_ai),
+                   (SELECT COUNT(*) FROM verse_topic_mapping)
+        """).fetchone()
+
+    def fetch(self, columns: str, ids: Sequence[int]) -> List[tuple]:
+        """خواندن ردیف‌های (id, columns...) با کلید اصلی، به ترتیب شناسه‌های ورودی"""
+        if not ids:
+            return []
+        rows = get_connection(self.db_path).execute(f"""
+            SELECT id, {columns} FROM quran_verses_ai
+            WHERE id IN ({','.join('?' * len(ids))})
+        """, list(ids)).fetchall()
+        found = {row[0]: row for row in rows}
+        return [found[verse_id] for verse_id in ids if verse_id in found]
+
+    def sample(self, columns: str, n: int, topic: Optional[Hashable] = None,
+               require_arabic: bool = False) -> List[tuple]:
+        """n ردیف تصادفی (id و ستون‌های columns)"""
+        return self.fetch(columns, self.sample_ids(n, topic, require_arabic))
+
+
+class QuranVerseSampler(RandomIdSampler):
+    """نمونه‌بردار آیات فعال مدل QuranVerse (موضوع: ستون topic)"""
+
+    def __init__(self, check_interval: float = 30.0):
+        super().__init__(check_interval)
+        from extensions import db
+        from models import QuranVerse
+        self.model = QuranVerse
+        for event in ('after_insert', 'after_update', 'after_delete'):
+            db.event.listen(QuranVerse, event, lambda mapper, connection, target: self.invalidate())
+
+    def _load_rows(self):
+        verse = self.model
+        return verse.query.with_entities(verse.id, verse.verse_arabic).filter(verse.is_active == True).all()
+
+    def _load_topics(self):
+        verse = self.model
+        return verse.query.with_entities(verse.topic, verse.id).filter(
+            verse.is_active == True, verse.topic.isnot(None)
+        ).all()
+
+    def _table_signature(self):
+        from sqlalchemy import func
+        verse = self.model
+        return tuple(verse.query.with_entities(
+            func.count(verse.id), func.max(verse.id), func.sum(verse.is_active)
+        ).one())
+
+    def sample(self, n: int, topic: Optional[str] = None, require_arabic: bool = False) -> list:
+        """n آیه تصادفی فعال (اشیای QuranVerse)"""
+        ids = self.sample_ids(n, topic, require_arabic)
+        if not ids:
+            return []
+        found = {v.id: v for v in self.model.query.filter(self.model.id.in_(ids)).all()}
+        return [found[verse_id] for verse_id in ids if verse_id in found]
+
+
+_ai_samplers: Dict[str, AIVerseSampler] = {}
+_quran_verse_sampler = None
+_samplers_lock = threading.Lock()
+
+
+def get_ai_verse_sampler(db_path: Optional[str] = None) -> AIVerseSampler:
+    """نمونه‌بردار مشترک quran_verses_ai برای هر فایل دیتابیس"""
+    db_path = db_path or default_db_path()
+    sampler = _ai_samplers.get(db_path)
+    if sampler is None:
+        with _samplers_lock:
+            sampler = _ai_samplers.setdefault(db_path, AIVerseSampler(db_path))
+    return sampler
+
+
+def get_quran_verse_sampler() -> QuranVerseSampler:
+    """نمونه‌بردار مشترک مدل QuranVerse (نیازمند app context)"""
+    global _quran_verse_sampler
+    if _quran_verse_sampler is None:
+        with _samplers_lock:
+            if _quran_verse_sampler is None:
+                _quran_verse_sampler = QuranVerseSampler()
+    return _quran_verse_sampler
@@ -1,4 +1,4 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, render_template_string
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, render_template_string, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from models import User
 from extensions import db
@@ -6,6 +6,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from sqlalchemy import func, or_, and_, desc
 from datetime import datetime, timedelta, date
+import json
 import math  
 import os
 import secrets
@@ -54,13 +55,21 @@ from models import (
 import jdatetime
 from decorators import admin_required, staff_required, verified_required
 from sqlalchemy import func, and_, or_, desc
+from quran_qa_index import qa_index, find_best_answer
+from text_normalizer import normalize_search, prefix_match
+from quran_verse_sampler import get_quran_verse_sampler
+from daily_content import get_daily_content
+from stat_counters import get_stat_counter, get_user_stat_counter
 
 try:
     from quran_ai import (
         ask_quran_ai,
+        ask_quran_ai_batch,
+        ask_quran_ai_stream,
         analyze_quranic_text,
         get_verse_suggestions,
         get_ai_statistics,
+        get_question_clusters,
         get_recent_qa
     )
     AI_ENABLED = True
@@ -84,6 +93,24 @@ def init_routes(app):
                 return False
         return dict(endpoint_exists=endpoint_exists)
     
+    def search_normalized(query, norm_column, term, *text_columns):
+        """
+        جستجو روی ستون سایه نرمال‌شده (*_norm)
+        ابتدا فقط شرط پیشوندی (بازه روی ایندکس ix_*_norm) بررسی می‌شود؛ جستجوی
+        زیررشته‌ای (LIKE '%x%' روی *_norm و ستون‌های متنی دیگر) که کل جدول را
+        می‌خواند فقط وقتی اجرا می‌شود که هیچ ردیفی با عبارت شروع نشود.
+        """
+        term_norm = normalize_search(term)
+        if not term_norm:
+            return query
+        prefixed = query.filter(prefix_match(norm_column, term_norm))
+        if prefixed.first() is not None:
+            return prefixed
+        return query.filter(or_(
+            norm_column.contains(term_norm),
+            *[column.ilike(f'%{term}%') for column in text_columns]
+        ))
+    
     # ============================================
     # توابع کمکی آیه روز و حدیث
     # ============================================
@@ -103,113 +130,13 @@ def init_routes(app):
             return today.strftime("%d %B %Y")
 
     def get_daily_verse():
-        """برمی‌گرداند آیه روز یا حدیث روز (۵۰٪ شانس) - بدون دیتابیس اضافی"""
-        import random
-        from datetime import date
-
-        hadiths = [
-            {'title': 'پیامبر اکرم (ص)', 'arabic': 'الْقُرْآنُ مَأْدُبَةُ اللَّهِ، فَتَعَلَّمُوا مَأْدُبَتَهُ مَا اسْتَطَعْتُمْ.', 'persian': 'قرآن سفرهٔ الهی است، پس تا می‌توانید از این سفره بیاموزید.', 'source': 'نهج‌الفصاحه'},
-            {'title': 'امام علی (ع)', 'arabic': 'وَ اعْلَمُوا أَنَّ هَذَا الْقُرْآنَ هُوَ النَّاصِحُ الَّذِي لَا يَغُشُّ، وَ الْهَادِي الَّذِي لَا يُضِلُّ، وَ الْمُحَدِّثُ الَّذِي لَا يَكْذِبُ.', 'persian': 'بدانید که این قرآن، اندرزگویی است که فریب نمی‌دهد، راهنمایی است که گمراه نمی‌کند، و سخنگویی است که دروغ نمی‌گوید.', 'source': 'نهج‌البلاغه، خطبه ۱۷۶'},
-            {'title': 'امام صادق (ع)', 'arabic': 'إِنَّ الْقُرْآنَ حَيٌ لَمْ يَمُتْ، وَ إِنَّهُ جَارٍ كَمَا يَجْرِي اللَّيْلُ وَ النَّهَارُ، وَ كَمَا يَجْرِي الشَّمْسُ وَ الْقَمَرُ.', 'persian': 'قرآن زنده است و نمی‌میرد؛ جاری است چنانکه شب و روز جاری است، و چنانکه خورشید و ماه جاری هستند.', 'source': 'الکافی، ج۲، ص۶۰۳'},
-            {'title': 'امام باقر (ع)', 'arabic': 'مَنْ قَرَأَ الْقُرْآنَ وَ هُوَ شَابٌّ مُؤْمِنٌ، اخْتَلَطَ الْقُرْآنُ بِلَحْمِهِ وَ دَمِهِ، وَ جَعَلَهُ اللَّهُ مَعَ السَّفَرَةِ الْكِرَامِ الْبَرَرَةِ.', 'persian': 'هر جوان مؤمنی که قرآن بخواند، قرآن با گوشت و خونش آمیخته می‌شود و خداوند او را با فرشتگان بزرگوار و نیکوکار محشور می‌گرداند.', 'source': 'الکافی، ج۲، ص۶۰۴'},
-            {'title': 'پیامبر اکرم (ص)', 'arabic': 'شِفَاءُ مَا فِي الصُّدُورِ الْقُرْآنُ.', 'persian': 'قرآن درمان آنچه در سینه‌ها (دل‌ها) است، می‌باشد.', 'source': 'بحارالانوار، ج۹۲، ص۲۱'},
-            {'title': 'امام رضا (ع)', 'arabic': 'إِنَّ الْقُرْآنَ حَبْلُ اللَّهِ الْمَتِينُ وَ عُرْوَتُهُ الْوُثْقَى وَ الصِّرَاطُ الْمُسْتَقِیمُ.', 'persian': 'قرآن، ریسمان محکم خدا و دستاویز استوار و راه راست است.', 'source': 'عیون اخبار الرضا، ج۱، ص۲۹'},
-            {'title': 'امیرالمؤمنین (ع)', 'arabic': 'فَاسْتَشْفُوهُ مِنْ أَدْوَائِكُمْ، وَ اسْتَعِينُوا بِهِ عَلَى لَأْوَائِكُمْ، فَإِنَّ فِيهِ شِفَاءً مِنْ أَكْبَرِ الدَّاءِ وَ هُوَ الْكُفْرُ وَ النِّفَاقُ.', 'persian': 'پس از قرآن برای درمان بیماری‌هایتان شفا بجویید و در سختی‌ها از آن یاری بخواهید؛ زیرا در قرآن درمان بزرگ‌ترین بیماری‌ها یعنی کفر و نفاق است.', 'source': 'نهج‌البلاغه، خطبه ۱۷۶'},
-            {'title': 'امام سجاد (ع)', 'arabic': 'آيَاتُ الْقُرْآنِ خَزَائِنُ الرَّحْمَةِ، فَإِذَا فُتِحَتْ خَزَائِنُ الرَّحْمَةِ فَلَا تَنْبَغِي أَنْ تُقْفَلَ.', 'persian': 'آیات قرآن گنجینه‌های رحمتند؛ پس هنگامی که گشوده شدند، شایسته نیست که بسته شوند.', 'source': 'تحف العقول'}
-        ]
-
-        if random.choice([True, False]):
-            hadith = random.choice(hadiths)
-            return {
-                'title': hadith['title'],
-                'verse': hadith['persian'],
-                'arabic_text': hadith['arabic'],
-                'translation': hadith['persian'],
-                'surah': hadith['source'],
-                'verse_number': '',
-                'is_hadith': True
-            }
-
-        with app.app_context():
-            try:
-                verses = QuranVerse.query.all()
-                if not verses:
-                    hadith = hadiths[0]
-                    return {
-                        'title': hadith['title'],
-                        'verse': hadith['persian'],
-                        'arabic_text': hadith['arabic'],
-                        'translation': hadith['persian'],
-                        'surah': hadith['source'],
-                        'verse_number': '',
-                        'is_hadith': True
-                    }
-                today = date.today()
-                random.seed(today.toordinal())
-                verse = random.choice(verses)
-                return {
-                    'title': 'آیه روز',
-                    'verse': getattr(verse, 'verse_persian', getattr(verse, 'translation', '')),
-                    'arabic_text': getattr(verse, 'verse_arabic', ''),
-                    'translation': getattr(verse, 'verse_persian', getattr(verse, 'translation', '')),
-                    'surah': getattr(verse, 'surah_name', 'قرآن'),
-                    'verse_number': getattr(verse, 'verse_number', ''),
-                    'is_hadith': False
-                }
-            except Exception as e:
-                print(f"❌ خطا در دریافت آیه: {e}")
-                hadith = hadiths[0]
-                return {
-                    'title': hadith['title'],
-                    'verse': hadith['persian'],
-                    'arabic_text': hadith['arabic'],
-                    'translation': hadith['persian'],
-                    'surah': hadith['source'],
-                    'verse_number': '',
-                    'is_hadith': True
-                }
+        """آیه روز یا حدیث روز؛ یک بار برای هر روز شمسی محاسبه می‌شود (daily_content)"""
+        return get_daily_content()
     
     # ============================================
     # توابع هوش مصنوعی قرآنی
     # ============================================
     
-    def find_best_answer(question):
-        """پیدا کردن بهترین پاسخ برای سوال کاربر از دیتابیس"""
-        from sqlalchemy import or_
-        
-        question_clean = question.strip().lower()
-        
-        exact_match = QuranQA.query.filter(
-            QuranQA.is_active == True,
-            QuranQA.question == question_clean
-        ).first()
-        
-        if exact_match:
-            return exact_match
-        
-        contains_match = QuranQA.query.filter(
-            QuranQA.is_active == True,
-            or_(
-                QuranQA.question.contains(question_clean),
-                QuranQA.keywords.contains(question_clean)
-            )
-        ).order_by(QuranQA.priority.desc()).first()
-        
-        if contains_match:
-            return contains_match
-        
-        keywords = question_clean.split()
-        for keyword in keywords:
-            if len(keyword) > 2:
-                keyword_match = QuranQA.query.filter(
-                    QuranQA.is_active == True,
-                    QuranQA.keywords.contains(keyword)
-                ).order_by(QuranQA.priority.desc()).first()
-                if keyword_match:
-                    return keyword_match
-        
-        return None
-    
     def get_suggestions_by_mood(mood):
         """دریافت آیات پیشنهادی بر اساس حال و هوا"""
         suggestions = QuranSuggestion.query.filter_by(
@@ -432,10 +359,7 @@ def init_routes(app):
                 pass
         
         if search:
-            query = query.filter(
-                (Event.title.contains(search)) | 
-                (Event.description.contains(search))
-            )
+            query = search_normalized(query, Event.title_norm, search, Event.description)
         
         try:
             events = query.order_by(Event.start_date).paginate(
@@ -487,13 +411,8 @@ def init_routes(app):
         if query:
             # جستجو در رویدادها
             events_query = Event.query.filter(Event.is_active == True)
-            events_query = events_query.filter(
-                or_(
-                    Event.title.ilike(f'%{query}%'),
-                    Event.description.ilike(f'%{query}%'),
-                    Event.location.ilike(f'%{query}%')
-                )
-            )
+            events_query = search_normalized(events_query, Event.title_norm, query,
+                                             Event.description, Event.location)
             if event_type and event_type in ['workshop', 'competition', 'halaqah', 'lecture']:
                 events_query = events_query.filter(Event.event_type == event_type)
             
@@ -530,13 +449,8 @@ def init_routes(app):
             
             # جستجو در حلقه‌های تلاوت
             circles_query = QuranCircle.query.filter(QuranCircle.is_active == True)
-            circles_query = circles_query.filter(
-                or_(
-                    QuranCircle.name.ilike(f'%{query}%'),
-                    QuranCircle.description.ilike(f'%{query}%'),
-                    QuranCircle.teacher_name.ilike(f'%{query}%')
-                )
-            )
+            circles_query = search_normalized(circles_query, QuranCircle.name_norm, query,
+                                              QuranCircle.description, QuranCircle.teacher_name)
             for circle in circles_query.all():
                 all_results.append({
                     'type': 'circle',
@@ -3192,7 +3106,7 @@ def init_routes(app):
                         'total_questions': total_questions,
                         'quranic_questions': quranic_questions,
                         'unique_users': unique_users,
-                        'total_verses': QuranVerse.query.count(),
+                        'total_verses': get_stat_counter('quran_verses'),
                         'system_status': 'در حال توسعه',
                         'ai_enabled': False
                     }
@@ -3217,9 +3131,18 @@ def init_routes(app):
             }
             recent_questions = []
         
+        # موضوعات پرتکرار بی‌پاسخ (خروجی job خوشه‌بندی)
+        question_clusters = None
+        if AI_ENABLED:
+            try:
+                question_clusters = get_question_clusters(limit=10)
+            except Exception as e:
+                print(f"⚠️ خوشه‌های سوالات در دسترس نیست: {e}")
+        
         return render_template('admin/ai_dashboard.html',
                              stats=stats,
                              recent_questions=recent_questions,
+                             question_clusters=question_clusters,
                              ai_enabled=AI_ENABLED,
                              current_user=current_user)
       # ============================================
@@ -3407,9 +3330,9 @@ def init_routes(app):
         # آمار
         try:
             stats = {
-                'total_verses': QuranVerse.query.count(),
-                'total_questions': QuranQA.query.count(),
-                'user_questions': UserQuranChat.query.filter_by(user_id=current_user.id).count()
+                'total_verses': get_stat_counter('quran_verses'),
+                'total_questions': get_stat_counter('quran_qa'),
+                'user_questions': get_user_stat_counter(current_user.id, 'quran_chats')
             }
         except:
             stats = {
@@ -3481,7 +3404,7 @@ def init_routes(app):
         
         # دریافت آیات تصادفی
         try:
-            suggested_verses = QuranVerse.query.order_by(func.random()).limit(3).all()
+            suggested_verses = get_quran_verse_sampler().sample(3)
         except:
             suggested_verses = []
         
@@ -3527,12 +3450,14 @@ def init_routes(app):
         qa.updated_at = datetime.utcnow()
         
         db.session.commit()
+        qa_index.upsert(qa)
         return jsonify({'success': True, 'message': 'بروزرسانی شد'})
-        @app.route('/admin/quran-qa/add', methods=['POST'])
-        @login_required
-        @admin_required
-        def admin_add_quran_qa():
-            """افزودن پرسش و پاسخ جدید"""
+
+    @app.route('/admin/quran-qa/add', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_add_quran_qa():
+        """افزودن پرسش و پاسخ جدید"""
         data = request.get_json()
         
         qa = QuranQA(
@@ -3546,6 +3471,7 @@ def init_routes(app):
         )
         db.session.add(qa)
         db.session.commit()
+        qa_index.upsert(qa)
         
         return jsonify({'success': True, 'message': 'پرسش و پاسخ با موفقیت اضافه شد'})
 
@@ -3557,6 +3483,7 @@ def init_routes(app):
         qa = QuranQA.query.get_or_404(qa_id)
         db.session.delete(qa)
         db.session.commit()
+        qa_index.remove(qa_id)
         return jsonify({'success': True, 'message': 'حذف شد'})
 
     @app.route('/admin/quran-qa/<int:qa_id>/toggle', methods=['POST'])
@@ -3567,6 +3494,7 @@ def init_routes(app):
         qa = QuranQA.query.get_or_404(qa_id)
         qa.is_active = not qa.is_active
         db.session.commit()
+        qa_index.upsert(qa)
         return jsonify({'success': True, 'is_active': qa.is_active})
     
     @app.route('/ai/history')
@@ -3674,7 +3602,7 @@ def init_routes(app):
         
         suggested_verses = []
         try:
-            suggested_verses = QuranVerse.query.order_by(func.random()).limit(3).all()
+            suggested_verses = get_quran_verse_sampler().sample(3)
         except:
             pass
         
@@ -3761,7 +3689,7 @@ def init_routes(app):
         # اگر آیات کافی نبود، از جدول QuranVerse استفاده کن
         if not verses or len(verses) < 3:
             try:
-                random_verses = QuranVerse.query.order_by(func.random()).limit(5).all()
+                random_verses = get_quran_verse_sampler().sample(5)
                 for v in random_verses:
                     verses.append({
                         'text': v.verse_arabic if hasattr(v, 'verse_arabic') else '',
@@ -3818,6 +3746,85 @@ def init_routes(app):
             }
         
         return jsonify(answer)
+    
+    @app.route('/ai/ask_stream', methods=['GET', 'POST'])
+    @login_required
+    @verified_required
+    def ai_ask_stream():
+        """
+        نسخه جریانی /ai/ask_api با Server-Sent Events
+        رویدادها: verse (بهترین آیه) ← answer ← related ← suggestions ← done (زمان‌بندی)
+        ثبت سوال در دیتابیس پس از بسته شدن جریان انجام می‌شود.
+        """
+        data = request.get_json(silent=True) or {}
+        question = (data.get('question') or request.args.get('question') or '').strip()
+        if not question:
+            return jsonify({'error': 'سوال الزامی است'}), 400
+        user_id = current_user.id
+        
+        def sse(event, payload):
+            return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        
+        def generate():
+            final = {}
+            try:
+                if AI_ENABLED:
+                    for event, payload in ask_quran_ai_stream(question, user_id):
+                        if event == 'answer':
+                            final = payload
+                        yield sse(event, payload)
+                else:
+                    final = {
+                        'answer': f'پاسخ به سوال: {question}\n\nسیستم هوش مصنوعی در حال توسعه است.',
+                        'is_quranic': True
+                    }
+                    yield sse('answer', final)
+                    yield sse('done', {})
+            except Exception as e:
+                print(f"❌ خطا در پاسخ جریانی: {e}")
+                yield sse('error', {'error': 'خطا در پردازش سوال'})
+            finally:
+                # ثبت سوال پس از ارسال کامل پاسخ (یا قطع اتصال)
+                try:
+                    db.session.add(AIQuestion(
+                        user_id=user_id,
+                        question=question,
+                        answer=final.get('answer', ''),
+                        is_quranic=final.get('is_quranic', True)
+                    ))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"⚠️ ثبت سوال جریانی ناموفق بود: {e}")
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    
+    @app.route('/ai/ask_batch', methods=['POST'])
+    @login_required
+    @verified_required
+    def ai_ask_batch():
+        """API پرسش دسته‌ای: {"questions": [...]} ← پاسخ هر سوال به ترتیب و زمان کل"""
+        data = request.get_json(silent=True)
+        questions = data.get('questions') if isinstance(data, dict) else None
+        
+        if not isinstance(questions, list) or not questions:
+            return jsonify({'error': 'فهرست سوالات الزامی است'}), 400
+        if len(questions) > app.config.get('QURAN_AI_BATCH_MAX_QUESTIONS', 500):
+            return jsonify({'error': 'تعداد سوالات بیش از حد مجاز است'}), 400
+        if not all(isinstance(q, str) and q.strip() for q in questions):
+            return jsonify({'error': 'همه سوالات باید متن غیرخالی باشند'}), 400
+        
+        if not AI_ENABLED:
+            return jsonify({'error': 'سیستم هوش مصنوعی در دسترس نیست'}), 503
+        
+        try:
+            return jsonify(ask_quran_ai_batch([q.strip() for q in questions], current_user.id))
+        except Exception as e:
+            print(f"❌ خطا در پرسش دسته‌ای: {e}")
+            return jsonify({'success': False, 'error': 'خطا در پردازش سوالات'}), 500
     # ============================================
     # API های عمومی
     # ============================================
@@ -4006,11 +4013,8 @@ def init_routes(app):
                 query = query.filter_by(level=level)
             
             if search:
-                query = query.filter(
-                    (QuranCircle.name.contains(search)) | 
-                    (QuranCircle.description.contains(search)) |
-                    (QuranCircle.teacher_name.contains(search))
-                )
+                query = search_normalized(query, QuranCircle.name_norm, search,
+                                          QuranCircle.description, QuranCircle.teacher_name)
             
             circles = query.order_by(QuranCircle.created_at.desc()).paginate(
                 page=page, per_page=10, error_out=False
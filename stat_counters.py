@@ -0,0 +1,64 @@
+# stat_counters.py
+"""
+خواندن و تطبیق شمارنده‌های آماری
+
+شمارنده‌های برنامه (stat_counters و user_stat_counters) با رویدادهای
+SQLAlchemy در models.py و شمارنده‌های هوش مصنوعی با تریگرهای SQLite در
+quran_ai_stats.py به‌روز می‌شوند؛ خواندن هر آمار یک جستجوی کلید اصلی است.
+
+تغییراتی که از ORM رد نمی‌شوند (حذف دسته‌ای، SQL خام) شمارنده‌ها را از مقدار
+واقعی دور می‌کنند؛ این اسکریپت را به‌صورت دوره‌ای (مثلاً cron شبانه) اجرا کنید:
+    python stat_counters.py
+"""
+
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import func
+
+from extensions import db
+from models import COUNTED_MODELS, StatCounter, UserStatCounter
+
+
+def get_stat_counter(name: str) -> int:
+    """مقدار یک شمارنده سراسری"""
+    counter = db.session.get(StatCounter, name)
+    return counter.value if counter else 0
+
+
+def get_user_stat_counter(user_id: int, name: str) -> int:
+    """مقدار یک شمارنده کاربر"""
+    counter = db.session.get(UserStatCounter, (user_id, name))
+    return counter.value if counter else 0
+
+
+def reconcile_stat_counters() -> Dict[str, int]:
+    """
+    ساخت دوباره شمارنده‌های برنامه از جداول در یک تراکنش
+    خروجی: اختلاف هر شمارنده سراسری با مقدار قبلی (۰ یعنی بدون drift)
+    """
+    drift = {}
+    now = datetime.utcnow()
+    for model, (name, user_column) in COUNTED_MODELS.items():
+        actual = db.session.query(func.count()).select_from(model).scalar()
+        drift[name] = actual - get_stat_counter(name)
+        db.session.merge(StatCounter(name=name, value=actual, reconciled_at=now))
+
+        if user_column:
+            column = getattr(model, user_column)
+            UserStatCounter.query.filter_by(name=name).delete()
+            db.session.add_all([
+                UserStatCounter(user_id=user_id, name=name, value=count)
+                for user_id, count in db.session.query(column, func.count()).filter(column.isnot(None)).group_by(column)
+            ])
+    db.session.commit()
+    return drift
+
+
+if __name__ == "__main__":
+    from app import app
+    from quran_ai_stats import reconcile
+
+    with app.app_context():
+        print(f"✅ شمارنده‌های برنامه تطبیق داده شدند (drift): {reconcile_stat_counters()}")
+    print(f"✅ شمارنده‌های هوش مصنوعی تطبیق داده شدند (drift): {reconcile()}")
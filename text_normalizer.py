@@ -0,0 +1,58 @@
+# text_normalizer.py
+"""
+نرمال‌سازی مشترک متن فارسی/عربی برای جستجو و کلیدهای کش
+
+- یکسان‌سازی حروف عربی با فارسی (ي/ى ← ی، ك ← ک، ة ← ه، أ/إ/ٱ ← ا)
+- حذف اعراب (فتحه، کسره، تنوین، تشدید، سکون و...) و کشیده (ـ)
+- تبدیل نیم‌فاصله (ZWNJ) و نویسه‌های جهت‌نما به فاصله
+- تبدیل ارقام فارسی/عربی به لاتین
+- حروف کوچک و حذف فاصله‌های اضافه
+
+normalize_search علاوه بر این علائم نگارشی را حذف می‌کند؛ ستون‌های سایه
+*_norm در models.py با همین تابع پر می‌شوند، پس مقایسه برابری و پیشوندی روی
+آن‌ها با ایندکس دیتابیس انجام می‌شود.
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import and_
+
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    '\u200c': ' ', '\u200d': ' ', '\u200e': ' ', '\u200f': ' ', '\xa0': ' ',
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+
+# اعراب عربی، الف خنجری، علائم قرآنی و کشیده
+_DIACRITICS_RE = re.compile('[\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# بزرگ‌ترین نویسه یونیکد؛ حد بالای بازه پیشوندی
+_MAX_CHAR = '\U0010FFFF'
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """یکسان‌سازی حروف، حذف اعراب و نیم‌فاصله، حروف کوچک و فاصله‌های یکتا"""
+    if not text:
+        return ''
+    text = _DIACRITICS_RE.sub('', text.translate(_CHAR_MAP)).lower()
+    return ' '.join(text.split())
+
+
+def normalize_search(text: Optional[str]) -> str:
+    """normalize_text به‌همراه حذف علائم نگارشی (مقدار ستون‌های *_norm)"""
+    if not text:
+        return ''
+    return normalize_text(_PUNCTUATION_RE.sub(' ', normalize_text(text)))
+
+
+def prefix_match(column, prefix: str):
+    """
+    شرط پیشوندی به صورت بازه (column >= prefix AND column < prefix + U+10FFFF)
+    برخلاف LIKE 'x%' در SQLite، این شرط همیشه از ایندکس ستون استفاده می‌کند.
+    """
+    return and_(column >= prefix, column < prefix + _MAX_CHAR)